@@ -0,0 +1,461 @@
+"""Benchmarks für Messzyklus, Sensortreiber und MQTT-Versand.
+
+Läuft unter CPython gegen den Simulator (Simulator/): die Sensoren sind die
+Registermodelle aus geraete.py, die Zeit ist virtuell. Gemessen werden:
+- Latenz pro Sensor (simulierte Zeit und Rechenzeit auf dem Host)
+- I2C-Transaktionen und Bytes pro Messwert bzw. pro Treiberaufruf
+- Dauer eines kompletten Messzyklus und einer Hauptschleife
+- MQTT-Nachrichten und Bytes pro Runde (Nutzdaten und komplettes Paket)
+- Heap pro Zyklus (tracemalloc: Spitze und bleibender Zuwachs)
+
+Die Ergebnisse lassen sich als JSON-Baseline speichern und später
+vergleichen; bei einer Verschlechterung endet das Skript mit Code 1:
+    python Benchmark/benchmark.py --speichern Benchmark/baseline.json
+    python Benchmark/benchmark.py --vergleichen Benchmark/baseline.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+BENCHMARK = os.path.dirname(os.path.abspath(__file__))
+PROJEKT = os.path.dirname(BENCHMARK)
+sys.path.insert(0, os.path.join(PROJEKT, "Simulator"))
+
+import starte_simulation     # noqa: E402  (richtet sys.path für mpy/ und Bibliotheken/ ein)
+import geraete               # noqa: E402
+import uhr as uhr_modul      # noqa: E402
+from i2cbus import I2CBus    # noqa: E402
+from machine import Timer    # noqa: E402
+from mqtt_broker import Broker  # noqa: E402
+from ntp_server import NTPServer  # noqa: E402
+from umqtt.simple import MQTTClient  # noqa: E402
+from welt import neue_welt   # noqa: E402
+
+from aht import AHT21        # noqa: E402
+from bh1750 import BH1750    # noqa: E402
+from messzyklus import Messzyklus  # noqa: E402
+import aenderungsfilter      # noqa: E402
+import flotte                # noqa: E402
+import telemetrie_format     # noqa: E402
+from telemetriestapel import Telemetriestapel  # noqa: E402
+import VL53L0X               # noqa: E402
+
+FORMAT_VERSION = 1
+BUS_FREQ = 400000
+
+# Art der Kennzahl -> erlaubte relative Verschlechterung beim Vergleich.
+# Zähler und simulierte Zeiten sind bei festem Seed reproduzierbar,
+# Rechenzeiten hängen vom Rechner ab und werden nur berichtet
+# (außer mit --cpu-toleranz).
+TOLERANZ = {
+    "zaehler": 0.0,
+    "simzeit": 0.05,
+    "heap": 0.25,
+    "cpu": None,
+}
+
+
+class Ergebnisse:
+    def __init__(self):
+        self.werte = {}
+
+    def eintragen(self, name, wert, einheit, art):
+        self.werte[name] = {"wert": round(wert, 3), "einheit": einheit, "art": art}
+
+    def bus(self, praefix, bus, adresse, anzahl):
+        """Transaktionen, Bytes und geschätzte Buszeit pro Treiberaufruf."""
+        transaktionen, nbytes, _ = bus.statistik(adresse)
+        self.eintragen(praefix + ".i2c_transaktionen", transaktionen / anzahl, "1/Aufruf", "zaehler")
+        self.eintragen(praefix + ".i2c_bytes", nbytes / anzahl, "B/Aufruf", "zaehler")
+        # Schätzung: pro Byte 9 Takte (8 Bit + ACK), pro Transaktion ein Adressbyte
+        self.eintragen(praefix + ".i2c_buszeit", (nbytes + transaktionen) * 9 / BUS_FREQ * 1e6 / anzahl,
+                       "us/Aufruf", "zaehler")
+
+
+def _umgebung(seed):
+    """Neue Welt mit virtueller Zeit und einem I2CBus über den Sensormodellen."""
+    welt = neue_welt(virtuell=True, seed=seed)
+    starte_simulation.time_umleiten()
+    uhr_modul.asyncio_einbinden(welt.uhr)
+    bus = I2CBus(geraete.erstelle_bus(welt), "Sim", BUS_FREQ)
+    return welt, bus
+
+
+def _messen(welt, funktion, anzahl):
+    """Ruft funktion anzahl-mal auf, gibt (simulierte ms, Rechenzeit us) je Aufruf zurück."""
+    sim = []
+    cpu = []
+    for _ in range(anzahl):
+        sim_start = welt.uhr.monotonic()
+        cpu_start = time.perf_counter()
+        funktion()
+        cpu.append((time.perf_counter() - cpu_start) * 1e6)
+        sim.append((welt.uhr.monotonic() - sim_start) * 1000)
+    return statistics.median(sim), statistics.median(cpu)
+
+
+def bench_aht(erg, seed, anzahl):
+    welt, bus = _umgebung(seed)
+    sensor = AHT21(bus)
+    bus.statistik_zuruecksetzen()
+    sim_ms, cpu_us = _messen(welt, sensor.measure, anzahl)
+    erg.eintragen("aht21.measure.latenz", sim_ms, "ms", "simzeit")
+    erg.eintragen("aht21.measure.cpu", cpu_us, "us", "cpu")
+    erg.bus("aht21.measure", bus, 0x38, anzahl)
+
+
+def bench_bh1750(erg, seed, anzahl):
+    welt, bus = _umgebung(seed)
+    sensor = BH1750(bus)
+    bus.statistik_zuruecksetzen()
+    sim_ms, cpu_us = _messen(welt, lambda: sensor.luminance(BH1750.ONCE_HIRES_1), anzahl)
+    erg.eintragen("bh1750.einzel.latenz", sim_ms, "ms", "simzeit")
+    erg.eintragen("bh1750.einzel.cpu", cpu_us, "us", "cpu")
+    erg.bus("bh1750.einzel", bus, 0x23, anzahl)
+
+    sensor.start_continuous(BH1750.CONT_HIRES_1)
+    bus.statistik_zuruecksetzen()
+
+    def dauerbetrieb():
+        welt.uhr.schlafen(sensor.remaining_ms() / 1000)
+        sensor.read_continuous()
+
+    sim_ms, cpu_us = _messen(welt, dauerbetrieb, anzahl)
+    erg.eintragen("bh1750.dauer.latenz", sim_ms, "ms", "simzeit")
+    erg.eintragen("bh1750.dauer.cpu", cpu_us, "us", "cpu")
+    erg.bus("bh1750.dauer", bus, 0x23, anzahl)
+
+
+def bench_vl53l0x(erg, seed, anzahl):
+    for cache in (False, True):
+        welt, bus = _umgebung(seed)
+        praefix = "vl53l0x" + (".cache" if cache else "")
+        cpu_start = time.perf_counter()
+        sensor = VL53L0X.VL53L0X(bus, cache=cache)
+        erg.eintragen(praefix + ".init.cpu", (time.perf_counter() - cpu_start) * 1e6, "us", "cpu")
+        erg.bus(praefix + ".init", bus, 0x29, 1)
+
+        bus.statistik_zuruecksetzen()
+        sim_ms, cpu_us = _messen(welt, sensor.read, anzahl)
+        erg.eintragen(praefix + ".einzel.latenz", sim_ms, "ms", "simzeit")
+        erg.eintragen(praefix + ".einzel.cpu", cpu_us, "us", "cpu")
+        erg.bus(praefix + ".einzel", bus, 0x29, anzahl)
+
+    # Dauerbetrieb: Kosten pro Messwert im Ringpuffer (ohne Leerabfragen des Timers)
+    sensor.start_continuous(size=16)
+    bus.statistik_zuruecksetzen()
+
+    def dauerbetrieb():
+        while not sensor.poll():
+            welt.uhr.schlafen(0.033)
+
+    welt.uhr.schlafen(0.033)
+    sim_ms, cpu_us = _messen(welt, dauerbetrieb, anzahl)
+    erg.eintragen("vl53l0x.cache.dauer.cpu", cpu_us, "us", "cpu")
+    erg.bus("vl53l0x.cache.dauer", bus, 0x29, anzahl)
+    sensor.stop_continuous()
+
+
+def bench_messzyklus(erg, seed, anzahl, zyklen):
+    welt, bus = _umgebung(seed)
+    aht = AHT21(bus)
+    bh = BH1750(bus)
+    tof = VL53L0X.VL53L0X(bus, cache=True)
+    tof.start_continuous(period=180, size=16, timer=Timer(0))
+    messzyklus = Messzyklus(tof, aht, bh, anzahl=anzahl)
+    messzyklus.messen()  # Einschwingen: Ringpuffer füllen
+
+    bus.statistik_zuruecksetzen()
+    sim_ms, cpu_us = _messen(welt, messzyklus.messen, zyklen)
+    erg.eintragen("messzyklus.dauer", sim_ms, "ms", "simzeit")
+    erg.eintragen("messzyklus.cpu", cpu_us / 1000, "ms", "cpu")
+    for name, adresse in (("aht21", 0x38), ("bh1750", 0x23), ("vl53l0x", 0x29)):
+        transaktionen, nbytes, _ = bus.statistik(adresse)
+        erg.eintragen("messzyklus.i2c_transaktionen." + name, transaktionen / zyklen, "1/Zyklus", "zaehler")
+        erg.eintragen("messzyklus.i2c_bytes." + name, nbytes / zyklen, "B/Zyklus", "zaehler")
+
+    # Heap pro Zyklus: Spitze während des Zyklus und was danach liegen bleibt
+    tracemalloc.start()
+    spitzen = []
+    zuwachs = []
+    for _ in range(zyklen):
+        vorher = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        messzyklus.messen()
+        jetzt, spitze = tracemalloc.get_traced_memory()
+        spitzen.append(spitze - vorher)
+        zuwachs.append(jetzt - vorher)
+    tracemalloc.stop()
+    erg.eintragen("messzyklus.heap_spitze", statistics.median(spitzen), "B", "heap")
+    erg.eintragen("messzyklus.heap_zuwachs", max(0, statistics.median(zuwachs)), "B", "heap")
+    tof.stop_continuous()
+
+
+def bench_hauptprogramm(erg, seed, runden):
+    """Das unveränderte Hauptprogramm im Simulator, gemessen pro Runde der Hauptschleife.
+
+    Eine Runde endet mit Aenderungsfilter.pruefen(); gesendet wird nur bei
+    Änderungen, daher die Nachrichten pro Runde als eigene Kennzahl.
+    """
+    welt = neue_welt(virtuell=True, seed=seed)
+    broker = Broker()
+    welt.broker = broker.starten()
+    ntp = NTPServer(uhrzeit=welt.uhr.zeit)
+    welt.ntp = ntp.starten()
+
+    zeitpunkte = []
+    nachrichten = []
+    gesendet = welt.nachricht_gesendet
+    pruefen = aenderungsfilter.Aenderungsfilter.pruefen
+
+    def mitschreiben(nbytes, paket_bytes=None):
+        nachrichten.append((nbytes, paket_bytes))
+        gesendet(nbytes, paket_bytes)
+
+    def runde(filter_, werte):
+        zeitpunkte.append((welt.uhr.monotonic(), time.perf_counter()))
+        if len(zeitpunkte) > runden:
+            raise uhr_modul.SimulationBeendet("%d Runden" % runden)
+        return pruefen(filter_, werte)
+
+    welt.nachricht_gesendet = mitschreiben
+    aenderungsfilter.Aenderungsfilter.pruefen = runde
+    cpu_start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            starte_simulation.programm_ausfuehren(starte_simulation.STANDARDPROGRAMM, welt)
+    finally:
+        aenderungsfilter.Aenderungsfilter.pruefen = pruefen
+        broker.stoppen()
+        ntp.stoppen()
+
+    erg.eintragen("hauptprogramm.start", zeitpunkte[0][0] * 1000, "ms", "simzeit")
+    erg.eintragen("hauptprogramm.start.cpu", (zeitpunkte[0][1] - cpu_start) * 1000, "ms", "cpu")
+    sim = [(b[0] - a[0]) * 1000 for a, b in zip(zeitpunkte, zeitpunkte[1:])]
+    cpu = [(b[1] - a[1]) * 1000 for a, b in zip(zeitpunkte, zeitpunkte[1:])]
+    erg.eintragen("hauptprogramm.schleife", statistics.median(sim), "ms", "simzeit")
+    erg.eintragen("hauptprogramm.schleife.cpu", statistics.median(cpu), "ms", "cpu")
+    erg.eintragen("mqtt.nachrichten", len(nachrichten) / runden, "1/Runde", "zaehler")
+    erg.eintragen("mqtt.nutzdaten", sum(n[0] for n in nachrichten) / runden, "B/Runde", "zaehler")
+    erg.eintragen("mqtt.paket", sum(n[1] for n in nachrichten) / runden, "B/Runde", "zaehler")
+
+
+class _Befehl:
+    """Timer der Simulationsuhr, der zum Zeitpunkt faellig einen Schaltbefehl sendet.
+
+    Nach dem Senden wird (in Echtzeit) gewartet, bis der Broker die Nachricht
+    an das Gerät zugestellt hat. Im virtuellen Betrieb liegt sie dann zum
+    Sendezeitpunkt schon am Socket des Geräts an, die gemessene Latenz ist
+    allein die Reaktionszeit des Programms.
+    """
+
+    def __init__(self, welt, broker, client, faellig, wert, befehl_id):
+        self.welt = welt
+        self.broker = broker
+        self.client = client
+        self.faellig = faellig
+        self.wert = wert
+        self.befehl_id = befehl_id
+
+    def ausloesen(self, jetzt):
+        self.welt.uhr.timer_abmelden(self)
+        zugestellt = self.broker.nachrichten_aus
+        topic = flotte.topic(flotte.geraete_id(self.welt.mac), "cmd/pump")
+        self.client.publish(topic, json.dumps({"Schalter1": self.wert, "ID": self.befehl_id}), qos=1)
+        frist = time.perf_counter() + 1.0
+        while self.broker.nachrichten_aus == zugestellt and time.perf_counter() < frist:
+            uhr_modul._echt_schlafen(0.0005)
+
+
+def bench_befehle(erg, seed, anzahl):
+    """Latenz vom Eintreffen eines Schaltbefehls bis zum Umschalten des Relais (simulierte Zeit).
+
+    Die Befehle (abwechselnd ON und OFF) kommen zu zufälligen Zeitpunkten,
+    also in allen Phasen der Hauptschleife (Messzyklus, Senden, Warten).
+    """
+    welt = neue_welt(virtuell=True, seed=seed)
+    broker = Broker()
+    welt.broker = broker.starten()
+    zufall = random.Random(seed)
+    client = MQTTClient(b"benchmark", welt.broker[0], port=welt.broker[1])
+    client.connect()
+    befehle = []
+    zeitpunkt = 5.0
+    for i in range(anzahl):
+        zeitpunkt += zufall.uniform(2.0, 4.0)
+        befehl = _Befehl(welt, broker, client, zeitpunkt, "ON" if i % 2 == 0 else "OFF", i + 1)
+        befehle.append(befehl)
+        welt.uhr.timer_anmelden(befehl)
+    welt.uhr.ende = zeitpunkt + 3.0
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            starte_simulation.programm_ausfuehren(starte_simulation.STANDARDPROGRAMM, welt)
+    finally:
+        client.disconnect()
+        broker.stoppen()
+
+    latenzen = []
+    for befehl in befehle:
+        schaltung = [t for t, wert in welt.schaltvorgaenge
+                     if t >= befehl.faellig and wert == (befehl.wert == "ON")]
+        latenzen.append((schaltung[0] - befehl.faellig) * 1000 if schaltung else float("inf"))
+    erg.eintragen("befehle.latenz.median", statistics.median(latenzen), "ms", "simzeit")
+    erg.eintragen("befehle.latenz.max", max(latenzen), "ms", "simzeit")
+
+
+def bench_telemetrie(erg, anzahl):
+    """JSON gegen Binärformat: Größe, Rechenzeit und Speicher pro Nachricht."""
+    daten = {"Fuellstand": 149, "Temperatur": 22, "Luftfeuchtigkeit": 50, "Helligkeit": 796, "Bodenfeuchtigkeit": 45}
+    werte = [daten[feld] for feld in telemetrie_format.FELDER]
+    puffer = bytearray(telemetrie_format.GROESSE)
+    zeit = 1700000000
+
+    def json_kodieren():
+        return json.dumps(dict(zip(telemetrie_format.FELDER, werte)))
+
+    def binaer_kodieren():
+        return telemetrie_format.kodieren(zeit, *werte, puffer=puffer)
+
+    text = json_kodieren()
+    binaer = bytes(binaer_kodieren())
+    faelle = (
+        ("json", json_kodieren, lambda: json.loads(text), len(text)),
+        ("binaer", binaer_kodieren, lambda: telemetrie_format.dekodieren(binaer), len(binaer)),
+    )
+    for name, kodieren, dekodieren, groesse in faelle:
+        erg.eintragen("telemetrie.%s.bytes" % name, groesse, "B/Nachricht", "zaehler")
+        for schritt, funktion in (("kodieren", kodieren), ("dekodieren", dekodieren)):
+            start = time.perf_counter()
+            for _ in range(anzahl * 50):
+                funktion()
+            erg.eintragen("telemetrie.%s.%s.cpu" % (name, schritt),
+                          (time.perf_counter() - start) / (anzahl * 50) * 1e6, "us", "cpu")
+        tracemalloc.start()
+        kodieren()
+        vorher = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        ergebnis = kodieren()
+        spitze = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del ergebnis
+        erg.eintragen("telemetrie.%s.kodieren.heap" % name, spitze - vorher, "B", "heap")
+
+
+def _paketgroesse(topic, nutzdaten):
+    """Größe eines MQTT-PUBLISH-Pakets mit QoS 0."""
+    rest = 2 + len(topic) + nutzdaten
+    return 1 + (1 if rest < 128 else 2 if rest < 16384 else 3) + rest
+
+
+def bench_stapel(erg, anzahl):
+    """Stapelbetrieb: Bytes pro Messung gegenüber einer Binärnachricht pro Messung."""
+    geraet = flotte.geraete_id(neue_welt(virtuell=True).mac)
+    topic = flotte.topic(geraet, "Stapel")
+    stapel = Telemetriestapel(topic, max_anzahl=anzahl)
+    for i in range(anzahl):
+        stapel.hinzufuegen(1700000000 + i, 149, 22, 50, 796, 45)
+    groesse = len(stapel.nachricht(1700000000 + anzahl))
+    erg.eintragen("telemetrie.stapel.bytes", groesse / anzahl, "B/Messung", "zaehler")
+    erg.eintragen("telemetrie.stapel.paket", _paketgroesse(topic, groesse) / anzahl, "B/Messung", "zaehler")
+    erg.eintragen("telemetrie.binaer.paket", _paketgroesse(flotte.topic(geraet, "Binaer"),
+                                                           telemetrie_format.GROESSE), "B/Messung", "zaehler")
+
+
+def alle_ausfuehren(seed=1, anzahl=20, zyklen=5, runden=100):
+    erg = Ergebnisse()
+    bench_aht(erg, seed, anzahl)
+    bench_bh1750(erg, seed, anzahl)
+    bench_vl53l0x(erg, seed, anzahl)
+    bench_messzyklus(erg, seed, 10, zyklen)
+    bench_hauptprogramm(erg, seed, runden)
+    bench_befehle(erg, seed, anzahl)
+    bench_telemetrie(erg, anzahl)
+    bench_stapel(erg, anzahl)
+    return {
+        "format": FORMAT_VERSION,
+        "seed": seed,
+        "python": sys.version.split()[0],
+        "werte": erg.werte,
+    }
+
+
+def vergleichen(aktuell, baseline, cpu_toleranz=None):
+    """Gibt die Liste der Verschlechterungen gegenüber der Baseline zurück."""
+    toleranzen = dict(TOLERANZ, cpu=cpu_toleranz)
+    regressionen = []
+    for name, alt in baseline["werte"].items():
+        neu = aktuell["werte"].get(name)
+        if neu is None:
+            regressionen.append("%s: fehlt" % name)
+            continue
+        toleranz = toleranzen.get(alt["art"])
+        if toleranz is None:
+            continue
+        grenze = alt["wert"] * (1 + toleranz) + 1e-6
+        if neu["wert"] > grenze:
+            regressionen.append("%s: %.3f %s statt %.3f (Grenze %.3f)"
+                                % (name, neu["wert"], neu["einheit"], alt["wert"], grenze))
+    return regressionen
+
+
+def ausgeben(ergebnis, baseline=None):
+    alt = baseline["werte"] if baseline else {}
+    for name, eintrag in sorted(ergebnis["werte"].items()):
+        zeile = "%-42s %12.3f %-12s" % (name, eintrag["wert"], eintrag["einheit"])
+        if name in alt and alt[name]["wert"]:
+            zeile += " %+7.1f %%" % ((eintrag["wert"] / alt[name]["wert"] - 1) * 100)
+        print(zeile)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BloomBuddy-Benchmarks gegen den Simulator")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--anzahl", type=int, default=20, help="Messwerte pro Sensor-Benchmark")
+    parser.add_argument("--zyklen", type=int, default=5, help="Messzyklen")
+    parser.add_argument("--runden", type=int, default=100, help="Runden der Hauptschleife")
+    parser.add_argument("--json", help="Ergebnisse als JSON in diese Datei schreiben")
+    parser.add_argument("--speichern", help="Ergebnisse als neue Baseline speichern")
+    parser.add_argument("--vergleichen", help="mit dieser Baseline vergleichen")
+    parser.add_argument("--cpu-toleranz", type=float, default=None,
+                        help="Rechenzeiten ebenfalls prüfen (z. B. 0.5 = +50 %%)")
+    args = parser.parse_args(argv)
+    # Der Simulator wechselt in sein Flash-Verzeichnis, Pfade vorher festhalten
+    for name in ("json", "speichern", "vergleichen"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    ergebnis = alle_ausfuehren(args.seed, args.anzahl, args.zyklen, args.runden)
+
+    baseline = None
+    if args.vergleichen:
+        with open(args.vergleichen, encoding="utf-8") as datei:
+            baseline = json.load(datei)
+    ausgeben(ergebnis, baseline)
+
+    for pfad in (args.json, args.speichern):
+        if pfad:
+            with open(pfad, "w", encoding="utf-8") as datei:
+                json.dump(ergebnis, datei, indent=2, sort_keys=True)
+                datei.write("\n")
+
+    if baseline is not None:
+        regressionen = vergleichen(ergebnis, baseline, args.cpu_toleranz)
+        if regressionen:
+            print("\nVerschlechterungen gegenüber", args.vergleichen)
+            for zeile in regressionen:
+                print("  " + zeile)
+            return 1
+        print("\nKeine Verschlechterung gegenüber", args.vergleichen)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,7 @@ import ustruct
 import utime
 from machine import Timer
 import time
+from array import array
 
 _IO_TIMEOUT = 1000
 _SYSRANGE_START = const(0x00)
@@ -21,6 +22,12 @@ _RESULT_INTERRUPT_STATUS = const(0x13)
 _RESULT_RANGE_STATUS = const(0x14)
 _OSC_CALIBRATE = const(0xf8)
 _MEASURE_PERIOD = const(0x04)
+_NO_BURST = (0x00, 0x80, 0xff)
+_PAGE_SELECT = const(0xff)
+# registers that change by themselves or trigger actions, never cached
+# (0x91 on page 1 is the stop variable, rewritten before every start)
+_VOLATILE = (0x00, 0x0b, 0x13, 0x14, 0x15, 0x16, 0x17, 0x18, 0x19, 0x1a,
+             0x1b, 0x1c, 0x1d, 0x1e, 0x1f, 0x80, 0x83, 0x91, 0x92)
 
 SYSRANGE_START = 0x00
 
@@ -110,11 +117,27 @@ class TimeoutError(RuntimeError):
 
 
 class VL53L0X:
-    def __init__(self, i2c, address=0x29):
+    def __init__(self, i2c, address=0x29, cache=False):
         self.i2c = i2c
         self.address = address
+        self._byte = bytearray(1)
+        self._word = bytearray(2)
+        self._scratch = {'6B': bytearray(6)}
+        # optional write-through shadow of the page 0/1 registers
+        self._shadow = {} if cache else None
+        self._page = None
+        self.cache_hits = 0
         self.init()
         self._started = False
+        self._buffer = None
+        self._buffer_head = 0
+        self._buffer_count = 0
+        # readings stored since start_continuous(), keeps counting when the buffer is full
+        self.total = 0
+        self.poll_ms = None
+        # timer ticks skipped because the shared bus was locked
+        self.skipped = 0
+        self._timer = None
         self.measurement_timing_budget_us = 0
         self.set_measurement_timing_budget(self.measurement_timing_budget_us)
         self.enables = {"tcc": 0,
@@ -135,14 +158,60 @@ class VL53L0X:
 
     def _registers(self, register, values=None, struct='B'):
         if values is None:
-            size = ustruct.calcsize(struct)
-            data = self.i2c.readfrom_mem(self.address, register, size)
-            values = ustruct.unpack(struct, data)
+            buffer = self._scratch.get(struct)
+            if buffer is None:
+                buffer = bytearray(ustruct.calcsize(struct))
+            self.i2c.readfrom_mem_into(self.address, register, buffer)
+            self._shadow_store(register, buffer)
+            values = ustruct.unpack(struct, buffer)
             return values
         data = ustruct.pack(struct, *values)
         self.i2c.writeto_mem(self.address, register, data)
+        self._shadow_store(register, data)
 
     def _register(self, register, value=None, struct='B'):
+        # fast paths for 8 and 16 bit registers with preallocated buffers
+        if struct == 'B':
+            shadow = self._shadow
+            key = self._shadow_key(register)
+            if key is not None:
+                if shadow.get(key) is not None and (value is None or shadow[key] == value):
+                    # known value: answer from RAM, skip redundant writes
+                    self.cache_hits += 1
+                    if value is None:
+                        return shadow[key]
+                    return
+            elif shadow is not None and register == _PAGE_SELECT and value is not None:
+                if value == self._page:
+                    self.cache_hits += 1
+                    return
+                # unknown until the write went through, nothing is cached meanwhile
+                self._page = None
+            buffer = self._byte
+            if value is None:
+                self.i2c.readfrom_mem_into(self.address, register, buffer)
+                if key is not None:
+                    shadow[key] = buffer[0]
+                return buffer[0]
+            buffer[0] = value
+            self.i2c.writeto_mem(self.address, register, buffer)
+            if key is not None:
+                shadow[key] = value
+            elif shadow is not None and register == _PAGE_SELECT:
+                self._page = value
+            return
+        if struct == '>H':
+            buffer = self._word
+            if value is None:
+                self.i2c.readfrom_mem_into(self.address, register, buffer)
+                self._shadow_store(register, buffer)
+                return buffer[0] << 8 | buffer[1]
+            value = int(value)
+            buffer[0] = value >> 8 & 0xFF
+            buffer[1] = value & 0xFF
+            self.i2c.writeto_mem(self.address, register, buffer)
+            self._shadow_store(register, buffer)
+            return
         if value is None:
             return self._registers(register, struct=struct)[0]
         self._registers(register, (value,), struct=struct)
@@ -159,10 +228,64 @@ class VL53L0X:
         self._register(register, data)
 
     def _config(self, *config):
-        for register, value in config:
-            self._register(register, value)
+        # consecutive registers are written as one burst (auto increment),
+        # page select, power force and start registers always on their own
+        count = len(config)
+        i = 0
+        while i < count:
+            register, value = config[i]
+            end = i + 1
+            if register not in _NO_BURST:
+                while (end < count and config[end][0] == register + end - i
+                       and config[end][0] not in _NO_BURST):
+                    end += 1
+            if end - i == 1:
+                self._register(register, value)
+            else:
+                data = bytearray(end - i)
+                for j in range(i, end):
+                    data[j - i] = config[j][1]
+                self.i2c.writeto_mem(self.address, register, data)
+                self._shadow_store(register, data)
+            i = end
+
+    def _shadow_key(self, register):
+        if (self._shadow is None or register == _PAGE_SELECT
+                or register in _VOLATILE or self._page not in (0, 1)):
+            return None
+        return self._page << 8 | register
+
+    def _shadow_store(self, register, data):
+        if self._shadow is None:
+            return
+        for i in range(len(data)):
+            key = self._shadow_key(register + i)
+            if key is not None:
+                self._shadow[key] = data[i]
+
+    def invalidate_cache(self):
+        # forget all shadowed registers, e.g. after a reset of the sensor
+        if self._shadow is not None:
+            self._shadow.clear()
+        self._page = None
+
+    def _load_stop_variable(self, power_force=True):
+        # page 1 register 0x91, always written like in the ST/Pololu sequence:
+        # the sensor may change it internally
+        if power_force:
+            self._register(0x80, 0x01)
+        self._config(
+            (0xFF, 0x01),
+            (0x00, 0x00),
+            (0x91, self._stop_variable),
+            (0x00, 0x01),
+            (0xFF, 0x00),
+        )
+        if power_force:
+            self._register(0x80, 0x00)
 
     def init(self, power2v8=True):
+        self.invalidate_cache()
         self._flag(_EXTSUP_HV, 0, power2v8)
 
         # I2C standard mode
@@ -379,15 +502,7 @@ class VL53L0X:
         self._register(_SYSRANGE_START, 0x00)
 
     def start(self, period=0):
-        self._config(
-            (0x80, 0x01),
-            (0xFF, 0x01),
-            (0x00, 0x00),
-            (0x91, self._stop_variable),
-            (0x00, 0x01),
-            (0xFF, 0x00),
-            (0x80, 0x00),
-        )
+        self._load_stop_variable()
         if period:
             oscilator = self._register(_OSC_CALIBRATE, struct='>H')
             if oscilator:
@@ -400,27 +515,13 @@ class VL53L0X:
 
     def stop(self):
         self._register(_SYSRANGE_START, 0x01)
-        self._config(
-            (0xFF, 0x01),
-            (0x00, 0x00),
-            (0x91, self._stop_variable),
-            (0x00, 0x01),
-            (0xFF, 0x00),
-        )
+        self._load_stop_variable(power_force=False)
         self._started = False
 
     def read(self):
         if not self._started:
-            self._config(
-                (0x80, 0x01),
-                (0xFF, 0x01),
-                (0x00, 0x00),
-                (0x91, self._stop_variable),
-                (0x00, 0x01),
-                (0xFF, 0x00),
-                (0x80, 0x00),
-                (_SYSRANGE_START, 0x01),
-            )
+            self._load_stop_variable()
+            self._register(_SYSRANGE_START, 0x01)
             for timeout in range(_IO_TIMEOUT):
                 if not self._register(_SYSRANGE_START) & 0x01:
                     break
@@ -437,6 +538,89 @@ class VL53L0X:
         self._register(_INTERRUPT_CLEAR, 0x01)
         return value
 
+    def start_continuous(self, period=0, size=16, timer=None, poll_ms=None):
+        # ring buffer of the newest readings, filled by poll()
+        self._buffer = array('H', [0] * size)
+        self._buffer_head = 0
+        self._buffer_count = 0
+        self.total = 0
+        self.start(period)
+        if timer is not None:
+            if poll_ms is None:
+                # one poll per measurement: with period=0 the sensor measures
+                # back-to-back, once per timing budget (default about 33 ms)
+                poll_ms = period or (self.measurement_timing_budget_us or 33000) // 1000
+            self.poll_ms = poll_ms
+            self._timer = timer
+            timer.init(period=poll_ms, mode=Timer.PERIODIC,
+                       callback=self._poll_callback)
+
+    def stop_continuous(self):
+        if self._timer is not None:
+            self._timer.deinit()
+            self._timer = None
+        self.stop()
+
+    def _poll_callback(self, timer):
+        # a shared I2CBus (i2cbus.py) is locked without waiting: if a task
+        # holds it, this tick is skipped and the reading is fetched next time
+        bus = self.i2c
+        lockable = hasattr(bus, 'sperren')
+        if lockable and not bus.sperren(warten=False):
+            self.skipped += 1
+            return
+        try:
+            self.poll()
+        except OSError:
+            pass
+        finally:
+            if lockable:
+                bus.freigeben()
+
+    def poll(self):
+        # non-blocking: store a finished measurement, if there is one
+        if not self._register(_RESULT_INTERRUPT_STATUS) & 0x07:
+            return False
+        value = self._register(_RESULT_RANGE_STATUS + 10, struct='>H')
+        self._register(_INTERRUPT_CLEAR, 0x01)
+        buffer = self._buffer
+        buffer[self._buffer_head] = value
+        self._buffer_head = (self._buffer_head + 1) % len(buffer)
+        if self._buffer_count < len(buffer):
+            self._buffer_count += 1
+        self.total += 1
+        return True
+
+    def wait_count(self, n=1, timeout_ms=1000):
+        # blocking wait until the ring buffer holds n readings, False on timeout
+        # (sensor does not answer, timer not running)
+        start = utime.ticks_ms()
+        while self._buffer_count < n:
+            if utime.ticks_diff(utime.ticks_ms(), start) >= timeout_ms:
+                return False
+            utime.sleep_ms(10)
+        return True
+
+    @property
+    def count(self):
+        return self._buffer_count
+
+    def read_latest(self):
+        if not self._buffer_count:
+            return None
+        return self._buffer[self._buffer_head - 1]
+
+    def read_n(self, n, target=None):
+        # newest n readings (oldest first), appended to target if given
+        if target is None:
+            target = []
+        buffer = self._buffer
+        n = min(n, self._buffer_count)
+        index = self._buffer_head - n
+        for i in range(n):
+            target.append(buffer[index + i])
+        return target
+
     def set_signal_rate_limit(self, limit_Mcps):
         if limit_Mcps < 0 or limit_Mcps > 511.99:
             return False
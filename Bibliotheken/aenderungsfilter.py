@@ -0,0 +1,138 @@
+"""Änderungsgesteuertes Senden der Messwerte mit Totband und Schlüsselbildern.
+
+Bisher ging jede Runde eine Nachricht mit allen fünf Messwerten raus, auch
+wenn sich nichts geändert hatte; jede davon wurde in Node-RED zu einem
+INSERT und zu fünf neu gezeichneten Diagrammen.
+
+Der Änderungsfilter vergleicht jeden Messwert mit dem zuletzt gesendeten:
+- liegt die Abweichung innerhalb des Totbands des Feldes, wird er nicht
+  gesendet
+- sonst enthält die Nachricht nur die geänderten Felder (Delta)
+- spätestens alle schluesselbild_ms und nach erzwingen() (z. B. nach einem
+  Verbindungsabbruch) geht ein Schlüsselbild mit allen Feldern und
+  "Voll": true raus, damit Empfänger ihren Zustand neu aufbauen können
+
+Das Totband eines Feldes ist (absolut, relativ): ein Wert gilt als geändert,
+wenn er um mehr als max(absolut, relativ * |letzter Wert|) abweicht. Der
+relative Anteil ist für die Helligkeit gedacht (5 lx sind nachts viel,
+mittags nichts).
+
+Auf der Empfängerseite setzt Zustand die Deltas wieder zu vollständigen
+Messwerten zusammen (in Node-RED: Function-Node "Zustand zusammensetzen").
+"""
+
+try:
+    from utime import ticks_ms, ticks_add, ticks_diff
+except ImportError:
+    # CPython (Server/ingest.py verwendet Zustand)
+    from time import monotonic
+
+    def ticks_ms():
+        return int(monotonic() * 1000)
+
+    def ticks_add(a, b):
+        return a + b
+
+    def ticks_diff(a, b):
+        return a - b
+
+from telemetrie_format import FELDER
+
+# Standard-Totbänder (absolut, relativ) in den Einheiten der JSON-Nachricht
+TOTBAENDER = {
+    "Fuellstand": (5, 0),           # mm
+    "Temperatur": (0.2, 0),         # °C
+    "Luftfeuchtigkeit": (1, 0),     # %
+    "Helligkeit": (2, 0.1),         # lx, 10 % vom letzten Wert
+    "Bodenfeuchtigkeit": (1, 0),    # %
+}
+
+# Kennzeichen für Schlüsselbilder in der Nachricht
+VOLL = "Voll"
+
+
+class Aenderungsfilter:
+    """Entscheidet pro Runde, ob und welche Felder gesendet werden."""
+
+    def __init__(self, totbaender=None, schluesselbild_ms=600000):
+        self.totbaender = TOTBAENDER if totbaender is None else totbaender
+        self.schluesselbild_ms = schluesselbild_ms
+        self._gesendet = {}
+        self._naechstes_schluesselbild = ticks_ms()
+        self._voll = True
+        # Statistik
+        self.runden = 0
+        self.nachrichten = 0
+        self.schluesselbilder = 0
+
+    def erzwingen(self):
+        """Die nächste Nachricht wird ein Schlüsselbild (z. B. nach fehlgeschlagenem Senden)."""
+        self._voll = True
+
+    def _geaendert(self, feld, wert):
+        if feld not in self._gesendet:
+            return True
+        alt = self._gesendet[feld]
+        if wert is None or alt is None:
+            return wert is not alt
+        absolut, relativ = self.totbaender.get(feld, (0, 0))
+        return abs(wert - alt) > max(absolut, relativ * abs(alt))
+
+    def pruefen(self, werte):
+        """Gibt die zu sendende Nachricht (dict) zurück oder None, wenn nichts zu senden ist.
+
+        werte ist ein dict in der Form der JSON-Nachricht. Die gesendeten
+        Werte gelten ab jetzt als Vergleichsbasis; schlägt das Senden fehl,
+        sollte erzwingen() aufgerufen werden.
+        """
+        self.runden += 1
+        if not self._voll and ticks_diff(ticks_ms(), self._naechstes_schluesselbild) >= 0:
+            self._voll = True
+        if self._voll:
+            nachricht = {}
+            for feld in FELDER:
+                nachricht[feld] = werte.get(feld)
+            nachricht[VOLL] = True
+            self._voll = False
+            self._naechstes_schluesselbild = ticks_add(ticks_ms(), self.schluesselbild_ms)
+            self.schluesselbilder += 1
+        else:
+            nachricht = None
+            for feld in FELDER:
+                wert = werte.get(feld)
+                if self._geaendert(feld, wert):
+                    if nachricht is None:
+                        nachricht = {}
+                    nachricht[feld] = wert
+            if nachricht is None:
+                return None
+        for feld in nachricht:
+            if feld != VOLL:
+                self._gesendet[feld] = nachricht[feld]
+        self.nachrichten += 1
+        return nachricht
+
+
+class Zustand:
+    """Empfängerseite: baut aus Schlüsselbildern und Deltas die vollständigen Messwerte auf."""
+
+    def __init__(self):
+        self.werte = {}
+        self.synchron = False
+
+    def uebernehmen(self, nachricht):
+        """Verarbeitet eine Nachricht und gibt die vollständigen Messwerte zurück.
+
+        Bis zum ersten Schlüsselbild ist das Ergebnis None (der Zustand
+        wäre unvollständig). Nachrichten ohne "Voll" und mit allen Feldern
+        (ältere Geräte) gelten ebenfalls als Schlüsselbild.
+        """
+        if nachricht.get(VOLL) or all(feld in nachricht for feld in FELDER):
+            self.werte = {}
+            self.synchron = True
+        for feld in FELDER:
+            if feld in nachricht:
+                self.werte[feld] = nachricht[feld]
+        if not self.synchron:
+            return None
+        return dict(self.werte)
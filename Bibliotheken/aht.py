@@ -16,11 +16,12 @@ __maintainer__ = "Jonathan Fromentin"
 
 # Konstanten
 AHT_I2C_ADDR = const(0x38)  # Standard I2C-Adresse für AHT20/AHT21
-AHT_STATUS_BUSY = const(0x01)  # Status-Bit für "busy"
-AHT_STATUS_CALIBRATED = const(0x10)  # Status-Bit für "calibrated"
+AHT_STATUS_BUSY = const(0x80)  # Status-Bit 7 für "busy" (laut Datenblatt)
+AHT_STATUS_CALIBRATED = const(0x08)  # Status-Bit 3 für "calibrated" (laut Datenblatt)
 AHT_CMD_INIT = const(0xBE)  # Initialisierungsbefehl
 AHT_CMD_TRIGGER = const(0xAC)  # Messbefehl
 AHT_CMD_RESET = const(0xBA)  # Software-Reset-Befehl
+AHT_MEASURE_MS = const(75)  # Typische Messdauer in ms
 
 class AHT21:
     """ Klasse für den AHT21-Sensor. """
@@ -31,6 +32,7 @@ class AHT21:
         self.address = address
         self.temperature = None
         self.humidity = None
+        self._raw_data = bytearray(6)
 
         # Warten, bis der Sensor bereit ist
         time.sleep(0.04)  # 40ms nach dem Einschalten warten
@@ -69,16 +71,31 @@ class AHT21:
         except OSError:
             pass
 
-    def measure(self):
-        """Führt eine Messung durch und speichert Temperatur und Luftfeuchtigkeit."""
+    def trigger(self):
+        """Startet eine Messung, ohne auf das Ergebnis zu warten."""
         try:
-            # Messbefehl senden
             self.i2c.writeto(self.address, bytes([AHT_CMD_TRIGGER, 0x33, 0x00]))
-            time.sleep(0.08)  # 80ms warten
+            return True
+        except OSError:
+            return False
+
+    def ready(self):
+        """Prüft anhand des Busy-Bits (Bit 7 im Statusbyte), ob die Messung abgeschlossen ist."""
+        return not self._status() & AHT_STATUS_BUSY
+
+    def collect(self):
+        """Liest die Messwerte einer abgeschlossenen Messung und speichert sie.
 
-            # Daten lesen
-            raw_data = bytearray(6)
+        Gibt False zurück, wenn der Sensor noch misst (Busy-Bit im ersten Byte),
+        die Messwerte sind dann None statt der Werte der vorigen Messung.
+        """
+        try:
+            raw_data = self._raw_data
             self.i2c.readfrom_into(self.address, raw_data)
+            if raw_data[0] & AHT_STATUS_BUSY:
+                self.humidity = None
+                self.temperature = None
+                return False
 
             # Daten umwandeln
             raw_hum = (raw_data[1] << 12) | (raw_data[2] << 4) | (raw_data[3] >> 4)
@@ -92,4 +109,19 @@ class AHT21:
         except OSError:
             self.humidity = None
             self.temperature = None
-            return False
\ No newline at end of file
+            return False
+
+    def measure(self):
+        """Führt eine Messung durch und speichert Temperatur und Luftfeuchtigkeit."""
+        if not self.trigger():
+            self.humidity = None
+            self.temperature = None
+            return False
+
+        # Messung dauert laut Datenblatt ca. 80ms, danach Busy-Bit abfragen
+        time.sleep(AHT_MEASURE_MS / 1000)
+        for _ in range(10):
+            if self.ready():
+                break
+            time.sleep(0.005)  # 5ms warten
+        return self.collect()
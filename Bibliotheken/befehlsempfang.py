@@ -0,0 +1,122 @@
+"""Schaltbefehle sofort verarbeiten, sobald sie am Socket anliegen (select.poll).
+
+Bisher wurden MQTT-Nachrichten nur bei client.check_msg() gelesen, und das
+lag verstreut in der Hauptschleife. Während time.sleep(1) am Ende jeder
+Runde wurde gar nicht nachgesehen, ein Befehl vom Dashboard wartete dann
+bis zu einer Sekunde.
+
+Befehlsempfang meldet den Socket der MQTT-Sitzung bei select.poll() an:
+- warten_ms() ersetzt sleep: es wartet auf dem Socket und ruft die
+  MQTT-Callbacks auf, sobald Daten ankommen, nicht erst nach Ablauf der Zeit
+- pruefen() sieht ohne zu warten nach (ein poll-Aufruf, kein Lesen vom
+  Socket, solange nichts anliegt) und ist damit billig genug für kurze
+  Abstände, z. B. alle 10 ms im Messzyklus (check_msg() ist ein Alias,
+  daher kann Befehlsempfang als client an Messzyklus übergeben werden)
+
+Mit beobachten() lassen sich weitere Sockets anmelden, deren Funktion
+aufgerufen wird, sobald sie lesbar sind (z. B. die Antwort des NTP-Servers,
+siehe uhrzeit.py), auch ohne MQTT-Verbindung. So wartet die Hauptschleife
+nirgends sonst auf das Netz.
+
+Ohne Verbindung wird wie bisher check_msg() der Sitzung aufgerufen, damit
+der Neuaufbau nach Backoff weiterläuft. Keepalive-Pings laufen ebenfalls
+über check_msg(), spätestens alle keepalive_ms.
+"""
+
+try:
+    import uselect as select
+except ImportError:
+    import select
+
+from utime import ticks_ms, ticks_add, ticks_diff
+
+# Ohne Verbindung höchstens so lange am Stück schlafen, dann Neuaufbau versuchen
+_OHNE_VERBINDUNG_MS = 100
+
+
+class Befehlsempfang:
+    def __init__(self, sitzung, keepalive_ms=1000):
+        self.sitzung = sitzung
+        self.keepalive_ms = keepalive_ms
+        self._poll = select.poll()
+        self._sock = None
+        # Weitere Sockets: [(sock, funktion)], funktion() wird aufgerufen, wenn sock lesbar ist
+        self._weitere = []
+        self._gepflegt = ticks_ms()
+        # Statistik
+        self.aufwachen = 0
+
+    def _anmelden(self):
+        """Meldet den aktuellen Socket an (nach einem Neuaufbau ist es ein anderer)."""
+        sock = self.sitzung.socket()
+        if sock is not self._sock:
+            # Neues poll-Objekt statt unregister: der alte Socket ist bereits
+            # geschlossen und würde sonst dauerhaft als "ungültig" gemeldet
+            self._poll = select.poll()
+            if sock is not None:
+                self._poll.register(sock, select.POLLIN)
+            for weiterer, _ in self._weitere:
+                self._poll.register(weiterer, select.POLLIN)
+            self._sock = sock
+        return sock
+
+    def beobachten(self, sock, funktion):
+        """Ruft funktion() auf, sobald sock lesbar ist (während pruefen() und warten_ms())."""
+        self._weitere.append((sock, funktion))
+        self._poll.register(sock, select.POLLIN)
+
+    def _pollen(self, timeout_ms):
+        """Wartet höchstens timeout_ms, bedient weitere Sockets; True, wenn der MQTT-Socket lesbar ist."""
+        mqtt = False
+        for ereignis in self._poll.poll(timeout_ms):
+            for sock, funktion in self._weitere:
+                if ereignis[0] is sock:
+                    funktion()
+                    break
+            else:
+                mqtt = True
+        return mqtt
+
+    def _verarbeiten(self):
+        """Liest alle anliegenden Nachrichten (jede löst ggf. den Callback aus)."""
+        self.aufwachen += 1
+        while True:
+            self.sitzung.check_msg()
+            self._gepflegt = ticks_ms()
+            if self._anmelden() is None or not self._pollen(0):
+                return
+
+    def pruefen(self, timeout_ms=0):
+        """Wartet höchstens timeout_ms auf Daten und verarbeitet sie.
+
+        Gibt True zurück, wenn Nachrichten gelesen wurden.
+        """
+        if self._anmelden() is None:
+            self._pollen(0)
+            self.sitzung.check_msg()
+            return False
+        if self._pollen(timeout_ms):
+            self._verarbeiten()
+            return True
+        if ticks_diff(ticks_ms(), self._gepflegt) >= self.keepalive_ms:
+            # Keepalive und Erkennung toter Verbindungen
+            self.sitzung.check_msg()
+            self._gepflegt = ticks_ms()
+        return False
+
+    def check_msg(self):
+        """Wie MQTTClient.check_msg(), aber nur mit Socketzugriff, wenn Daten anliegen."""
+        self.pruefen(0)
+
+    def warten_ms(self, ms):
+        """Wartet ms Millisekunden und verarbeitet eintreffende Nachrichten sofort."""
+        ende = ticks_add(ticks_ms(), ms)
+        while True:
+            rest = ticks_diff(ende, ticks_ms())
+            if rest <= 0:
+                return
+            if self._anmelden() is None:
+                self._pollen(min(rest, _OHNE_VERBINDUNG_MS))
+                self.sitzung.check_msg()
+            else:
+                self.pruefen(min(rest, self.keepalive_ms))
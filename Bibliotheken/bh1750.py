@@ -3,7 +3,7 @@
 Micropython BH1750 ambient light sensor driver.
 """
 
-from utime import sleep_ms
+from utime import sleep_ms, ticks_ms, ticks_add, ticks_diff
 
 
 class BH1750():
@@ -26,6 +26,8 @@ class BH1750():
     def __init__(self, bus, addr=0x23):
         self.bus = bus
         self.addr = addr
+        self._buf = bytearray(2)
+        self._ready_at = None
         self.off()
         self.reset()
 
@@ -44,6 +46,7 @@ class BH1750():
 
     def set_mode(self, mode):
         """Set sensor mode."""
+        self._ready_at = None
         self.mode = mode
         self.bus.writeto(self.addr, bytes([self.mode]))
 
@@ -59,4 +62,49 @@ class BH1750():
         sleep_ms(24 if mode in (0x13, 0x23) else 180)
         data = self.bus.readfrom(self.addr, 2)
         factor = 2.0 if mode in (0x11, 0x21) else 1.0
-        return (data[0]<<8 | data[1]) / (1.2 * factor)
\ No newline at end of file
+        return (data[0]<<8 | data[1]) / (1.2 * factor)
+
+    @staticmethod
+    def conversion_ms(mode):
+        """Maximum conversion time (ms) of the given mode."""
+        return 24 if mode in (0x13, 0x23) else 180
+
+    def start_continuous(self, mode=CONT_HIRES_1):
+        """Switch to a continuous mode, the mode command is only sent once.
+
+        Use CONT_LOWRES as fast path (24 ms per conversion, 4 lx resolution).
+        """
+        if mode != self.mode:
+            self.set_mode(mode)
+        # first result is available after one full conversion
+        self._ready_at = ticks_add(ticks_ms(), self.conversion_ms(mode))
+
+    def remaining_ms(self):
+        """Time (ms) until the next conversion is finished, 0 if ready."""
+        if self._ready_at is None:
+            return 0
+        return max(0, ticks_diff(self._ready_at, ticks_ms()))
+
+    def ready(self):
+        """True if a conversion finished since the last read_continuous()."""
+        return self.remaining_ms() == 0
+
+    def read_continuous(self):
+        """Return the newest conversion (in lux) without sleeping.
+
+        Returns None if no new conversion is finished since the last call,
+        so the same value is never returned twice.
+        """
+        if self._ready_at is None:
+            return None
+        now = ticks_ms()
+        late = ticks_diff(now, self._ready_at)
+        if late < 0:
+            return None
+        # skip forward to the next conversion the sensor will finish
+        conversion = self.conversion_ms(self.mode)
+        self._ready_at = ticks_add(self._ready_at, (late // conversion + 1) * conversion)
+        data = self._buf
+        self.bus.readfrom_into(self.addr, data)
+        factor = 2.0 if self.mode == 0x11 else 1.0
+        return (data[0]<<8 | data[1]) / (1.2 * factor)
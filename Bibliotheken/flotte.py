@@ -0,0 +1,45 @@
+"""Geräte-ID und Topics für mehrere BloomBuddys an einem Broker (Flottenbetrieb).
+
+Bisher hatte jedes Programm dieselbe Client-ID und dasselbe Topic; ein
+zweites Gerät hätte das erste vom Broker getrennt und seine Messwerte mit
+denen des ersten vermischt. Die Geräte-ID wird aus der MAC-Adresse des
+Chips gebildet (12 Hex-Ziffern, z. B. "246f28123456") und steckt in der
+Client-ID und in jedem Topic:
+    Zuhause/Wohnung/BloomBuddy/<geraet>/telemetry
+    Zuhause/Wohnung/BloomBuddy/<geraet>/cmd/pump
+    Zuhause/Wohnung/BloomBuddy/<geraet>/state
+Node-RED abonniert mit "+" an der Stelle der Geräte-ID und schreibt sie in
+die Spalte Geraet der Datenbank. Der Lastgenerator (Simulator/lastgenerator.py)
+bildet die IDs für seine simulierten Geräte auf dieselbe Weise.
+"""
+
+try:
+    from ubinascii import hexlify
+except ImportError:
+    from binascii import hexlify
+
+BASIS = "Zuhause/Wohnung/BloomBuddy"
+
+
+def geraete_id(mac):
+    """Geräte-ID aus der MAC-Adresse (bytes, z. B. network.WLAN().config("mac"))."""
+    return hexlify(mac).decode()
+
+
+def client_id(geraet):
+    """MQTT-Client-ID des Geräts (pro Broker eindeutig)."""
+    return ("BloomBuddy-" + geraet).encode()
+
+
+def topic(geraet, kanal, basis=BASIS):
+    """Topic eines Geräts, z. B. topic(geraet, "cmd/pump")."""
+    return ("%s/%s/%s" % (basis, geraet, kanal)).encode()
+
+
+def geraet_aus_topic(topic, basis=BASIS):
+    """Geräte-ID aus einem Topic (bytes oder str), None wenn es nicht passt."""
+    if isinstance(topic, bytes):
+        topic = topic.decode()
+    if not topic.startswith(basis + "/"):
+        return None
+    return topic[len(basis) + 1:].split("/", 1)[0] or None
@@ -0,0 +1,253 @@
+"""Gemeinsamer I2C-Bus für AHT21, BH1750 und VL53L0X.
+
+I2CBus verhält sich wie machine.I2C (writeto, readfrom_into, readfrom_mem, ...),
+die Treiber in Bibliotheken/ können ihn also unverändert verwenden. Zusätzlich:
+- erstelle_bus() nimmt Hardware-I2C mit einstellbarem Takt (100/400 kHz) und
+  fällt auf SoftI2C zurück, wenn der Hardware-Bus nicht verfügbar ist
+- eine Sperre, damit Tasks bzw. Timer-Callbacks den Bus gemeinsam nutzen können
+- Statistik pro Gerät: Anzahl Transaktionen, übertragene Bytes, Buszeit
+- FakeI2C als reines Python-Backend, damit alles auch unter Linux läuft
+"""
+
+try:
+    from machine import I2C, SoftI2C, Pin
+except ImportError:
+    I2C = SoftI2C = Pin = None
+
+try:
+    from utime import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+try:
+    from _thread import allocate_lock
+except ImportError:
+    allocate_lock = None
+
+# Fehlercode, den machine.I2C bei fehlender Quittung (NACK) meldet
+_ENODEV = 19
+
+
+def erstelle_bus(scl=4, sda=5, freq=400000, hardware=True, bus_id=0):
+    """Erstellt einen I2CBus, bevorzugt mit Hardware-I2C.
+
+    Schlägt die Initialisierung des Hardware-Busses fehl (oder hardware=False),
+    wird SoftI2C mit demselben Takt verwendet.
+    """
+    if hardware:
+        try:
+            return I2CBus(I2C(bus_id, scl=Pin(scl), sda=Pin(sda), freq=freq), "I2C", freq)
+        except (TypeError, ValueError, OSError):
+            pass
+    return I2CBus(SoftI2C(scl=Pin(scl), sda=Pin(sda), freq=freq), "SoftI2C", freq)
+
+
+class _Sperre:
+    """Einfache Sperre, falls _thread nicht verfügbar ist (nur ein Ablauf)."""
+
+    def __init__(self):
+        self._belegt = False
+
+    def acquire(self, warten=True):
+        # Warten ist ohne Threads nicht möglich: belegt heißt immer False
+        if self._belegt:
+            return False
+        self._belegt = True
+        return True
+
+    def release(self):
+        self._belegt = False
+
+    def locked(self):
+        return self._belegt
+
+
+class I2CBus:
+    """I2C-Bus mit Sperre und Statistik pro Geräteadresse.
+
+    Mehrteilige Abläufe werden mit "with bus:" gesperrt (RuntimeError, wenn
+    die Sperre nicht warten kann und belegt ist). Timer-Callbacks verwenden
+    sperren(warten=False) und setzen bei belegtem Bus aus (VL53L0X-Timer),
+    asyncio-Tasks warten mit "await bus.sperren_async()" (Messzyklus).
+    """
+
+    def __init__(self, backend, art="Fake", freq=None):
+        self.backend = backend
+        self.art = art
+        self.freq = freq
+        self._sperre = allocate_lock() if allocate_lock else _Sperre()
+        # Adresse -> [Transaktionen, Bytes, Buszeit in us]
+        self._statistik = {}
+
+    # --- Sperre ---
+
+    def sperren(self, warten=True):
+        """Sperrt den Bus; mit warten=False sofort False, wenn er belegt ist."""
+        return self._sperre.acquire(warten)
+
+    def freigeben(self):
+        self._sperre.release()
+
+    def gesperrt(self):
+        return self._sperre.locked()
+
+    async def sperren_async(self, intervall_ms=1):
+        """Wartet kooperativ, bis der Bus frei ist, und sperrt ihn."""
+        while not self._sperre.acquire(False):
+            await asyncio.sleep(intervall_ms / 1000)
+
+    def __enter__(self):
+        # Mit _thread wird gewartet. _Sperre kann nicht warten, dort ist der Bus
+        # nur belegt, wenn derselbe Ablauf ihn schon hält (verschachteltes with)
+        if not self._sperre.acquire(True):
+            raise RuntimeError("I2C-Bus ist bereits gesperrt")
+        return self
+
+    def __exit__(self, *args):
+        self._sperre.release()
+
+    # --- Statistik ---
+
+    def _zaehlen(self, addr, nbytes, start):
+        dauer = ticks_diff(ticks_us(), start)
+        eintrag = self._statistik.get(addr)
+        if eintrag is None:
+            self._statistik[addr] = [1, nbytes, dauer]
+        else:
+            eintrag[0] += 1
+            eintrag[1] += nbytes
+            eintrag[2] += dauer
+
+    def statistik(self, addr=None):
+        """Transaktionen, Bytes und Buszeit (us) pro Adresse bzw. für eine Adresse."""
+        if addr is not None:
+            return tuple(self._statistik.get(addr, (0, 0, 0)))
+        return {a: tuple(w) for a, w in self._statistik.items()}
+
+    def statistik_zuruecksetzen(self):
+        self._statistik.clear()
+
+    # --- machine.I2C-Schnittstelle ---
+
+    def scan(self):
+        return self.backend.scan()
+
+    def writeto(self, addr, buf, stop=True):
+        start = ticks_us()
+        ergebnis = self.backend.writeto(addr, buf, stop)
+        self._zaehlen(addr, len(buf), start)
+        return ergebnis
+
+    def readfrom(self, addr, nbytes, stop=True):
+        start = ticks_us()
+        daten = self.backend.readfrom(addr, nbytes, stop)
+        self._zaehlen(addr, nbytes, start)
+        return daten
+
+    def readfrom_into(self, addr, buf, stop=True):
+        start = ticks_us()
+        self.backend.readfrom_into(addr, buf, stop)
+        self._zaehlen(addr, len(buf), start)
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        start = ticks_us()
+        self.backend.writeto_mem(addr, memaddr, buf, addrsize=addrsize)
+        self._zaehlen(addr, len(buf) + addrsize // 8, start)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        start = ticks_us()
+        daten = self.backend.readfrom_mem(addr, memaddr, nbytes, addrsize=addrsize)
+        self._zaehlen(addr, nbytes + addrsize // 8, start)
+        return daten
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        start = ticks_us()
+        self.backend.readfrom_mem_into(addr, memaddr, buf, addrsize=addrsize)
+        self._zaehlen(addr, len(buf) + addrsize // 8, start)
+
+
+class FakeGeraet:
+    """Registerbasiertes Testgerät für FakeI2C (256 Register, Auto-Inkrement).
+
+    Das erste geschriebene Byte setzt den Registerzeiger, weitere Bytes werden
+    ab dort gespeichert. Lesen liefert die Register ab dem Zeiger. Geräte mit
+    eigenem Verhalten überschreiben schreiben() und lesen().
+    """
+
+    def __init__(self, adresse):
+        self.adresse = adresse
+        self.register = bytearray(256)
+        self.zeiger = 0
+
+    def schreiben(self, daten):
+        if not daten:
+            return
+        self.zeiger = daten[0]
+        for i in range(1, len(daten)):
+            self.register[(self.zeiger + i - 1) & 0xFF] = daten[i]
+
+    def lesen(self, nbytes):
+        daten = bytearray(nbytes)
+        for i in range(nbytes):
+            daten[i] = self.register[(self.zeiger + i) & 0xFF]
+        return daten
+
+
+class FakeI2C:
+    """Reines Python-Backend mit der Schnittstelle von machine.I2C.
+
+    Geräte werden mit anschliessen() unter ihrer Adresse eingetragen.
+    Zugriffe auf nicht vorhandene Adressen lösen wie auf dem ESP32
+    OSError(ENODEV) aus.
+    """
+
+    def __init__(self, *geraete):
+        self.geraete = {}
+        for geraet in geraete:
+            self.anschliessen(geraet)
+
+    def anschliessen(self, geraet):
+        self.geraete[geraet.adresse] = geraet
+
+    def _geraet(self, addr):
+        geraet = self.geraete.get(addr)
+        if geraet is None:
+            raise OSError(_ENODEV)
+        return geraet
+
+    def scan(self):
+        return sorted(self.geraete)
+
+    def writeto(self, addr, buf, stop=True):
+        self._geraet(addr).schreiben(bytes(buf))
+        return len(buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return bytes(self._geraet(addr).lesen(nbytes))
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self._geraet(addr).lesen(len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        self._geraet(addr).schreiben(bytes([memaddr]) + bytes(buf))
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        geraet = self._geraet(addr)
+        geraet.schreiben(bytes([memaddr]))
+        return bytes(geraet.lesen(nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        geraet = self._geraet(addr)
+        geraet.schreiben(bytes([memaddr]))
+        buf[:] = geraet.lesen(len(buf))
@@ -0,0 +1,123 @@
+"""Gleitende Messwertfilter ohne Speicheranforderung im Dauerbetrieb.
+
+Ersetzt das bisherige Vorgehen mit Listen (anhängen, max/min entfernen,
+summieren, leeren). Die Werte liegen in Arrays fester Größe, die nur einmal
+angelegt werden. Die Summe wird bei jedem neuen Wert fortgeschrieben und ein
+zweites Array hält das Fenster sortiert. Die Position wird per Binärsuche
+gefunden (O(log n)), Einfügen und Entfernen verschieben aber weiterhin die
+Werte dahinter (O(n), bei 10 Werten nur wenige Kopien).
+Gestutzter Mittelwert und Median sind damit nach jedem einzelnen Messwert
+verfügbar, nicht erst nach einem kompletten 10er-Block.
+"""
+
+from array import array
+
+
+class GleitenderFilter:
+    """Gleitendes Fenster über die letzten groesse Messwerte.
+
+    kappen gibt an, wie viele Werte oben und unten beim gestutzten
+    Mittelwert verworfen werden (1 = höchster und niedrigster Wert, wie bisher).
+    """
+
+    def __init__(self, groesse=10, kappen=1):
+        self.groesse = groesse
+        self.kappen = kappen
+        self._ring = array('f', [0] * groesse)
+        self._sortiert = array('f', [0] * groesse)
+        self._kopf = 0
+        self.anzahl = 0
+        self.summe = 0.0
+
+    def zuruecksetzen(self):
+        """Verwirft alle Werte im Fenster."""
+        self._kopf = 0
+        self.anzahl = 0
+        self.summe = 0.0
+
+    def hinzufuegen(self, wert):
+        """Nimmt einen neuen Messwert auf, der älteste fällt bei vollem Fenster heraus."""
+        if wert is None:
+            return
+        ring = self._ring
+        if self.anzahl == self.groesse:
+            alt = ring[self._kopf]
+            self._entfernen(alt)
+            self.summe -= alt
+        else:
+            self.anzahl += 1
+        ring[self._kopf] = wert
+        # Gespeicherten (float32-)Wert verwenden, damit die Summe nicht driftet
+        wert = ring[self._kopf]
+        self._kopf = (self._kopf + 1) % self.groesse
+        self._einfuegen(wert)
+        self.summe += wert
+
+    # Damit der Filter direkt als Ziel für z. B. VL53L0X.read_n() dienen kann
+    append = hinzufuegen
+
+    def _suchen(self, wert, ende):
+        # Binärsuche: erste Position im sortierten Fenster mit Wert >= wert
+        sortiert = self._sortiert
+        links = 0
+        rechts = ende
+        while links < rechts:
+            mitte = (links + rechts) >> 1
+            if sortiert[mitte] < wert:
+                links = mitte + 1
+            else:
+                rechts = mitte
+        return links
+
+    def _einfuegen(self, wert):
+        sortiert = self._sortiert
+        ende = self.anzahl - 1  # Anzahl vor dem Einfügen
+        pos = self._suchen(wert, ende)
+        for i in range(ende, pos, -1):
+            sortiert[i] = sortiert[i - 1]
+        sortiert[pos] = wert
+
+    def _entfernen(self, wert):
+        sortiert = self._sortiert
+        ende = self.anzahl
+        # wert stammt aus dem Ringarray und steht daher exakt so im sortierten Array
+        pos = self._suchen(wert, ende)
+        for i in range(pos, ende - 1):
+            sortiert[i] = sortiert[i + 1]
+
+    def mittelwert(self):
+        """Arithmetischer Mittelwert über das Fenster (None bei leerem Fenster)."""
+        if not self.anzahl:
+            return None
+        return self.summe / self.anzahl
+
+    def gestutzter_mittelwert(self):
+        """Mittelwert ohne die kappen höchsten und niedrigsten Werte."""
+        anzahl = self.anzahl
+        if not anzahl:
+            return None
+        k = self.kappen
+        if anzahl <= 2 * k:
+            return self.summe / anzahl
+        sortiert = self._sortiert
+        summe = self.summe
+        for i in range(k):
+            summe -= sortiert[i] + sortiert[anzahl - 1 - i]
+        return summe / (anzahl - 2 * k)
+
+    def median(self):
+        """Median über das Fenster (None bei leerem Fenster)."""
+        anzahl = self.anzahl
+        if not anzahl:
+            return None
+        sortiert = self._sortiert
+        mitte = anzahl >> 1
+        if anzahl & 1:
+            return sortiert[mitte]
+        return (sortiert[mitte - 1] + sortiert[mitte]) / 2
+
+    def minimum(self):
+        return self._sortiert[0] if self.anzahl else None
+
+    def maximum(self):
+        return self._sortiert[self.anzahl - 1] if self.anzahl else None
@@ -0,0 +1,197 @@
+"""Kooperative Sensorerfassung für BloomBuddy (uasyncio).
+
+Bisher wurden ToF, AHT21 und BH1750 nacheinander abgefragt, jeweils mit
+blockierenden Wartezeiten. Hier läuft jeder Sensor als eigene Task:
+die Wandlung wird ausgelöst, während der Wandlungszeit gibt die Task die CPU
+ab und das Ergebnis wird abgeholt, sobald es fertig ist. Alle drei Sensoren
+wandeln dadurch gleichzeitig und ein Zyklus dauert nur so lange wie die
+langsamste Messkette (BH1750, 10 x 180 ms) statt der Summe aller Ketten.
+Der BH1750 misst im Dauermessbetrieb, jede Wandlung wird genau einmal gelesen.
+
+Der VL53L0X muss vorher mit start_continuous() in den Dauermessbetrieb
+geschaltet werden. Seine Messwerte kommen dann ohne Buszugriff aus dem
+Ringpuffer des Treibers. Kommen keine neuen Messwerte mehr, ist der
+Füllstand None statt des letzten gültigen Werts.
+
+Ist der Bus ein I2CBus, sperren AHT- und BH-Kette ihn für jeden Buszugriff;
+der Timer des VL53L0X setzt solange aus.
+"""
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+from utime import ticks_ms, ticks_diff
+
+from aht import AHT_MEASURE_MS
+from bh1750 import BH1750
+from messfilter import GleitenderFilter
+
+
+async def _schlafe_ms(ms):
+    """Gibt die CPU für ms Millisekunden an andere Tasks ab."""
+    await asyncio.sleep(ms / 1000)
+
+
+class _AHTKette:
+    """Messkette für den AHT21: auslösen, Busy-Bit abfragen, abholen."""
+
+    # Vor der ersten Abfrage des Busy-Bits warten (Messdauer ca. 75-80 ms)
+    wandlungszeit_ms = AHT_MEASURE_MS
+
+    def __init__(self, sensor):
+        self.sensor = sensor
+
+    def ausloesen(self):
+        # False, wenn der Messbefehl nicht angekommen ist (OSError/NACK)
+        return self.sensor.trigger()
+
+    def bereit(self):
+        return self.sensor.ready()
+
+    def abholen(self):
+        # None, wenn collect() nichts Gültiges gelesen hat (Busy-Bit oder Busfehler)
+        return self.sensor if self.sensor.collect() else None
+
+
+class _BHKette:
+    """Messkette für den BH1750 im Dauermessbetrieb (Modusbefehl nur einmal)."""
+
+    def __init__(self, sensor, modus):
+        self.sensor = sensor
+        sensor.start_continuous(modus)
+
+    @property
+    def wandlungszeit_ms(self):
+        return self.sensor.remaining_ms()
+
+    def ausloesen(self):
+        return True
+
+    def bereit(self):
+        return self.sensor.ready()
+
+    def abholen(self):
+        return self.sensor.read_continuous()
+
+
+class Messzyklus:
+    """Erfasst pro Zyklus anzahl Messwerte von ToF, AHT21 und BH1750 parallel.
+
+    Jeder Messwert läuft sofort in einen gleitenden Filter (fuellstand,
+    temperatur, feuchtigkeit, helligkeit) über die letzten anzahl Werte,
+    der gefilterte Wert ist also nach jedem Messwert aktuell. Meldet ein Sensor
+    nach 20 Abfragen nicht bereit oder kam der Messbefehl nicht an, fehlt dieser
+    Messwert im Filter (ausgelassen zählt mit). Wird ein MQTT-Client übergeben, werden während des Zyklus
+    regelmäßig neue Nachrichten abgefragt.
+    Mit bh_modus=BH1750.CONT_LOWRES dauert eine Helligkeitsmessung nur 24 ms
+    statt 180 ms (Auflösung 4 lx statt 1 lx).
+    """
+
+    def __init__(self, tof, aht, bh, anzahl=10, client=None, mqtt_intervall_ms=20,
+                 bh_modus=BH1750.CONT_HIRES_1):
+        self.tof = tof
+        # Gemeinsamer I2CBus (i2cbus.py) mit Sperre, bei machine.I2C ohne Sperre
+        bus = aht.i2c
+        self.bus = bus if hasattr(bus, "sperren_async") else None
+        self.aht = _AHTKette(aht)
+        self.bh = _BHKette(bh, bh_modus)
+        self.anzahl = anzahl
+        self.client = client
+        self.mqtt_intervall_ms = mqtt_intervall_ms
+        self.fuellstand = GleitenderFilter(anzahl)
+        self.temperatur = GleitenderFilter(anzahl)
+        self.feuchtigkeit = GleitenderFilter(anzahl)
+        self.helligkeit = GleitenderFilter(anzahl)
+        self.dauer_ms = 0
+        # Messwerte, die verworfen wurden, weil der Sensor nicht rechtzeitig fertig war
+        self.ausgelassen = 0
+        # Höchstens so lange auf neue ToF-Messwerte warten (anzahl Perioden plus Reserve)
+        self.tof_timeout_ms = (anzahl + 2) * (tof.poll_ms or 33)
+        self._tof_stand = 0
+        self._aktiv = False
+
+    def messen(self):
+        """Führt einen kompletten Messzyklus aus (blockiert bis alle Ketten fertig sind)."""
+        start = ticks_ms()
+        asyncio.run(self._messen())
+        self.dauer_ms = ticks_diff(ticks_ms(), start)
+
+    async def _messen(self):
+        self._aktiv = True
+        if self.client is not None:
+            mqtt_task = asyncio.create_task(self._nachrichten_pruefen())
+        await asyncio.gather(
+            self._kette(self.aht, self._aht_speichern),
+            self._kette(self.bh, self.helligkeit.hinzufuegen),
+            self._tof_abholen(),
+        )
+        self._aktiv = False
+        if self.client is not None:
+            await mqtt_task
+
+    async def _kette(self, kette, speichern):
+        for i in range(self.anzahl):
+            await self._sperren()
+            try:
+                ausgeloest = kette.ausloesen()
+            finally:
+                self._freigeben()
+            # Während der Wandlung laufen die anderen Ketten weiter
+            await _schlafe_ms(kette.wandlungszeit_ms)
+            if not ausgeloest:
+                # Ohne Messbefehl meldet der AHT21 "bereit" und collect() läse die vorige Wandlung
+                self.ausgelassen += 1
+                continue
+            wert = None
+            for versuch in range(20):
+                # Abfrage und Abholen ohne fremden Buszugriff dazwischen
+                await self._sperren()
+                try:
+                    if kette.bereit():
+                        wert = kette.abholen()
+                        break
+                finally:
+                    self._freigeben()
+                await _schlafe_ms(5)
+            # Nie bereit oder nichts abgeholt: auslassen, sonst kämen die alten Werte
+            # des AHT21 bzw. eine nicht fertige Wandlung des BH1750 in den Filter
+            if wert is None:
+                self.ausgelassen += 1
+            else:
+                speichern(wert)
+
+    async def _tof_abholen(self):
+        # Der Ringpuffer wird im Hintergrund gefüllt, gewartet wird auf anzahl neue
+        # Messwerte seit dem letzten Abholen. Kommen innerhalb von tof_timeout_ms
+        # weniger (Sensor antwortet nicht, Timer läuft nicht), werden nur die neuen
+        # übernommen; ohne neue Messwerte wird der Filter geleert (Füllstand None).
+        start = ticks_ms()
+        while self.tof.total - self._tof_stand < self.anzahl:
+            if ticks_diff(ticks_ms(), start) >= self.tof_timeout_ms:
+                break
+            await _schlafe_ms(30)
+        neu = min(self.tof.total - self._tof_stand, self.tof.count, self.anzahl)
+        self._tof_stand = self.tof.total
+        if neu:
+            self.tof.read_n(neu, self.fuellstand)
+        else:
+            self.fuellstand.zuruecksetzen()
+
+    async def _sperren(self):
+        if self.bus is not None:
+            await self.bus.sperren_async()
+
+    def _freigeben(self):
+        if self.bus is not None:
+            self.bus.freigeben()
+
+    def _aht_speichern(self, sensor):
+        self.temperatur.hinzufuegen(sensor.temperature)
+        self.feuchtigkeit.hinzufuegen(sensor.humidity)
+
+    async def _nachrichten_pruefen(self):
+        while self._aktiv:
+            self.client.check_msg()
+            await _schlafe_ms(self.mqtt_intervall_ms)
@@ -0,0 +1,343 @@
+"""Selbstheilende MQTT-Sitzung um umqtt.simple.MQTTClient.
+
+Bisher blieb das Programm bei einem Verbindungsfehler in "while True: pass"
+hängen (100 % CPU, keine Erholung), und ein Broker-Neustart während
+publish() oder check_msg() beendete die Hauptschleife mit einer Exception.
+
+MQTTSitzung hat dieselben Methoden wie MQTTClient (publish, check_msg,
+subscribe, set_callback), wirft aber keine Netzwerkfehler, sondern:
+- erkennt tote Verbindungen (Socketfehler oder keine Antwort auf den
+  Keepalive-Ping innerhalb von keepalive / 2)
+- verbindet sich mit exponentiell wachsendem Abstand neu (1 s, 2 s, 4 s ...
+  bis backoff_max_ms, mit Zufallsanteil), ohne zwischen den Versuchen zu
+  warten; der Versuch selbst (client.connect(): Namensauflösung, TCP-Aufbau,
+  CONNACK) blockiert aber, bei nicht erreichbarem Broker bis zum Timeout
+- abonniert nach jeder neuen Verbindung alle Topics erneut
+- sendet Keepalive-Pings, wenn keepalive / 2 nichts gesendet oder nichts
+  empfangen wurde (ein Gerät, das in jedem Zyklus sendet, pingt also trotzdem)
+
+publish() gibt True/False zurück, damit das Programm ohne Broker weiter
+messen und die Pumpe steuern kann.
+
+QoS 1 ohne Blockieren: umqtt.simple wartet bei publish(qos=1) auf das
+PUBACK und liest bis dahin keine anderen Nachrichten. MQTTSitzung sendet
+das Paket selbst und merkt es sich (höchstens fenster Nachrichten
+gleichzeitig unterwegs). PUBACKs werden in check_msg() zugeordnet, ohne
+Bestätigung nach wiederholen_ms und nach jedem Neuaufbau wird die
+Nachricht mit DUP-Flag erneut gesendet. Ist das Fenster voll, gibt
+publish() False zurück.
+
+Aus demselben Grund abonniert subscribe() bei bestehender Verbindung selbst
+und wartet nicht auf das SUBACK: umqtt.simple.subscribe() liest bis zum
+SUBACK alle Pakete und würde ein PUBACK dazwischen falsch lesen. Alle
+Pakete nach dem Verbindungsaufbau liest check_msg(). Nur in verbinden()
+wird noch mit umqtt.simple abonniert, dort ist noch keine QoS-1-Nachricht
+unterwegs (die unbestätigten werden erst danach erneut gesendet).
+"""
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+from utime import ticks_ms, ticks_add, ticks_diff
+from umqtt.simple import MQTTClient, MQTTException
+
+try:
+    from urandom import getrandbits
+except ImportError:
+    from random import getrandbits
+
+# Fehler, die auf eine unterbrochene Verbindung hinweisen
+# (umqtt.simple meldet eine geschlossene Verbindung teils über IndexError/assert)
+_VERBINDUNGSFEHLER = (OSError, MQTTException, IndexError, AssertionError)
+
+
+class _Socketwaechter:
+    """Merkt sich, wann zuletzt Daten vom Broker kamen (auch PINGRESP)."""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self.empfangen = ticks_ms()
+
+    def read(self, n):
+        daten = self._sock.read(n)
+        if daten:
+            self.empfangen = ticks_ms()
+        return daten
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+class MQTTSitzung:
+    def __init__(self, client_id, server, port=1883, keepalive=30, wlan=None,
+                 backoff_min_ms=1000, backoff_max_ms=60000, fenster=4, wiederholen_ms=5000, **optionen):
+        self.client = MQTTClient(client_id, server, port=port, keepalive=keepalive, **optionen)
+        self.keepalive = keepalive
+        self.wlan = wlan
+        self.backoff_min_ms = backoff_min_ms
+        self.backoff_max_ms = backoff_max_ms
+        self.verbunden = False
+        self._abos = []
+        self._backoff_ms = backoff_min_ms
+        self._naechster_versuch = ticks_ms()
+        self._gesendet = ticks_ms()
+        # Sendezeit des noch unbeantworteten Pings, None ohne offenen Ping
+        self._ping = None
+        # QoS 1: Paket-ID -> [topic, msg, retain, gesendet], noch ohne PUBACK
+        self.fenster = fenster
+        self.wiederholen_ms = wiederholen_ms
+        self._unterwegs = {}
+        self._pid = 0
+        # Statistik
+        self.verbindungen = 0
+        self.abbrueche = 0
+        self.fehlversuche = 0
+        self.bestaetigt = 0
+        self.wiederholt = 0
+        self.puback_ms = 0
+        self.abgelehnt = 0  # vom Broker abgelehnte Abonnements
+
+    # --- Schnittstelle wie MQTTClient ---
+
+    def set_callback(self, f):
+        self.client.set_callback(f)
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        self.client.set_last_will(topic, msg, retain, qos)
+
+    def subscribe(self, topic, qos=0):
+        """Merkt sich das Topic und abonniert es (jetzt bzw. nach jedem Verbindungsaufbau)."""
+        if (topic, qos) not in self._abos:
+            self._abos.append((topic, qos))
+        if self.verbunden:
+            try:
+                self._abonnieren(topic, qos)
+            except _VERBINDUNGSFEHLER:
+                self._verloren()
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        """Sendet eine Nachricht, gibt False zurück, wenn keine Verbindung besteht.
+
+        Bei qos=1 kehrt publish() sofort zurück, die Nachricht bleibt bis zum
+        PUBACK unterwegs (False, wenn schon fenster Nachrichten unterwegs sind).
+        """
+        if not self.verbunden and not self.verbinden():
+            return False
+        try:
+            if qos:
+                if len(self._unterwegs) >= self.fenster:
+                    return False
+                if isinstance(msg, memoryview):
+                    msg = bytes(msg)  # der Puffer dahinter wird evtl. wiederverwendet
+                pid = self._naechste_pid()
+                self._unterwegs[pid] = [topic, msg, retain, ticks_ms()]
+                self._qos1_senden(pid, topic, msg, retain, False)
+            else:
+                self.client.publish(topic, msg, retain, qos)
+        except _VERBINDUNGSFEHLER:
+            self._verloren()
+            return False
+        self._gesendet = ticks_ms()
+        return True
+
+    def check_msg(self):
+        """Verarbeitet eingehende Nachrichten und hält die Verbindung am Leben.
+
+        Nicht blockierend: ohne Verbindung wird höchstens ein fälliger
+        Verbindungsversuch unternommen.
+        """
+        if not self.verbunden:
+            self.verbinden()
+            return None
+        try:
+            ergebnis = self.client.check_msg()
+            if ergebnis == 0x40:
+                self._puback_lesen()
+            elif ergebnis == 0x90:
+                self._suback_lesen()
+            self._keepalive_pruefen()
+            self._wiederholen()
+            return ergebnis
+        except _VERBINDUNGSFEHLER:
+            self._verloren()
+            return None
+
+    def disconnect(self):
+        self.trennen()
+
+    def unterwegs(self):
+        """Anzahl der QoS-1-Nachrichten ohne PUBACK."""
+        return len(self._unterwegs)
+
+    def socket(self):
+        """Socket der aktuellen Verbindung (z. B. für select.poll), None ohne Verbindung."""
+        if not self.verbunden:
+            return None
+        return self.client.sock._sock
+
+    # --- Verbindungsverwaltung ---
+
+    def verbinden(self):
+        """Baut die Verbindung auf, falls der nächste Versuch fällig ist.
+
+        Gibt True zurück, wenn die Sitzung danach verbunden ist.
+        """
+        if self.verbunden:
+            return True
+        if ticks_diff(ticks_ms(), self._naechster_versuch) < 0:
+            return False
+        if self.wlan is not None and not self.wlan.isconnected():
+            # WLAN erneut mit den zuletzt verwendeten Zugangsdaten verbinden
+            try:
+                self.wlan.connect()
+            except OSError:
+                pass
+            self._fehlversuch()
+            return False
+        try:
+            self.client.connect()
+            self.client.sock = _Socketwaechter(self.client.sock)
+            for topic, qos in self._abos:
+                self.client.subscribe(topic, qos)
+            # Unbestätigte QoS-1-Nachrichten erneut senden
+            for pid in self._unterwegs:
+                self._erneut_senden(pid)
+        except _VERBINDUNGSFEHLER:
+            self._schliessen()
+            self._fehlversuch()
+            return False
+        self.verbunden = True
+        self.verbindungen += 1
+        self._backoff_ms = self.backoff_min_ms
+        self._gesendet = ticks_ms()
+        self._ping = None
+        return True
+
+    def trennen(self):
+        """Trennt die Verbindung ordnungsgemäß (ohne automatischen Neuaufbau bis zum nächsten Aufruf)."""
+        if self.verbunden:
+            try:
+                self.client.disconnect()
+            except _VERBINDUNGSFEHLER:
+                pass
+        self.verbunden = False
+
+    def _keepalive_pruefen(self):
+        if not self.keepalive:
+            return
+        jetzt = ticks_ms()
+        empfangen = self.client.sock.empfangen
+        frist = self.keepalive * 500
+        if self._ping is not None:
+            if ticks_diff(empfangen, self._ping) >= 0:
+                # Broker hat seit dem Ping geantwortet (PINGRESP oder andere Daten)
+                self._ping = None
+            elif ticks_diff(jetzt, self._ping) > frist:
+                raise OSError("Keepalive abgelaufen")
+            else:
+                return
+        # Pingen, wenn lange nichts gesendet (Pflicht laut MQTT) oder nichts
+        # empfangen wurde (Verbindung prüfen, auch wenn ständig gesendet wird)
+        if ticks_diff(jetzt, self._gesendet) > frist or ticks_diff(jetzt, empfangen) > frist:
+            self.client.ping()
+            self._gesendet = jetzt
+            self._ping = jetzt
+
+    # --- QoS 1 ---
+
+    def _qos1_senden(self, pid, topic, msg, retain, dup):
+        """PUBLISH mit QoS 1 wie in umqtt.simple, aber ohne auf PUBACK zu warten."""
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if isinstance(msg, str):
+            msg = msg.encode()
+        kopf = bytearray(b"\x32\0\0\0\0")
+        kopf[0] |= retain | dup << 3
+        sz = 2 + len(topic) + 2 + len(msg)
+        i = 1
+        while sz > 0x7F:
+            kopf[i] = (sz & 0x7F) | 0x80
+            sz >>= 7
+            i += 1
+        kopf[i] = sz
+        sock = self.client.sock
+        sock.write(kopf, i + 1)
+        sock.write(struct.pack("!H", len(topic)))
+        sock.write(topic)
+        sock.write(struct.pack("!H", pid))
+        sock.write(msg)
+        self._gesendet = ticks_ms()
+
+    def _naechste_pid(self):
+        self._pid = self._pid % 65535 + 1
+        while self._pid in self._unterwegs:
+            self._pid = self._pid % 65535 + 1
+        return self._pid
+
+    def _abonnieren(self, topic, qos):
+        """SUBSCRIBE wie in umqtt.simple, das SUBACK liest check_msg()."""
+        if isinstance(topic, str):
+            topic = topic.encode()
+        paket = bytearray(b"\x82\0\0\0")
+        struct.pack_into("!BH", paket, 1, 2 + 2 + len(topic) + 1, self._naechste_pid())
+        sock = self.client.sock
+        sock.write(paket)
+        sock.write(struct.pack("!H", len(topic)))
+        sock.write(topic)
+        sock.write(bytes((qos,)))
+        self._gesendet = ticks_ms()
+
+    def _suback_lesen(self):
+        # Länge, Paket-ID, Rückgabecode (0x80: abgelehnt)
+        antwort = self.client.sock.read(4)
+        if antwort[0] != 3:
+            raise OSError("SUBACK ungültig")
+        if antwort[3] == 0x80:
+            self.abgelehnt += 1
+
+    def _erneut_senden(self, pid):
+        eintrag = self._unterwegs[pid]
+        eintrag[3] = ticks_ms()
+        self.wiederholt += 1
+        self._qos1_senden(pid, eintrag[0], eintrag[1], eintrag[2], True)
+
+    def _puback_lesen(self):
+        # umqtt.simple liest nur das erste Byte anderer Pakete, Rest hier
+        sock = self.client.sock
+        if sock.read(1) != b"\x02":
+            raise OSError("PUBACK ungültig")
+        pid = struct.unpack("!H", sock.read(2))[0]
+        eintrag = self._unterwegs.pop(pid, None)
+        if eintrag is not None:
+            self.bestaetigt += 1
+            self.puback_ms = ticks_diff(ticks_ms(), eintrag[3])
+
+    def _wiederholen(self):
+        if not self._unterwegs:
+            return
+        jetzt = ticks_ms()
+        for pid in self._unterwegs:
+            if ticks_diff(jetzt, self._unterwegs[pid][3]) >= self.wiederholen_ms:
+                self._erneut_senden(pid)
+
+    def _verloren(self):
+        self.abbrueche += 1
+        self._schliessen()
+        # Ersten Neuaufbau sofort versuchen, danach Backoff
+        self._naechster_versuch = ticks_ms()
+
+    def _schliessen(self):
+        self.verbunden = False
+        try:
+            self.client.sock.close()
+        except (OSError, AttributeError):
+            pass
+
+    def _fehlversuch(self):
+        self.fehlversuche += 1
+        # Zufallsanteil bis +25 %, damit nicht alle Geräte gleichzeitig neu verbinden
+        warten = self._backoff_ms + getrandbits(16) * (self._backoff_ms // 4) // 65536
+        self._naechster_versuch = ticks_add(ticks_ms(), warten)
+        self._backoff_ms = min(self._backoff_ms * 2, self.backoff_max_ms)
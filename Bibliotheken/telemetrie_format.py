@@ -0,0 +1,138 @@
+"""Binäres Telemetrieformat für BloomBuddy (Alternative zu JSON).
+
+Statt ca. 100 Byte JSON mit langen Schlüsseln werden die fünf Messwerte mit
+fester Anordnung in 14 Byte gepackt. Das Modul läuft unter MicroPython
+(Kodieren auf dem ESP32, ohne neue Speicheranforderung pro Nachricht) und
+unter CPython (Dekodieren auf dem Server, Tests). Der passende Decoder für
+Node-RED steht in flows.json ("Binärformat dekodieren"), das Schema in
+Dokumentation/Telemetrieformat.md.
+
+Aufbau Version 1 (little endian, 14 Byte):
+    Offset  Typ  Feld                Einheit
+    0       B    Version             1
+    1       I    Zeit                s (Unixzeit UTC, ungestellt: seit dem Start, siehe uhrzeit.py)
+    5       H    Fuellstand          mm
+    7       h    Temperatur          0,01 °C
+    9       H    Luftfeuchtigkeit    0,01 %
+    11      H    Helligkeit          lx
+    13      B    Bodenfeuchtigkeit   %
+Fehlende Messwerte (None) stehen als Höchstwert des Feldes (0xFFFF, 0x7FFF, 0xFF).
+
+Stapel (Version 2, mehrere Messungen in einer Nachricht, siehe telemetriestapel.py):
+    0       B    Version             2
+    1       B    Anzahl n
+    2       I    Sendezeit           s (Uhrzeit des Geräts beim Senden)
+    6       n x  Zeit (I) + fünf Messwerte wie oben (13 Byte je Messung)
+"""
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+VERSION = 1
+FORMAT = "<BIHhHHB"
+GROESSE = 14
+
+STAPEL_VERSION = 2
+STAPEL_KOPF = 6
+STAPEL_EINTRAG = 13
+STAPEL_MAX = 255
+
+# Format und Platzhalter der fünf Messwerte, auch vom Telemetriepuffer benutzt
+WERTE_FORMAT = "<HhHHB"
+WERTE_GROESSE = 9
+FEHLT = (0xFFFF, 0x7FFF, 0xFFFF, 0xFFFF, 0xFF)
+# Schlüssel wie in der JSON-Nachricht
+FELDER = ("Fuellstand", "Temperatur", "Luftfeuchtigkeit", "Helligkeit", "Bodenfeuchtigkeit")
+# Zeit ab hier (2001-09-09) ist gestellte Unixzeit, darunter Sekunden seit dem Start (uhrzeit.py);
+# hier statt in uhrzeit.py, damit der Server es ohne utime importieren kann
+GUELTIG_AB = 1000000000
+
+
+def _begrenzen(wert, faktor, minimum, maximum, fehlt):
+    if wert is None:
+        return fehlt
+    wert = int(round(wert * faktor))
+    return max(minimum, min(maximum, wert))
+
+
+def werte_packen(puffer, offset, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit):
+    """Packt die fünf Messwerte (9 Byte) ab offset in puffer."""
+    struct.pack_into(WERTE_FORMAT, puffer, offset,
+                     _begrenzen(fuellstand, 1, 0, 0xFFFE, FEHLT[0]),
+                     _begrenzen(temperatur, 100, -0x7FFF, 0x7FFE, FEHLT[1]),
+                     _begrenzen(feuchtigkeit, 100, 0, 0xFFFE, FEHLT[2]),
+                     _begrenzen(helligkeit, 1, 0, 0xFFFE, FEHLT[3]),
+                     _begrenzen(bodenfeuchtigkeit, 1, 0, 0xFE, FEHLT[4]))
+
+
+def werte_entpacken(puffer, offset):
+    """Gegenstück zu werte_packen(), gibt ein 5-Tupel (fehlende Werte als None) zurück."""
+    roh = struct.unpack_from(WERTE_FORMAT, puffer, offset)
+    return (
+        None if roh[0] == FEHLT[0] else roh[0],
+        None if roh[1] == FEHLT[1] else roh[1] / 100,
+        None if roh[2] == FEHLT[2] else roh[2] / 100,
+        None if roh[3] == FEHLT[3] else roh[3],
+        None if roh[4] == FEHLT[4] else roh[4],
+    )
+
+
+def kodieren(zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit, puffer=None):
+    """Erzeugt eine Nachricht im Binärformat.
+
+    Mit einem vorab angelegten puffer (bytearray(GROESSE)) wird er wiederverwendet.
+    """
+    if puffer is None:
+        puffer = bytearray(GROESSE)
+    puffer[0] = VERSION
+    struct.pack_into("<I", puffer, 1, int(zeit) & 0xFFFFFFFF)
+    werte_packen(puffer, 5, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit)
+    return puffer
+
+
+def dekodieren(daten):
+    """Wandelt eine Binärnachricht in ein dict mit den JSON-Schlüsseln und "Zeit".
+
+    Wirft ValueError bei falscher Länge oder unbekannter Version.
+    """
+    if len(daten) < 1 or daten[0] != VERSION:
+        raise ValueError("unbekannte Version")
+    if len(daten) != GROESSE:
+        raise ValueError("falsche Länge %d" % len(daten))
+    ergebnis = {"Zeit": struct.unpack_from("<I", daten, 1)[0]}
+    werte = werte_entpacken(daten, 5)
+    for i in range(5):
+        ergebnis[FELDER[i]] = werte[i]
+    return ergebnis
+
+
+def stapel_dekodieren(daten):
+    """Wandelt einen Stapel (Version 2) in eine Liste von dicts wie bei dekodieren().
+
+    Zusätzlich zu "Zeit" enthält jeder Eintrag "Alter" (Sendezeit - Zeit in s),
+    damit der Empfänger auch ohne gestellte Geräteuhr den Zeitpunkt kennt.
+    Wirft ValueError bei falscher Länge oder unbekannter Version.
+    """
+    if len(daten) < STAPEL_KOPF or daten[0] != STAPEL_VERSION:
+        raise ValueError("unbekannte Version")
+    anzahl = daten[1]
+    if len(daten) != STAPEL_KOPF + anzahl * STAPEL_EINTRAG:
+        raise ValueError("falsche Länge %d" % len(daten))
+    sendezeit = struct.unpack_from("<I", daten, 2)[0]
+    ergebnis = []
+    for i in range(anzahl):
+        offset = STAPEL_KOPF + i * STAPEL_EINTRAG
+        zeit = struct.unpack_from("<I", daten, offset)[0]
+        eintrag = {"Zeit": zeit, "Alter": max(0, sendezeit - zeit)}
+        werte = werte_entpacken(daten, offset + 4)
+        for j in range(5):
+            eintrag[FELDER[j]] = werte[j]
+        ergebnis.append(eintrag)
+    return ergebnis
+
+
+def aus_dict(daten, zeit):
+    """Kodiert ein dict in der Form der JSON-Nachricht."""
+    return kodieren(zeit, *[daten.get(feld) for feld in FELDER])
@@ -0,0 +1,249 @@
+"""Zwischenspeicher für Messwerte im Flash (Store-and-Forward).
+
+Solange WLAN oder Broker fehlen, gingen die Messwerte bisher verloren. Der
+Telemetriepuffer schreibt sie in eine Datei fester Größe, die als Ring
+genutzt wird (älteste Werte werden überschrieben, wenn sie voll ist), und
+sendet sie nach dem Wiederverbinden gesammelt nach.
+
+Schonend für den Flash:
+- die Datei wird einmal in voller Größe angelegt und danach nur noch
+  überschrieben, nie verlängert oder neu angelegt
+- Datensätze werden im RAM gesammelt und seitenweise (standardmäßig 512 Byte
+  = 32 Datensätze) geschrieben; spätestens nach max_alter_ms wird auch eine
+  halbe Seite geschrieben, damit bei Stromausfall wenig verloren geht
+- der Schreibzeiger steht nicht in einer eigenen Datei, sondern ergibt sich
+  beim Start aus den fortlaufenden Nummern der Datensätze
+- die Nummer des zuletzt gesendeten Datensatzes (Datei pfad + ".pos") wird
+  beim Nachsenden nur alle zeiger_bloecke Blöcke und am Ende geschrieben;
+  nach einem Neustart werden höchstens so viele Blöcke doppelt gesendet;
+  der Server speichert sie nur einmal (je Gerät und Zeit eine Zeile,
+  siehe Server/schema.py)
+
+Ein Datensatz hat 16 Byte (little endian):
+    I  Zeit in s (Unixzeit bzw. Sekunden seit dem Start, siehe uhrzeit.py)
+    H  laufende Nummer
+    H  Füllstand in mm
+    h  Temperatur in 0,01 °C
+    H  Luftfeuchtigkeit in 0,01 %
+    H  Helligkeit in lx
+    B  Bodenfeuchtigkeit in %
+    B  Prüfsumme
+Die fünf Messwerte sind wie im Binärformat kodiert (telemetrie_format.py),
+fehlende Werte (None) werden als Höchstwert des Feldes gespeichert.
+"""
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+import json
+
+from utime import ticks_ms, ticks_add, ticks_diff
+
+from telemetrie_format import werte_packen, werte_entpacken
+
+DATENSATZ = 16
+_LEER = 0xFF
+
+
+def _pruefsumme(puffer, start):
+    summe = 0
+    for i in range(start, start + DATENSATZ - 1):
+        summe += puffer[i]
+    return ~summe & 0xFF
+
+
+class Telemetriepuffer:
+    """Ringspeicher in der Datei pfad für kapazitaet Datensätze.
+
+    kapazitaet muss ein Vielfaches der Datensätze pro Seite sein und
+    höchstens 32768 betragen (laufende Nummer ist 16 Bit breit).
+    """
+
+    def __init__(self, pfad="telemetrie.bin", kapazitaet=2048, seite=512, max_alter_ms=60000,
+                 zeiger_bloecke=16):
+        self.pfad = pfad
+        self.kapazitaet = kapazitaet
+        self.pro_seite = seite // DATENSATZ
+        self.max_alter_ms = max_alter_ms
+        self.zeiger_bloecke = zeiger_bloecke
+        self._bloecke = 0                   # bestätigte Blöcke seit dem letzten Schreiben des Zeigers
+        self._seite = bytearray(seite)
+        self._gepuffert = 0                 # Datensätze im RAM, noch nicht geschrieben
+        self._gepuffert_seit = 0
+        self._datensatz = bytearray(DATENSATZ)
+        self._naechstes_senden = ticks_ms()
+        self._anlegen()
+        self._kopf, self._nummer, gueltig = self._kopf_suchen()
+        # Alles, was beim Start im Flash liegt, gilt als noch nicht gesendet
+        # (außer es wurde schon bestätigt, siehe _zeiger_lesen)
+        gesendet = self._zeiger_lesen()
+        if gesendet is None:
+            self.ausstehend = gueltig
+        else:
+            self.ausstehend = min(gueltig, (self._nummer - 1 - gesendet) & 0xFFFF)
+
+    # --- Datei ---
+
+    def _anlegen(self):
+        groesse = self.kapazitaet * DATENSATZ
+        try:
+            with open(self.pfad, "rb") as datei:
+                vorhanden = datei.seek(0, 2)
+        except OSError:
+            vorhanden = -1
+        if vorhanden == groesse:
+            return
+        leer = bytearray(len(self._seite))
+        for i in range(len(leer)):
+            leer[i] = _LEER
+        with open(self.pfad, "wb") as datei:
+            for _ in range(groesse // len(leer)):
+                datei.write(leer)
+
+    def _kopf_suchen(self):
+        """Sucht den Schreibzeiger: die Stelle, an der die Nummernfolge abreißt.
+
+        Gibt (Index für den nächsten Datensatz, nächste Nummer, Anzahl gültiger Datensätze) zurück.
+        """
+        seite = self._seite
+        erste = None
+        vorige = None
+        kopf = 0
+        nummer = 0
+        gueltig = 0
+        with open(self.pfad, "rb") as datei:
+            for beginn in range(0, self.kapazitaet, self.pro_seite):
+                datei.readinto(seite)
+                for i in range(self.pro_seite):
+                    start = i * DATENSATZ
+                    if seite[start + DATENSATZ - 1] != _pruefsumme(seite, start):
+                        aktuell = None
+                    else:
+                        aktuell = seite[start + 4] | seite[start + 5] << 8
+                        gueltig += 1
+                    if beginn == 0 and i == 0:
+                        erste = aktuell
+                    elif vorige is not None and aktuell != (vorige + 1) & 0xFFFF:
+                        kopf = beginn + i
+                        nummer = (vorige + 1) & 0xFFFF
+                    vorige = aktuell
+        if vorige is not None and erste != (vorige + 1) & 0xFFFF:
+            # Letzter Datensatz der Datei ist der neueste
+            kopf = 0
+            nummer = (vorige + 1) & 0xFFFF
+        return kopf, nummer, gueltig
+
+    def _zeiger_lesen(self):
+        try:
+            with open(self.pfad + ".pos", "rb") as datei:
+                daten = datei.read(2)
+            return daten[0] | daten[1] << 8
+        except (OSError, IndexError):
+            return None
+
+    def _zeiger_schreiben(self):
+        gesendet = (self._nummer - 1 - self.ausstehend) & 0xFFFF
+        with open(self.pfad + ".pos", "wb") as datei:
+            datei.write(bytes((gesendet & 0xFF, gesendet >> 8)))
+
+    # --- Schreiben ---
+
+    def anhaengen(self, zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit):
+        """Legt einen Datensatz im RAM ab, volle Seiten gehen sofort in den Flash."""
+        seite = self._seite
+        start = self._gepuffert * DATENSATZ
+        struct.pack_into("<IH", seite, start, int(zeit) & 0xFFFFFFFF, self._nummer)
+        werte_packen(seite, start + 6, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit)
+        seite[start + DATENSATZ - 1] = _pruefsumme(seite, start)
+        if self._gepuffert == 0:
+            self._gepuffert_seit = ticks_ms()
+        self._gepuffert += 1
+        self._nummer = (self._nummer + 1) & 0xFFFF
+        self.ausstehend = min(self.ausstehend + 1, self.kapazitaet)
+        if self._gepuffert >= self.pro_seite or ticks_diff(ticks_ms(), self._gepuffert_seit) >= self.max_alter_ms:
+            self.schreiben()
+
+    def schreiben(self):
+        """Schreibt die im RAM gesammelten Datensätze in den Flash."""
+        if not self._gepuffert:
+            return
+        daten = memoryview(self._seite)
+        geschrieben = 0
+        with open(self.pfad, "r+b") as datei:
+            while geschrieben < self._gepuffert:
+                # am Dateiende umbrechen
+                anzahl = min(self._gepuffert - geschrieben, self.kapazitaet - self._kopf)
+                datei.seek(self._kopf * DATENSATZ)
+                datei.write(daten[geschrieben * DATENSATZ:(geschrieben + anzahl) * DATENSATZ])
+                geschrieben += anzahl
+                self._kopf = (self._kopf + anzahl) % self.kapazitaet
+        self._gepuffert = 0
+
+    # --- Lesen und Nachsenden ---
+
+    def lesen(self, anzahl):
+        """Liest bis zu anzahl der ältesten noch nicht gesendeten Datensätze.
+
+        Gibt eine Liste von Tupeln (Zeit, Füllstand, Temperatur,
+        Luftfeuchtigkeit, Helligkeit, Bodenfeuchtigkeit) zurück.
+        """
+        self.schreiben()
+        anzahl = min(anzahl, self.ausstehend)
+        index = (self._kopf - self.ausstehend) % self.kapazitaet
+        datensatz = self._datensatz
+        ergebnis = []
+        with open(self.pfad, "rb") as datei:
+            for _ in range(anzahl):
+                datei.seek(index * DATENSATZ)
+                datei.readinto(datensatz)
+                index = (index + 1) % self.kapazitaet
+                if datensatz[DATENSATZ - 1] != _pruefsumme(datensatz, 0):
+                    continue
+                zeit = struct.unpack_from("<I", datensatz, 0)[0]
+                ergebnis.append((zeit,) + werte_entpacken(datensatz, 6))
+        return ergebnis
+
+    def bestaetigen(self, anzahl):
+        """Markiert die ältesten anzahl Datensätze als gesendet.
+
+        Der Zeiger im Flash wird nur alle zeiger_bloecke Aufrufe und nach dem
+        letzten ausstehenden Datensatz geschrieben.
+        """
+        self.ausstehend = max(0, self.ausstehend - anzahl)
+        self._bloecke += 1
+        if self._bloecke >= self.zeiger_bloecke or not self.ausstehend:
+            self._zeiger_schreiben()
+            self._bloecke = 0
+
+    def nachsenden(self, client, topic, jetzt, max_datensaetze=32, intervall_ms=1000):
+        """Sendet höchstens einen Block gepufferter Datensätze, gedrosselt auf einen pro intervall_ms.
+
+        Die Datensätze gehen als JSON-Liste in einer Nachricht raus, mit dem
+        Zeitstempel der Messung (Zeit) und dem Alter in Sekunden (jetzt - Zeit).
+        Das Alter stimmt auch ohne gestellte Uhr (siehe uhrzeit.py), solange
+        das Gerät seit der Messung nicht neu gestartet wurde. Gibt die Anzahl
+        gesendeter Datensätze zurück.
+        """
+        if not self.ausstehend or ticks_diff(ticks_ms(), self._naechstes_senden) < 0:
+            return 0
+        self._naechstes_senden = ticks_add(ticks_ms(), intervall_ms)
+        datensaetze = self.lesen(max_datensaetze)
+        liste = []
+        for zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, boden in datensaetze:
+            liste.append({
+                "Zeit": zeit,
+                "Alter": max(0, jetzt - zeit),
+                "Fuellstand": fuellstand,
+                "Temperatur": temperatur,
+                "Luftfeuchtigkeit": feuchtigkeit,
+                "Helligkeit": helligkeit,
+                "Bodenfeuchtigkeit": boden,
+            })
+        anzahl = min(max_datensaetze, self.ausstehend)
+        if liste and not client.publish(topic, json.dumps(liste)):
+            return 0
+        # Auch unlesbare Datensätze (Prüfsumme falsch) gelten damit als erledigt
+        self.bestaetigen(anzahl)
+        return len(liste)
@@ -0,0 +1,91 @@
+"""Mehrere Messungen gebündelt in einer MQTT-Nachricht senden (Stapelbetrieb).
+
+Für schnelle Diagnosemessungen kostet eine Nachricht pro Messung jedes Mal
+den festen TCP/MQTT-Overhead und auf dem Server einen eigenen INSERT. Der
+Telemetriestapel sammelt die Messungen mit Zeitstempel in einem vorab
+angelegten Puffer (Binärformat Version 2, siehe telemetrie_format.py) und
+sendet sie als eine Nachricht, sobald
+- max_anzahl Messungen gesammelt sind,
+- die älteste Messung max_alter_ms alt ist oder
+- die nächste Messung das Paket über max_paket Byte wachsen ließe
+  (maximale Paketgröße des Brokers bzw. des MQTT-Empfangspuffers).
+
+Node-RED ("Stapel in Datenbank schreiben") schreibt einen Stapel mit einem
+einzigen INSERT über mehrere Zeilen in die Datenbank.
+"""
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+from utime import ticks_ms, ticks_diff
+
+from telemetrie_format import (STAPEL_VERSION, STAPEL_KOPF, STAPEL_EINTRAG, STAPEL_MAX,
+                               werte_packen, werte_entpacken)
+
+# Fester MQTT-Header (1 Byte Typ, bis zu 4 Byte Restlänge, 2 Byte Topiclänge)
+_MQTT_KOPF = 7
+
+
+class Telemetriestapel:
+    """Sammelt Messungen für topic, bis Anzahl, Alter oder Paketgröße erreicht sind."""
+
+    def __init__(self, topic, max_anzahl=20, max_alter_ms=30000, max_paket=1024):
+        platz = (max_paket - _MQTT_KOPF - len(topic) - STAPEL_KOPF) // STAPEL_EINTRAG
+        if platz < 1:
+            raise ValueError("max_paket zu klein für eine Messung")
+        self.topic = topic
+        self.max_anzahl = min(max_anzahl, platz, STAPEL_MAX)
+        self.max_alter_ms = max_alter_ms
+        self._puffer = bytearray(STAPEL_KOPF + self.max_anzahl * STAPEL_EINTRAG)
+        self._puffer[0] = STAPEL_VERSION
+        self.anzahl = 0
+        self._erste = 0
+        # Statistik
+        self.nachrichten = 0
+        self.messungen = 0
+
+    def hinzufuegen(self, zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit):
+        """Legt eine Messung ab. Gibt True zurück, wenn der Stapel jetzt gesendet werden sollte."""
+        offset = STAPEL_KOPF + self.anzahl * STAPEL_EINTRAG
+        struct.pack_into("<I", self._puffer, offset, int(zeit) & 0xFFFFFFFF)
+        werte_packen(self._puffer, offset + 4, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit)
+        if self.anzahl == 0:
+            self._erste = ticks_ms()
+        self.anzahl += 1
+        return self.faellig()
+
+    def faellig(self):
+        """True, wenn der Stapel voll ist oder die älteste Messung zu lange wartet."""
+        if not self.anzahl:
+            return False
+        return self.anzahl >= self.max_anzahl or ticks_diff(ticks_ms(), self._erste) >= self.max_alter_ms
+
+    def nachricht(self, jetzt):
+        """Die Nachricht mit allen gesammelten Messungen (Ansicht auf den Puffer, keine Kopie)."""
+        self._puffer[1] = self.anzahl
+        struct.pack_into("<I", self._puffer, 2, int(jetzt) & 0xFFFFFFFF)
+        return memoryview(self._puffer)[:STAPEL_KOPF + self.anzahl * STAPEL_EINTRAG]
+
+    def senden(self, client, jetzt, puffer=None):
+        """Sendet den Stapel und leert ihn. Gibt die Anzahl gesendeter Messungen zurück.
+
+        Schlägt das Senden fehl, gehen die Messungen in den Telemetriepuffer
+        (falls angegeben), damit sie später nachgesendet werden.
+        """
+        anzahl = self.anzahl
+        if not anzahl:
+            return 0
+        nachricht = self.nachricht(jetzt)
+        self.anzahl = 0
+        if client.publish(self.topic, nachricht):
+            self.nachrichten += 1
+            self.messungen += anzahl
+            return anzahl
+        if puffer is not None:
+            for i in range(anzahl):
+                offset = STAPEL_KOPF + i * STAPEL_EINTRAG
+                zeit = struct.unpack_from("<I", self._puffer, offset)[0]
+                puffer.anhaengen(zeit, *werte_entpacken(self._puffer, offset + 4))
+        return 0
@@ -0,0 +1,232 @@
+"""Gestellte Uhr auf dem Gerät: NTP oder Zeit vom Broker, Zeitstempel bei der Messung.
+
+Bisher setzte erst Node-RED den Zeitstempel ("In Datenbank schreiben":
+Empfangszeit + fest 2 Stunden). Das stimmt nur für sofort gesendete
+Messwerte und nur im Sommer; nachgesendete, gebündelte oder in anderer
+Reihenfolge ankommende Messwerte bekommen eine falsche Zeit.
+
+Uhrzeit hält die Unixzeit (UTC) auf dem Gerät als Versatz zu ticks_ms():
+- per SNTP (RFC 4330) von ntp_server, z. B. einem NTP-Server im lokalen
+  Netz oder pool.ntp.org; die halbe Laufzeit der Anfrage wird abgezogen
+- oder, solange kein NTP-Server erreichbar bzw. konfiguriert ist, aus der
+  Zeit, die Node-RED jede Minute an Zuhause/Wohnung/BloomBuddy/zeit sendet
+  (Unixzeit in ms, genau bis auf die Laufzeit über den Broker)
+
+Die Hauptschleife darf dabei nicht blockieren (Schaltbefehle, siehe
+befehlsempfang.py). Der Name des NTP-Servers wird deshalb nur einmal beim
+Start aufgelöst (vorbereiten(), getaddrinfo blockiert ohne Zeitgrenze).
+pflegen() sendet die Anfrage über einen nicht blockierenden UDP-Socket und
+kehrt sofort zurück; die Antwort liest empfangen(), sobald der Socket
+lesbar ist (angemeldet bei Befehlsempfang.beobachten()), spätestens beim
+nächsten pflegen(). Nur ntp_abfragen() wartet auf die Antwort, für den Start.
+
+zeit() gibt die Unixzeit in Sekunden zurück. Vor der ersten Synchronisation
+sind es die Sekunden seit dem Start (kleiner als GUELTIG_AB); Abstände
+zwischen zwei Zeitstempeln stimmen dann trotzdem, und Empfänger erkennen
+daran, dass die Zeit nicht gestellt ist. Die Uhr des ESP32 (RTC, Epoche
+2000) wird nicht verwendet.
+"""
+
+try:
+    import usocket as socket
+except ImportError:
+    import socket
+
+try:
+    import uselect as select
+except ImportError:
+    import select
+
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+from utime import ticks_ms, ticks_add, ticks_diff
+
+from telemetrie_format import GUELTIG_AB
+
+# Sekunden von 1900 (NTP) bis 1970 (Unix)
+_NTP_VERSATZ = 2208988800
+
+# Anker spätestens nach dieser Zeit nachführen (ticks_ms läuft auf dem ESP32 nach 2^30 ms über)
+_NACHFUEHREN_MS = 3600000
+
+
+def _ntp_ms(daten, offset):
+    """NTP-Zeitstempel (Sekunden seit 1900 + 32 Bit Bruchteil) als Unixzeit in ms."""
+    sekunden, bruchteil = struct.unpack_from("!II", daten, offset)
+    return (sekunden - _NTP_VERSATZ) * 1000 + (bruchteil * 1000 >> 32)
+
+
+class Uhrzeit:
+    def __init__(self, ntp_server=None, port=123, intervall_ms=3600000, wiederholung_ms=60000,
+                 timeout_ms=1000):
+        self.ntp_server = ntp_server
+        self.port = port
+        self.intervall_ms = intervall_ms
+        self.wiederholung_ms = wiederholung_ms
+        self.timeout_ms = timeout_ms
+        # Unixzeit in ms zum Zeitpunkt _anker_ticks (vor der Synchronisation: 0 beim Start)
+        self._anker_ticks = ticks_ms()
+        self._anker_ms = 0
+        self._naechste_abfrage = ticks_ms()
+        self._anfrage = bytearray(48)
+        self._anfrage[0] = 0x1B  # LI 0, Version 3, Modus 3 (Client)
+        # Adresse und Socket aus vorbereiten(), Sendezeit der offenen Anfrage (None ohne)
+        self._adresse = None
+        self._sock = None
+        self._gesendet = None
+        self.quelle = None
+        # Statistik
+        self.korrektur_ms = 0
+        self.verzoegerung_ms = 0
+        self.abfragen = 0
+        self.fehler = 0
+
+    @property
+    def synchron(self):
+        return self.quelle is not None
+
+    def zeit_ms(self):
+        """Unixzeit in ms (vor der Synchronisation: ms seit dem Start)."""
+        vergangen = ticks_diff(ticks_ms(), self._anker_ticks)
+        if vergangen >= _NACHFUEHREN_MS:
+            self._anker_ticks = ticks_add(self._anker_ticks, vergangen)
+            self._anker_ms += vergangen
+            vergangen = 0
+        return self._anker_ms + vergangen
+
+    def zeit(self):
+        """Unixzeit in ganzen Sekunden, wie im Telemetrieformat."""
+        return self.zeit_ms() // 1000
+
+    def _stellen(self, ticks, unix_ms, quelle):
+        if self.synchron:
+            self.korrektur_ms = unix_ms - (self._anker_ms + ticks_diff(ticks, self._anker_ticks))
+        self._anker_ticks = ticks
+        self._anker_ms = unix_ms
+        self.quelle = quelle
+
+    def vorbereiten(self):
+        """Löst den NTP-Server auf und öffnet den UDP-Socket. Gibt True bei Erfolg zurück.
+
+        Blockiert während der Namensauflösung, daher nur beim Start aufrufen.
+        Ohne Erfolg fragt pflegen() nicht per NTP, die Zeit kommt dann vom Broker.
+        """
+        if self.ntp_server is None:
+            return False
+        self.schliessen()
+        try:
+            self._adresse = socket.getaddrinfo(self.ntp_server, self.port)[0][-1]
+            self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._sock.setblocking(False)
+        except OSError:
+            self.fehler += 1
+            self.schliessen()
+            return False
+        return True
+
+    def schliessen(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._gesendet = None
+
+    def socket(self):
+        """UDP-Socket für select.poll (lesbar, wenn eine Antwort da ist), None ohne vorbereiten()."""
+        return self._sock
+
+    def senden(self):
+        """Sendet eine Anfrage, ohne auf die Antwort zu warten. Gibt False bei einem Fehler zurück."""
+        if self._sock is None:
+            return False
+        self.abfragen += 1
+        self._gesendet = ticks_ms()
+        # Der Server gibt die Sendezeit als Originate zurück, daran wird die Antwort erkannt
+        struct.pack_into("!II", self._anfrage, 40, self.abfragen, self._gesendet)
+        try:
+            self._sock.sendto(self._anfrage, self._adresse)
+        except OSError:
+            self._erledigt(False)
+            return False
+        return True
+
+    def empfangen(self):
+        """Liest anliegende Antworten, ohne zu warten, und stellt die Uhr. Gibt True zurück, wenn gestellt.
+
+        Ohne Antwort nach timeout_ms gilt die Anfrage als fehlgeschlagen.
+        """
+        if self._sock is None:
+            return False
+        gestellt = False
+        while True:
+            try:
+                antwort = self._sock.recv(48)
+            except OSError:
+                break  # EAGAIN: nichts (mehr) da
+            empfangen = ticks_ms()
+            # Verspätete Antworten auf frühere Anfragen werden nur abgeholt
+            if self._gesendet is not None and antwort[24:32] == self._anfrage[40:48]:
+                gestellt = self._auswerten(antwort, empfangen)
+                self._erledigt(gestellt)
+        if self._gesendet is not None and ticks_diff(ticks_ms(), self._gesendet) >= self.timeout_ms:
+            self._erledigt(False)
+        return gestellt
+
+    def _auswerten(self, antwort, empfangen):
+        # Modus 4 (Server), Stratum 0 ist ein "Kiss-o'-Death" (Server will nicht antworten)
+        if len(antwort) < 48 or antwort[0] & 0x07 != 4 or antwort[1] == 0:
+            return False
+        server_empfang = _ntp_ms(antwort, 32)
+        server_senden = _ntp_ms(antwort, 40)
+        # Laufzeit hin und zurück ohne die Bearbeitungszeit im Server
+        self.verzoegerung_ms = max(0, ticks_diff(empfangen, self._gesendet) - (server_senden - server_empfang))
+        self._stellen(empfangen, server_senden + self.verzoegerung_ms // 2, "ntp")
+        return True
+
+    def _erledigt(self, erfolg):
+        """Schließt die offene Anfrage ab und plant die nächste."""
+        if not erfolg:
+            self.fehler += 1
+        self._gesendet = None
+        self._naechste_abfrage = ticks_add(ticks_ms(), self.intervall_ms if erfolg else self.wiederholung_ms)
+
+    def ntp_abfragen(self):
+        """Fragt den NTP-Server und wartet höchstens timeout_ms auf die Antwort (blockierend, für den Start).
+
+        Gibt True zurück, wenn die Uhr gestellt wurde.
+        """
+        if not self.senden():
+            return False
+        poll = select.poll()
+        poll.register(self._sock, select.POLLIN)
+        while self._gesendet is not None:
+            poll.poll(max(0, self.timeout_ms - ticks_diff(ticks_ms(), self._gesendet)))
+            if self.empfangen():
+                return True
+        return False
+
+    def broker_zeit(self, nachricht):
+        """Übernimmt die Zeit vom Broker (Unixzeit in ms als Text), solange NTP nicht synchron ist."""
+        if self.quelle == "ntp":
+            return False
+        try:
+            unix_ms = int(nachricht)
+        except ValueError:
+            return False
+        if unix_ms < GUELTIG_AB * 1000:
+            return False
+        self._stellen(ticks_ms(), unix_ms, "broker")
+        return True
+
+    def pflegen(self):
+        """Nicht blockierend: liest eine anliegende Antwort oder sendet eine fällige Anfrage
+        (nach Erfolg alle intervall_ms, nach einem Fehler alle wiederholung_ms).
+        Gibt True zurück, wenn die Uhr gestellt wurde.
+        """
+        if self._gesendet is not None:
+            return self.empfangen()
+        if self._sock is not None and ticks_diff(ticks_ms(), self._naechste_abfrage) >= 0:
+            self.senden()
+        return False
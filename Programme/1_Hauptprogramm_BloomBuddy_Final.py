@@ -31,13 +31,13 @@
 
 # Hardwarezugriff: GPIO, ADC, PWM, I2C, SPI usw.
 import machine
-from machine import Pin, ADC, SoftI2C
+from machine import Pin, ADC, Timer
 # Zeitfunktionen (z. B. sleep, ticks_ms)
 import time
 # WLAN- und Netzwerkfunktionen
 import network
-# MQTT Kommunikation
-from umqtt.simple import MQTTClient
+# MQTT Kommunikation (mit automatischem Neuaufbau der Verbindung)
+from mqtt_sitzung import MQTTSitzung
 # TOF Entfernungssensor
 import VL53L0X
 # Helligkeitssensor
@@ -46,11 +46,31 @@ from bh1750 import BH1750
 from aht import AHT21
 # JSON Dateiformat
 import json
+# Gleichzeitige Sensorerfassung (uasyncio)
+from messzyklus import Messzyklus
+# Gemeinsamer I2C-Bus (Hardware-I2C mit SoftI2C als Rückfallebene)
+from i2cbus import erstelle_bus
+# Zwischenspeicher im Flash für Messwerte ohne Verbindung
+from telemetriepuffer import Telemetriepuffer
+# Kompaktes Binärformat für die Messwerte (14 statt ca. 100 Byte)
+import telemetrie_format
+# Nur geänderte Messwerte senden (Totband), regelmäßig ein vollständiges Schlüsselbild
+from aenderungsfilter import Aenderungsfilter
+# Stapelbetrieb: mehrere Messungen in einer Nachricht
+from telemetriestapel import Telemetriestapel
+# Schaltbefehle sofort verarbeiten, sobald sie am Socket anliegen (select.poll)
+from befehlsempfang import Befehlsempfang
+# Geräte-ID aus der MAC-Adresse und Topics pro Gerät (mehrere BloomBuddys an einem Broker)
+import flotte
+# Gestellte Uhr (NTP oder Zeit vom Broker) für die Zeitstempel der Messwerte
+from uhrzeit import Uhrzeit
 
 # === Initialisierung der Sensorik & Hardware-Komponenten ===
 
 # I2C-Bus konfigurieren (gemeinsam für alle drei I2C-fähigen-Sensoren, ein I2C-Bus wird verwendet)
-i2c = SoftI2C(scl=machine.Pin(4), sda=machine.Pin(5))
+# Hardware-I2C mit 400 kHz, falls nicht verfügbar SoftI2C; zählt Transaktionen pro Sensor
+i2c = erstelle_bus(scl=4, sda=5, freq=400000)
+print("I2C-Bus:", i2c.art, i2c.freq, "Hz")
 
 # Variable für das Relais definieren, Werte initialiseren
 relais = Pin(8, Pin.OUT)
@@ -86,9 +106,16 @@ nass_adc_wert = 1700  # Beispielwert für nassen Boden
 
 # Sensoren initialisieren
 aht21_sensor = AHT21(i2c)
-tof_sensor = VL53L0X.VL53L0X(i2c)
+tof_sensor = VL53L0X.VL53L0X(i2c, cache=True)  # Register-Cache spart Buszugriffe
 bh1750_sensor = BH1750(i2c)
 
+# ToF-Sensor misst dauerhaft alle 180 ms (10 Messwerte pro Messzyklus), ein Timer holt jeden
+# Messwert einmal ab und legt ihn im Hintergrund in einem Ringpuffer ab
+tof_sensor.start_continuous(period=180, size=16, timer=Timer(0))
+# Auf den ersten Messwert höchstens 1 s warten, antwortet der Sensor nicht, bleibt der Füllstand None
+if not tof_sensor.wait_count(1, timeout_ms=1000):
+    print("ToF-Sensor liefert keine Messwerte")
+
 # === WLAN-Verbindung herstellen ===
 
 # WLAN-Parameter für die Schule
@@ -109,36 +136,127 @@ while not wlan.isconnected() and timeout > 0:
     time.sleep(1)
     timeout -= 1
 
-if not wlan.isconnected():
-    print("WLAN-Verbindung fehlgeschlagen!")
-    while True:
-        pass
-
-print('WLAN verbunden')
+if wlan.isconnected():
+    print('WLAN verbunden')
+else:
+    # Kein Stillstand: Messung und Pumpensteuerung laufen weiter,
+    # die MQTT-Sitzung verbindet WLAN und Broker später selbstständig
+    print("WLAN-Verbindung fehlgeschlagen, weiter ohne Netzwerk")
+
+# === Uhrzeit stellen ===
+
+# NTP-Server für die Uhrzeit (z. B. der Laptop mit dem Broker oder "pool.ntp.org"),
+# None = nur die Zeit, die Node-RED jede Minute an TOPIC_ZEIT sendet
+NTP_SERVER = "pool.ntp.org"
+# Jede Messung bekommt beim Erfassen einen Zeitstempel (Unixzeit, UTC); die Uhr wird
+# stündlich nachgestellt, bis dahin läuft sie mit ticks_ms() weiter.
+# Der Name des NTP-Servers wird nur hier aufgelöst (blockiert), in der Hauptschleife
+# wird die Anfrage nur gesendet und die Antwort über select.poll gelesen
+uhr = Uhrzeit(NTP_SERVER, intervall_ms=60 * 60 * 1000)
+if wlan.isconnected() and uhr.vorbereiten() and uhr.ntp_abfragen():
+    print("Uhrzeit per NTP gestellt:", uhr.zeit())
+else:
+    print("NTP nicht erreichbar, Uhrzeit kommt später (NTP oder Broker)")
 
 # === MQTT-Verbindung aufbauen ===
 
 # MQTT-Setup
 BROKER_IP = b"192.168.33.79" #I P-Adresse des Brokers (in diesem Fall des Laptops)
 BROKER_PORT = 1883 # Portdefinition für den Broker
-CLIENT_ID = b"ESP32_Client"
-TOPIC = b"Zuhause/Wohnung/BloomBuddy" # Topic für MQTT-Daten
-
-# MQTT-Client erstellen und verbinden
-client = MQTTClient(CLIENT_ID, BROKER_IP, port=BROKER_PORT)
-
-try:
-    client.connect()
-except Exception as e:
-    print(f"Fehler beim Verbinden: {e}")
-    while True:
-        pass
+# Geräte-ID aus der MAC-Adresse (z. B. "246f28123456"), eindeutig pro ESP32
+GERAET = flotte.geraete_id(wlan.config("mac"))
+CLIENT_ID = flotte.client_id(GERAET)
+print("Geräte-ID:", GERAET)
+# Topics pro Gerät (Zuhause/Wohnung/BloomBuddy/<GERAET>/...): Messwerte, Befehle und Zustand
+# getrennt, damit das Gerät nur Befehle empfängt
+TOPIC = flotte.topic(GERAET, "telemetry") # Topic für MQTT-Daten
+TOPIC_BEFEHL = flotte.topic(GERAET, "cmd/pump") # Schaltbefehle vom Dashboard (mit QoS 1)
+TOPIC_ZUSTAND = flotte.topic(GERAET, "state") # Zustand von Pumpe und Modus (retained)
+TOPIC_QUITTUNG = flotte.topic(GERAET, "ack") # Quittung für jeden Befehl mit ID (Latenzmessung im Dashboard)
+TOPIC_NACHTRAG = flotte.topic(GERAET, "Nachtrag") # Topic für nachgesendete Messwerte
+TOPIC_BINAER = flotte.topic(GERAET, "Binaer") # Topic für Messwerte im Binärformat
+TOPIC_STAPEL = flotte.topic(GERAET, "Stapel") # Topic für gebündelte Messwerte (Stapelbetrieb)
+TOPIC_ZEIT = (flotte.BASIS + "/zeit").encode() # Uhrzeit von Node-RED für alle Geräte (Unixzeit in ms)
+
+# Messwerte im Binärformat statt als JSON senden (Node-RED dekodiert beide Formate)
+BINAERFORMAT = False
+binaer_nachricht = bytearray(telemetrie_format.GROESSE)  # wird jede Runde wiederverwendet
+
+# Stapelbetrieb für schnelle Diagnosemessungen: jede Messung (ohne Totband) wird gesammelt und
+# STAPEL_ANZAHL Messungen bzw. spätestens alle STAPEL_SEKUNDEN in einer Nachricht gesendet
+# (höchstens MAX_PAKET Byte pro MQTT-Paket). 0 = aus, normale Einzelnachrichten
+STAPEL_ANZAHL = 0
+STAPEL_SEKUNDEN = 30
+MAX_PAKET = 1024
+
+# MQTT-Sitzung erstellen: Keepalive-Ping alle 15 s, bei Verbindungsabbruch
+# Neuaufbau mit wachsendem Abstand (1 s bis 60 s), Topics werden neu abonniert;
+# Zustand und Quittungen gehen mit QoS 1 raus (höchstens 4 gleichzeitig ohne PUBACK)
+client = MQTTSitzung(CLIENT_ID, BROKER_IP, port=BROKER_PORT, keepalive=30, wlan=wlan, fenster=4)
+
+# Zuletzt gesendeter Zustand, gesendet wird nur bei Änderung und nach jedem Neuverbinden
+gesendeter_zustand = None
+zustand_verbindungen = 0
+
+def runden(wert, stellen=0):
+    # Rundet einen Mittelwert, None bleibt None (Sensor ohne Messwerte)
+    if wert is None:
+        return None
+    return round(wert, stellen) if stellen else round(wert)
+
+
+def zustand_senden():
+    """Veröffentlicht Pumpe und Modus als retained Nachricht, wenn sie sich geändert haben."""
+    global gesendeter_zustand, zustand_verbindungen
+    zustand = '{"Pumpe": "%s", "Modus": "%s"}' % ("ON" if pumpe_laeuft else "OFF",
+                                                  "manuell" if manueller_modus else "automatik")
+    if zustand == gesendeter_zustand and zustand_verbindungen == client.verbindungen:
+        return
+    if client.verbunden and client.publish(TOPIC_ZUSTAND, zustand, retain=True, qos=1):
+        gesendeter_zustand = zustand
+        zustand_verbindungen = client.verbindungen
+        print("Zustand gesendet:", zustand)
+
+# ID des zuletzt ausgeführten Befehls: Node-RED nummeriert die Befehle fortlaufend, ein Befehl
+# mit derselben ID (erneute Zustellung bei QoS 1) oder einer kleineren ID (veraltet) schaltet nicht
+letzte_befehl_id = 0
+
+def quittung_senden(befehl_id, ergebnis):
+    """Bestätigt einen Befehl mit ID, Ergebnis und dem Zustand danach (QoS 1)."""
+    quittung = '{"ID": %d, "Ergebnis": "%s", "Pumpe": "%s", "Modus": "%s"}' % (
+        befehl_id, ergebnis, "ON" if pumpe_laeuft else "OFF", "manuell" if manueller_modus else "automatik")
+    if not client.publish(TOPIC_QUITTUNG, quittung, qos=1):
+        print("Quittung nicht gesendet:", quittung)
 
 # MQTT Nachrichten Abfrage zur Steuerung der Pumpe über den Handbetrieb
-# MQTT Callback
+# MQTT Callback (für TOPIC_BEFEHL und TOPIC_ZEIT, ungültige Nachrichten werden ignoriert)
 def sub_relais(topic, msg):
-    global manueller_modus, pumpe_laeuft, startzeit, automatik_modus
-    daten = json.loads(msg)
+    global manueller_modus, pumpe_laeuft, startzeit, automatik_modus, letzte_befehl_id
+    if topic == TOPIC_ZEIT:
+        # Uhrzeit vom Broker, wird nur verwendet, solange NTP nicht synchron ist
+        uhr.broker_zeit(msg)
+        return
+    if topic != TOPIC_BEFEHL:
+        return
+    try:
+        daten = json.loads(msg)
+    except ValueError:
+        print("Ungültiger Befehl:", msg)
+        return
+    if not isinstance(daten, dict):
+        print("Ungültiger Befehl:", msg)
+        return
+    # Befehle ohne ID (ältere Dashboards) werden wie bisher immer ausgeführt
+    befehl_id = daten.get("ID")
+    if befehl_id is not None:
+        if not isinstance(befehl_id, int):
+            print("Ungültiger Befehl:", msg)
+            return
+        if befehl_id <= letzte_befehl_id:
+            print("Befehl", befehl_id, "schon ausgeführt oder veraltet")
+            quittung_senden(befehl_id, "doppelt" if befehl_id == letzte_befehl_id else "veraltet")
+            return
+        letzte_befehl_id = befehl_id
     schalter1 = daten.get('Schalter1')
     if schalter1 == "ON":
         relais.value(1)  # Relais EIN
@@ -153,19 +271,65 @@ def sub_relais(topic, msg):
         automatik_modus = True
         pumpe_laeuft = False
         print("Relais AUS (manuell)")
+    # Dashboard sofort über den tatsächlichen Zustand informieren
+    zustand_senden()
+    if befehl_id is not None:
+        quittung_senden(befehl_id, "ausgefuehrt")
 
 client.set_callback(sub_relais)
-client.subscribe(TOPIC)
-print("MQTT-Abonnement auf", TOPIC.decode(), "aktiviert")
+client.subscribe(TOPIC_BEFEHL, qos=1)  # Befehle mit QoS 1, Zustellung wird dem Broker bestätigt
+client.subscribe(TOPIC_ZEIT)
+
+if client.verbinden():
+    print("MQTT-Abonnement auf", TOPIC_BEFEHL.decode(), "aktiviert")
+else:
+    print("MQTT-Broker nicht erreichbar, neuer Versuch im Hintergrund")
+
+# Befehle werden über select.poll erkannt: während der Wartezeiten sofort,
+# während des Messzyklus spätestens nach 10 ms
+befehle = Befehlsempfang(client)
+
+
+def ntp_antwort():
+    """Liest die Antwort des NTP-Servers, sobald sie ankommt (wie Schaltbefehle)."""
+    if uhr.empfangen():
+        print(f"Uhrzeit per NTP gestellt, Korrektur {uhr.korrektur_ms} ms")
+
+
+if uhr.socket() is not None:
+    befehle.beobachten(uhr.socket(), ntp_antwort)
+
+# Messwerte, die ohne Verbindung nicht gesendet werden können, landen im Flash
+# (bis zu 2048 Datensätze) und werden nach dem Wiederverbinden nachgesendet
+puffer = Telemetriepuffer("telemetrie.bin", kapazitaet=2048)
+if puffer.ausstehend:
+    print(f"{puffer.ausstehend} Messwerte im Zwischenspeicher")
+
+# Messwerte nur senden, wenn sie sich außerhalb des Totbands geändert haben
+# (Füllstand 5 mm, Temperatur 0,2 °C, Luftfeuchtigkeit 1 %, Helligkeit 10 %, Bodenfeuchtigkeit 1 %),
+# dann nur die geänderten Felder; alle 10 Minuten und nach jedem Neuverbinden alle Felder
+aenderungen = Aenderungsfilter(schluesselbild_ms=10 * 60 * 1000)
+verbindungen = client.verbindungen
+
+if STAPEL_ANZAHL:
+    stapel = Telemetriestapel(TOPIC_STAPEL, max_anzahl=STAPEL_ANZAHL,
+                              max_alter_ms=STAPEL_SEKUNDEN * 1000, max_paket=MAX_PAKET)
+    print(f"Stapelbetrieb: bis zu {stapel.max_anzahl} Messungen pro Nachricht")
+else:
+    stapel = None
+
+# Messzyklus für ToF, AHT21 und BH1750 (je 10 Messwerte, MQTT wird während der Messung geprüft)
+messzyklus = Messzyklus(tof_sensor, aht21_sensor, bh1750_sensor, anzahl=10, client=befehle,
+                        mqtt_intervall_ms=10)
 
 # === Hauptprogrammschleife ===
 
 while True:
     
-    client.check_msg()  # Prüft, ob neue MQTT-Nachricht da ist
+    befehle.pruefen()  # Prüft, ob neue MQTT-Nachricht da ist
     
     # Füllstand vom Wassertank abfragen und in die Variable schreiben
-    fuellstand_mm = tof_sensor.read()  # Messwert vom VL53L0X
+    fuellstand_mm = tof_sensor.read_latest()  # Neuester Messwert vom VL53L0X aus dem Ringpuffer (None wenn leer)
     
     # --- Bodenfeuchtigkeit erfassen & Pumpensteuerung ---
     
@@ -184,7 +348,8 @@ while True:
     # --- Automatikbetrieb ---
     # Pumpe läuft in Automatik an wenn der Automatikmodus aktiv, die Bodenfeuchtigkeit unter 40 liegt
     # und der Füllstand des Wassertanks über 280mm liegt
-    if automatik_modus and bodenfeuchtigkeit <= 40 and fuellstand_mm < 230 and not pumpe_laeuft :
+    # Ohne Füllstand (ToF-Sensor liefert nichts) wird nicht gepumpt
+    if automatik_modus and bodenfeuchtigkeit <= 40 and fuellstand_mm is not None and fuellstand_mm < 230 and not pumpe_laeuft :
         relais.value(1)  # Relais EIN (HIGH)
         startzeit = time.ticks_ms()
         pumpe_laeuft = True
@@ -204,59 +369,29 @@ while True:
     if not pumpe_laeuft and not manueller_modus:
         relais.value(0)
         print("Relais bleibt AUS")
+    
+    # Zustand von Pumpe und Modus melden (nur bei Änderung, retained)
+    zustand_senden()
  
     # --- Sensorwerte sammeln (ToF, AHT21, BH1750) ---
     
-    # Listen zum speichern der Messwerte
-    fuellstand_roh = []
-    temperatur_roh = []
-    feuchtigkeit_roh = []
-    helligkeit_roh = []
-
-    for i in range(10):
-        client.check_msg()  # Neue Nachrichten über MQTT prüfen
-        # Messung muss getriggert werden damit die Liste gefüllt werden kann
-        fuellstand_roh.append(tof_sensor.read())
-        time.sleep(0.1)
-
-    for i in range(10):
-        client.check_msg()  # Neue Nachrichten über MQTT prüfen
-        # Messung muss getriggert werden damit die Liste gefüllt werden kann, Messwerte werden in die Liste geschrieben
-        aht21_sensor.measure()
-        temperatur_roh.append(aht21_sensor.temperature)
-        feuchtigkeit_roh.append(aht21_sensor.humidity)
-        time.sleep(0.1)
-        
-    for i in range(10):
-        client.check_msg()  # Neue Nachrichten über MQTT prüfen
-        # ONCE_HIRES_1-Modus, wird verwendet da dieser in der Bibliothek verwendet wird, dieser löst Messung aus
-        helligkeit_roh.append(bh1750_sensor.luminance(0x20))
-        time.sleep(0.1)
+    # Alle drei Sensoren messen gleichzeitig (uasyncio), währenddessen werden MQTT-Nachrichten geprüft
+    messzyklus.messen()
+    print(f"Messzyklus: {messzyklus.dauer_ms} ms")
+    # Zeitstempel der Messung (Unixzeit, UTC), gilt auch für nachgesendete und gebündelte Werte
+    zeit = uhr.zeit()
     
     # --- Ausreißer entfernen & Mittelwerte berechnen ---
     
-    # Höchsten und Niedrigsten Messwert entfernen aus den jeweiligen Listen entfernen
-    if len(fuellstand_roh) > 2:
-        fuellstand_roh.remove(max(fuellstand_roh))
-        fuellstand_roh.remove(min(fuellstand_roh))
-
-    if len(temperatur_roh) > 2:
-        temperatur_roh.remove(max(temperatur_roh))
-        temperatur_roh.remove(min(temperatur_roh))
-    
-    if len(feuchtigkeit_roh) > 2:
-        feuchtigkeit_roh.remove(max(feuchtigkeit_roh))
-        feuchtigkeit_roh.remove(min(feuchtigkeit_roh))
-        
-    if len(helligkeit_roh) > 2:     
-        helligkeit_roh.remove(max(helligkeit_roh))
-        helligkeit_roh.remove(min(helligkeit_roh))
-
-    # Mittelwerte berechnen für eine höhere Genauigkeit
-    fuellstand = round(sum(fuellstand_roh) / len(fuellstand_roh))
-    temperatur = round(sum(temperatur_roh) / len(temperatur_roh))
-    feuchtigkeit = round(sum(feuchtigkeit_roh) / len(feuchtigkeit_roh))
-    helligkeit = round(sum(helligkeit_roh) / len(helligkeit_roh))
+    # Gleitende Filter über die letzten 10 Messwerte: höchster und niedrigster Wert werden
+    # verworfen, der Mittelwert der übrigen Werte wird für eine höhere Genauigkeit verwendet
+    # Liefert ein Sensor keine Werte, ist der Mittelwert None und wird als fehlend gesendet
+    fuellstand = runden(messzyklus.fuellstand.gestutzter_mittelwert())
+    # Temperatur auf 0,1 °C, sonst greift das Totband von 0,2 °C im Änderungsfilter nicht
+    # (ganze Grad gibt es erst in der JSON-Nachricht, nach der Entscheidung des Filters)
+    temperatur = runden(messzyklus.temperatur.gestutzter_mittelwert(), 1)
+    feuchtigkeit = runden(messzyklus.feuchtigkeit.gestutzter_mittelwert())
+    helligkeit = runden(messzyklus.helligkeit.gestutzter_mittelwert())
     
     # Ergebnisse ausgeben
     print(f"Entfernung: {fuellstand} mm")
@@ -264,7 +399,7 @@ while True:
     print(f"Durchschnittliche Luftfeuchtigkeit: {feuchtigkeit}%")
     print(f"Durchschnittliche Helligkeit: {helligkeit}lux")
     
-    # --- Sensordaten als JSON aufbereiten & per MQTT senden ---
+    # --- Sensordaten als JSON bzw. binär aufbereiten & per MQTT senden ---
     
     # Daten als JSON-Objekt erstellen
     data = {
@@ -275,28 +410,61 @@ while True:
         "Bodenfeuchtigkeit": bodenfeuchtigkeit
     }
     
-    # JSON-Objekt in eine Zeichenkette umwandeln
-    json_data = json.dumps(data)
+    # Nach einem Neuverbinden kennt der Empfänger den Zustand evtl. nicht mehr
+    if client.verbindungen != verbindungen:
+        verbindungen = client.verbindungen
+        aenderungen.erzwingen()
     
-    # JSON-Daten über MQTT senden
-    client.publish(TOPIC, json_data)
+    # Nur die Felder, die sich außerhalb ihres Totbands geändert haben (oder alle beim Schlüsselbild)
+    delta = None if stapel else aenderungen.pruefen(data)
     
-    # Rückmeldung ob der Wert gesendet wurde
-    print(f"Sensordaten gesendet: {json_data}")
+    if stapel:
+        # Stapelbetrieb: jede Messung sammeln, gesendet wird bei vollem Stapel oder nach STAPEL_SEKUNDEN
+        # (ohne Verbindung landen die Messungen im Zwischenspeicher)
+        if stapel.hinzufuegen(zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit):
+            anzahl = stapel.senden(client, uhr.zeit(), puffer)
+            if anzahl:
+                print(f"Stapel mit {anzahl} Messungen gesendet an {TOPIC_STAPEL.decode()}")
+            else:
+                print(f"MQTT nicht verbunden, Stapel zwischengespeichert ({puffer.ausstehend})")
+    elif delta is None:
+        print("Keine Änderung außerhalb der Totbänder, nichts gesendet")
+    else:
+        if BINAERFORMAT:
+            # 14 Byte mit Version und Zeitstempel, ohne neue Zeichenketten (immer alle Felder)
+            telemetrie_format.kodieren(zeit, fuellstand, temperatur, feuchtigkeit, helligkeit,
+                                       bodenfeuchtigkeit, binaer_nachricht)
+            topic, nachricht = TOPIC_BINAER, binaer_nachricht
+        else:
+            # JSON-Objekt in eine Zeichenkette umwandeln, mit Zeitstempel, sobald die Uhr gestellt ist
+            if "Temperatur" in delta:
+                delta["Temperatur"] = runden(delta["Temperatur"])  # ganze Grad wie bisher
+            if uhr.synchron:
+                delta["Zeit"] = zeit
+            topic, nachricht = TOPIC, json.dumps(delta)
+        
+        # Daten über MQTT senden und Rückmeldung ob der Wert gesendet wurde
+        if client.publish(topic, nachricht):
+            print(f"Sensordaten gesendet: {len(nachricht)} Byte an {topic.decode()}")
+        else:
+            # Vollständige Werte zwischenspeichern, die nächste Nachricht wird ein Schlüsselbild
+            aenderungen.erzwingen()
+            puffer.anhaengen(zeit, fuellstand, temperatur, feuchtigkeit, helligkeit, bodenfeuchtigkeit)
+            print(f"MQTT nicht verbunden, Sensordaten zwischengespeichert ({puffer.ausstehend})")
+
+    # Zwischengespeicherte Messwerte blockweise nachsenden (höchstens 32 pro Durchlauf)
+    if client.verbunden and puffer.ausstehend:
+        anzahl = puffer.nachsenden(client, TOPIC_NACHTRAG, uhr.zeit())
+        if anzahl:
+            print(f"{anzahl} Messwerte nachgesendet, noch {puffer.ausstehend} im Zwischenspeicher")
     
-    # Listen nach Berechnung leeren um falsche Messwerte zu vermeiden
-    fuellstand_roh.clear()
-    temperatur_roh.clear()
-    feuchtigkeit_roh.clear()
-    helligkeit_roh.clear()
+    # Uhr stündlich per NTP nachstellen (nach einem Fehler jede Minute neu versuchen);
+    # sendet nur die Anfrage, die Antwort liest befehle, ohne zu warten
+    if wlan.isconnected() and uhr.pflegen():
+        print(f"Uhrzeit per NTP gestellt, Korrektur {uhr.korrektur_ms} ms")
     
-    # Prüfen, ob die Liste wirklich leer ist
-    print("Liste nach dem Leeren:", fuellstand_roh)
-    print("Liste nach dem Leeren:", temperatur_roh)
-    print("Liste nach dem Leeren:", feuchtigkeit_roh)
-    print("Liste nach dem Leeren:", helligkeit_roh)
-        
     # --- Standardwartezeit zwischen Programmzyklen ---
     
-    time.sleep(1)
+    # Wartet 1 s, Schaltbefehle werden dabei sofort ausgeführt
+    befehle.warten_ms(1000)
        
\ No newline at end of file
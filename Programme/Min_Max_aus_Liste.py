@@ -1,21 +1,18 @@
 import time
+from messfilter import GleitenderFilter
 
-# Liste zum Speichern der Messwerte
-fuellstand_roh = []
+# Gleitender Filter über die letzten 10 Messwerte (ersetzt die Liste)
+fuellstand_filter = GleitenderFilter(groesse=10, kappen=1)
 
 # 10 Messwerte aufnehmen
 for i in range(10):
-    fuellstand_roh.append(tof_sensor.read())
+    fuellstand_filter.hinzufuegen(tof_sensor.read())
     time.sleep(0.1)  # Kurze Pause zwischen den Messungen
 
-# Höchsten und niedrigsten Wert entfernen
-fuellstand_roh.remove(max(fuellstand_roh))  # Entfernt den höchsten Wert
-fuellstand_roh.remove(min(fuellstand_roh))  # Entfernt den niedrigsten Wert
-
-# Messwerte in der Liste kontrollieren
-print(fuellstand_roh)
+# Höchster und niedrigster Wert werden beim gestutzten Mittelwert nicht berücksichtigt
+print(f"Min: {fuellstand_filter.minimum()} mm, Max: {fuellstand_filter.maximum()} mm")
 
 # Mittelwert berechnen
-fuellstand = round(sum(fuellstand_roh) / len(fuellstand_roh))
+fuellstand = round(fuellstand_filter.gestutzter_mittelwert())
 
 print(f"Entfernung: {fuellstand} mm")
@@ -0,0 +1,277 @@
+"""Rohwerte spaltenweise in Dateien je Gerät und Monat exportieren und wieder einblenden.
+
+Für Auswertungen über Monate oder ein Jahr müsste man sonst Millionen
+Zeilen einzeln aus MariaDB holen, und das auf dem Server, der gleichzeitig
+die Messwerte speichert. exportieren() liest jeden abgeschlossenen Monat
+einmal (je Gerät und Tag eine Abfrage "verlauf", also über den Index
+(Geraet, Zeit)) und schreibt ihn nach <ziel>/<geraet>/<JJJJMM>.npz:
+- ein Zip-Archiv mit einer .npy-Datei je Spalte, wie numpy.savez()
+- Zeit als datetime64[s] (Ortszeit wie in der Datenbank), die fünf
+  Messwerte als float32, fehlende Werte als NaN; 28 Byte pro Zeile
+- die Spalten werden nicht komprimiert (ZIP_STORED), damit laden() sie
+  per mmap einblenden kann, ohne sie zu lesen; mit komprimieren=True
+  (ZIP_DEFLATED) sind die Dateien kleiner, werden dann aber ganz gelesen
+Je Gerät werden nur die Monate vom ersten bis zum letzten Messwert dieses
+Geräts gelesen und bereits exportierte Monate übersprungen (Monate ohne
+Zeilen in dieser Spanne als leere Datei); einmal im Monat aufgerufen,
+liest der Export also nur den letzten Monat.
+
+numpy wird zum Schreiben nicht gebraucht. laden() gibt numpy.memmap
+zurück, wenn numpy installiert ist, sonst memoryview (format "q" bzw. "f").
+Mit numpy lassen sich die Dateien auch direkt öffnen: numpy.load(pfad).
+
+Aufruf:
+    python Server/export.py --datenbank mariadb://... --ziel archiv
+    python Server/export.py --ziel archiv --auswerten 246f28123456
+"""
+
+import array
+import ast
+import datetime
+import functools
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+import zipfile
+
+import schema
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MESSWERTE = ("Temperatur", "Luftfeuchtigkeit", "Helligkeit", "Fuellstand", "Bodenfeuchtigkeit")
+# Spalte -> (Typ für array.array bzw. memoryview, Typ in der .npy-Datei)
+TYPEN = dict([("Zeit", ("q", "<M8[s]"))] + [(messwert, ("f", "<f4")) for messwert in MESSWERTE])
+
+FORMAT = "%Y-%m-%d %H:%M:%S"
+_NAN = float("nan")
+
+
+def datei(ziel, geraet, monat):
+    # Geräte-IDs sind Hex-Zahlen; alles andere wird ersetzt, damit kein Pfad entsteht
+    return os.path.join(ziel, re.sub(r"[^\w-]", "_", geraet), monat + ".npz")
+
+
+@functools.lru_cache(maxsize=4096)
+def _tag(datum):
+    return (datetime.date(int(datum[:4]), int(datum[5:7]), int(datum[8:10])).toordinal()
+            - datetime.date(1970, 1, 1).toordinal()) * 86400
+
+
+def sekunden(zeit):
+    """Sekunden seit 1970 ohne Zeitzone (wie datetime64[s]) für YYYY-MM-DD HH:MM:SS oder datetime."""
+    if isinstance(zeit, datetime.datetime):
+        return (zeit.toordinal() - 719163) * 86400 + zeit.hour * 3600 + zeit.minute * 60 + zeit.second
+    return _tag(zeit[:10]) + int(zeit[11:13]) * 3600 + int(zeit[14:16]) * 60 + int(zeit[17:19])
+
+
+def _npy(spalte, werte):
+    """Inhalt einer .npy-Datei (Format 1.0) für ein array.array."""
+    if sys.byteorder == "big":
+        werte = array.array(werte.typecode, werte)
+        werte.byteswap()
+    kopf = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (TYPEN[spalte][1], len(werte))
+    # Wie numpy: Kopf mit Leerzeichen auffüllen, sodass die Daten auf 64 Byte ausgerichtet beginnen
+    kopf += " " * (-(10 + len(kopf) + 1) % 64) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(kopf)) + kopf.encode("latin1") + werte.tobytes()
+
+
+def schreiben(pfad, spalten, komprimieren=False):
+    """Schreibt {spalte: array.array} als .npz; erst unter anderem Namen, damit keine halbe Datei entsteht."""
+    os.makedirs(os.path.dirname(pfad), exist_ok=True)
+    neu = pfad + ".neu"
+    with zipfile.ZipFile(neu, "w", zipfile.ZIP_DEFLATED if komprimieren else zipfile.ZIP_STORED) as archiv:
+        for spalte, werte in spalten.items():
+            archiv.writestr(spalte + ".npy", _npy(spalte, werte))
+    os.replace(neu, pfad)
+
+
+def _leer():
+    return {spalte: array.array(typ) for spalte, (typ, _) in TYPEN.items()}
+
+
+def anhaengen(spalten, zeilen):
+    """Hängt Zeilen (Spalten wie datenbank.SPALTEN) an die Spalten an."""
+    zeit = spalten["Zeit"]
+    messwerte = [spalten[messwert] for messwert in MESSWERTE]
+    for zeile in zeilen:
+        zeit.append(sekunden(zeile[6]))
+        for i, werte in enumerate(messwerte):
+            wert = zeile[1 + i]
+            werte.append(_NAN if wert is None else wert)
+
+
+def exportieren(pool, ziel, bis_monat=None, neu=False, komprimieren=False, pause_s=0.0, ausgabe=print):
+    """Exportiert alle abgeschlossenen Monate bis bis_monat (JJJJMM), gibt (dateien, zeilen) zurück.
+
+    Zwischen zwei Abfragen liegt pause_s, damit der Export die Datenbank
+    nicht dauerhaft belegt. Vorhandene Dateien werden nur mit neu ersetzt.
+    """
+    # Der laufende Monat ändert sich noch
+    bis_monat = bis_monat or schema.monat_plus(schema.monat(datetime.datetime.now()), -1)
+    dateien = gesamt = 0
+    for (geraet,) in sorted(pool.abfragen("geraete")):
+        # Nur vom ersten bis zum letzten Monat mit Daten des Geräts
+        erste, letzte = pool.abfragen("zeitraum_geraet", geraet)[0]
+        if erste is None:
+            continue
+        for monat in schema.monate(schema.monat(erste), min(bis_monat, schema.monat(letzte))):
+            pfad = datei(ziel, geraet, monat)
+            if os.path.exists(pfad) and not neu:
+                continue
+            spalten = _leer()
+            tag = datetime.datetime.strptime(schema.monatsbeginn(monat), FORMAT)
+            ende = datetime.datetime.strptime(schema.monatsbeginn(schema.monat_plus(monat, 1)), FORMAT)
+            while tag < ende:
+                naechster = tag + datetime.timedelta(days=1)
+                anhaengen(spalten, pool.abfragen("verlauf", geraet, tag.strftime(FORMAT),
+                                                 naechster.strftime(FORMAT)))
+                tag = naechster
+                time.sleep(pause_s)
+            # Auch ohne Zeilen schreiben (leere Datei als Markierung), sonst würde eine
+            # Lücke im Zeitraum des Geräts bei jedem Aufruf erneut abgefragt
+            schreiben(pfad, spalten, komprimieren)
+            dateien += 1
+            gesamt += len(spalten["Zeit"])
+            ausgabe("%s: %d Zeilen" % (pfad, len(spalten["Zeit"])))
+    return dateien, gesamt
+
+
+def _npy_kopf(daten):
+    """(descr, anzahl, länge des Kopfes) aus den ersten Bytes einer .npy-Datei."""
+    if daten[:6] != b"\x93NUMPY":
+        raise ValueError("keine .npy-Datei")
+    if daten[6] == 1:
+        laenge = 10 + struct.unpack("<H", daten[8:10])[0]
+    else:
+        laenge = 12 + struct.unpack("<I", daten[8:12])[0]
+    kopf = ast.literal_eval(bytes(daten[10 if daten[6] == 1 else 12:laenge]).decode("latin1"))
+    return kopf["descr"], kopf["shape"][0], laenge
+
+
+def _typ(descr):
+    for typ, npy in TYPEN.values():
+        if npy == descr:
+            return typ
+    raise ValueError("unbekannter Typ %r" % descr)
+
+
+def laden(pfad):
+    """{spalte: Array} einer exportierten Datei; nicht komprimierte Spalten werden per mmap eingeblendet."""
+    ergebnis = {}
+    with open(pfad, "rb") as f, zipfile.ZipFile(f) as archiv:
+        eingeblendet = None
+        for info in archiv.infolist():
+            spalte = info.filename[:-4]
+            if info.compress_type != zipfile.ZIP_STORED:
+                daten = archiv.read(info)
+                descr, anzahl, kopf = _npy_kopf(daten)
+                if numpy is not None:
+                    ergebnis[spalte] = numpy.frombuffer(daten, numpy.dtype(descr), anzahl, kopf)
+                else:
+                    ergebnis[spalte] = memoryview(daten)[kopf:].cast(_typ(descr))
+                continue
+            # Die Daten beginnen hinter dem lokalen Kopf des Zip-Eintrags (30 Byte, Name, Extrafeld)
+            f.seek(info.header_offset)
+            lokal = f.read(30)
+            beginn = info.header_offset + 30 + struct.unpack("<H", lokal[26:28])[0] \
+                + struct.unpack("<H", lokal[28:30])[0]
+            f.seek(beginn)
+            descr, anzahl, kopf = _npy_kopf(f.read(128))
+            if numpy is not None:
+                # numpy.memmap kann keine leere Spalte (Monat ohne Zeilen) einblenden
+                ergebnis[spalte] = numpy.memmap(pfad, numpy.dtype(descr), "r", beginn + kopf, (anzahl,)) \
+                    if anzahl else numpy.empty(0, numpy.dtype(descr))
+            else:
+                if eingeblendet is None:
+                    eingeblendet = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                typ = _typ(descr)
+                start = beginn + kopf
+                ergebnis[spalte] = eingeblendet[start:start + anzahl * struct.calcsize(typ)].cast(typ)
+    return ergebnis
+
+
+def monate_laden(ziel, geraet, von=None, bis=None):
+    """[(monat, spalten)] aller exportierten Monate eines Geräts von bis bis (JJJJMM, einschließlich)."""
+    verzeichnis = os.path.dirname(datei(ziel, geraet, "000000"))
+    if not os.path.isdir(verzeichnis):
+        return []
+    ergebnis = []
+    for name in sorted(os.listdir(verzeichnis)):
+        monat = name[:-4]
+        if name.endswith(".npz") and (von is None or monat >= von) and (bis is None or monat <= bis):
+            ergebnis.append((monat, laden(os.path.join(verzeichnis, name))))
+    return ergebnis
+
+
+def auswerten(monate):
+    """{messwert: (anzahl, minimum, mittelwert, maximum)} über die Monate aus monate_laden()."""
+    ergebnis = {}
+    for messwert in MESSWERTE:
+        anzahl, summe, minimum, maximum = 0, 0.0, None, None
+        for _, spalten in monate:
+            werte = spalten[messwert]
+            if numpy is not None:
+                gueltig = werte[~numpy.isnan(werte)]
+                if not len(gueltig):
+                    continue
+                teil = (len(gueltig), float(gueltig.sum(dtype=numpy.float64)), float(gueltig.min()),
+                        float(gueltig.max()))
+            else:
+                gueltig = [wert for wert in werte if wert == wert]
+                if not gueltig:
+                    continue
+                teil = (len(gueltig), sum(gueltig), min(gueltig), max(gueltig))
+            anzahl += teil[0]
+            summe += teil[1]
+            minimum = teil[2] if minimum is None else min(minimum, teil[2])
+            maximum = teil[3] if maximum is None else max(maximum, teil[3])
+        ergebnis[messwert] = (anzahl, minimum, summe / anzahl if anzahl else None, maximum)
+    return ergebnis
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rohwerte je Gerät und Monat spaltenweise exportieren")
+    parser.add_argument("--datenbank", metavar="URL", help="exportieren aus dieser Datenbank")
+    parser.add_argument("--ziel", default="archiv", help="Verzeichnis für die Dateien")
+    parser.add_argument("--bis", metavar="JJJJMM", help="letzter Monat (Standard: der vorige)")
+    parser.add_argument("--neu", action="store_true", help="vorhandene Dateien neu schreiben")
+    parser.add_argument("--komprimieren", action="store_true",
+                        help="kleinere Dateien, die beim Laden aber ganz gelesen werden")
+    parser.add_argument("--pause-ms", type=int, default=0, help="Pause zwischen zwei Abfragen")
+    parser.add_argument("--auswerten", metavar="GERAET", help="Minimum, Mittelwert und Maximum aus den Dateien")
+    args = parser.parse_args()
+
+    if args.datenbank:
+        import datenbank
+
+        pool = datenbank.oeffnen(args.datenbank, groesse=1)
+        try:
+            start = time.perf_counter()
+            dateien, zeilen = exportieren(pool, args.ziel, args.bis, args.neu, args.komprimieren,
+                                          args.pause_ms / 1000)
+            print("%d Dateien mit %d Zeilen in %.1f s" % (dateien, zeilen, time.perf_counter() - start))
+        finally:
+            pool.schliessen()
+    if args.auswerten:
+        start = time.perf_counter()
+        monate = monate_laden(args.ziel, args.auswerten)
+        for messwert, (anzahl, minimum, mittel, maximum) in auswerten(monate).items():
+            print("%-18s %10d Werte  %s/%s/%s" % (messwert, anzahl, _zahl(minimum), _zahl(mittel), _zahl(maximum)))
+        print("%d Monate in %.2f s (%s)" % (len(monate), time.perf_counter() - start,
+                                           "numpy" if numpy is not None else "ohne numpy"))
+
+
+def _zahl(wert):
+    return "-" if wert is None else "%.4g" % wert
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Minimaler MQTT-3.1.1-Client für asyncio (QoS 0).
+
+Wird vom Ingest-Dienst (ingest.py) und vom Lastgenerator
+(Simulator/lastgenerator.py) benutzt, damit auf dem Server kein
+zusätzliches MQTT-Paket installiert werden muss. Unterstützt CONNECT,
+SUBSCRIBE, PUBLISH mit QoS 0 und Keepalive-Pings.
+
+Der Callback empfangen(topic, nachricht) darf eine Coroutine sein. Dann
+wird erst nach ihrem Ende weitergelesen: ist der Empfänger langsam, staut
+sich die Verbindung bis zum Broker zurück (Gegendruck), statt dass
+Nachrichten im Speicher auflaufen.
+"""
+
+import asyncio
+import struct
+
+
+def _laenge(n):
+    daten = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        daten.append(byte | 0x80 if n else byte)
+        if not n:
+            return bytes(daten)
+
+
+def _str(daten):
+    return struct.pack("!H", len(daten)) + daten
+
+
+class Verbindung:
+    def __init__(self, client_id, empfangen=None, keepalive=60):
+        self.client_id = client_id
+        self.empfangen = empfangen
+        self.keepalive = keepalive
+        self._leser = None
+        self._schreiber = None
+        self._aufgaben = []
+        self.offen = False
+
+    async def verbinden(self, host, port):
+        self._leser, self._schreiber = await asyncio.open_connection(host, port)
+        rumpf = _str(b"MQTT") + bytes([4, 0x02]) + struct.pack("!H", self.keepalive) + _str(self.client_id)
+        self._schreiber.write(b"\x10" + _laenge(len(rumpf)) + rumpf)
+        kopf, daten = await self._paket_lesen()
+        if kopf != 0x20 or daten[1] != 0:
+            raise ConnectionError("CONNECT abgelehnt")
+        self.offen = True
+        self._aufgaben = [asyncio.ensure_future(self._lesen()), asyncio.ensure_future(self._pingen())]
+
+    async def _paket_lesen(self):
+        kopf = (await self._leser.readexactly(1))[0]
+        laenge = 0
+        faktor = 1
+        while True:
+            byte = (await self._leser.readexactly(1))[0]
+            laenge += (byte & 0x7F) * faktor
+            if not byte & 0x80:
+                break
+            faktor <<= 7
+        return kopf, await self._leser.readexactly(laenge) if laenge else b""
+
+    async def _lesen(self):
+        try:
+            while True:
+                kopf, daten = await self._paket_lesen()
+                if kopf & 0xF0 == 0x30 and self.empfangen is not None:
+                    laenge = struct.unpack_from("!H", daten)[0]
+                    pos = 2 + laenge + (2 if kopf & 0x06 else 0)
+                    ergebnis = self.empfangen(daten[2:2 + laenge].decode(), daten[pos:])
+                    if ergebnis is not None:
+                        await ergebnis
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            self.offen = False
+
+    async def _pingen(self):
+        while self.offen:
+            await asyncio.sleep(self.keepalive / 2)
+            self._senden(b"\xc0\x00")
+
+    def _senden(self, daten):
+        if self.offen:
+            self._schreiber.write(daten)
+
+    def publish(self, topic, nachricht, retain=False):
+        rumpf = _str(topic.encode()) + nachricht
+        self._senden(bytes([0x30 | int(retain)]) + _laenge(len(rumpf)) + rumpf)
+
+    def subscribe(self, topic):
+        rumpf = struct.pack("!H", 1) + _str(topic.encode()) + b"\x00"
+        self._senden(b"\x82" + _laenge(len(rumpf)) + rumpf)
+
+    async def warten(self):
+        """Kehrt zurück, wenn die Verbindung vom Broker getrennt wurde."""
+        if self._aufgaben:
+            await asyncio.shield(self._aufgaben[0])
+
+    async def trennen(self):
+        self._senden(b"\xe0\x00")
+        self.offen = False
+        for aufgabe in self._aufgaben:
+            aufgabe.cancel()
+        if self._schreiber is not None:
+            self._schreiber.close()
@@ -0,0 +1,245 @@
+"""Verdichtete Messwerte (Rollups) für lange Zeiträume in Diagrammen und Auswertungen.
+
+Die Rohwert-Diagramme in Node-RED halten jede Messung im Speicher und
+bauen sich daraus neu auf; über eine Woche oder einen Monat sind das je
+nach Messrate Hunderttausende Punkte. Für jede Stufe in STUFEN (1 Minute, 15 Minuten, 1 Stunde)
+gibt es eine Tabelle sensorwerte_<stufe> mit einer Zeile pro Gerät und
+Intervall (Geraet, Beginn) und für jeden der fünf Messwerte
+<Messwert>_min, _max, _summe und _anzahl. Der Mittelwert ist
+_summe / _anzahl; so lassen sich Teilergebnisse einfach addieren.
+
+Fortgeschrieben wird beim Schreiben jedes Stapels (datenbank.Pool.einfuegen,
+in derselben Transaktion wie die Rohwerte): anweisungen() fasst den Stapel
+je Gerät und Minute zusammen, die 15-Minuten- und Stundenwerte daraus
+(nicht noch einmal aus den Rohwerten), und führt sie per Upsert mit den
+vorhandenen Zeilen zusammen. Nachgetragene Messwerte landen so ebenfalls
+im richtigen Intervall.
+
+stufe_waehlen() sucht für einen Zeitraum die feinste Stufe mit höchstens
+max_punkte Intervallen; bei kurzen Zeiträumen sind das die Rohwerte.
+
+Aufruf:
+    python Server/rollups.py --datenbank sqlite:messwerte.db --neu-berechnen
+    python Server/rollups.py --datenbank sqlite:messwerte.db --geraet 246f28123456 --von "2026-10-01 00:00:00"
+"""
+
+import datetime
+import functools
+
+MESSWERTE = ("Temperatur", "Luftfeuchtigkeit", "Helligkeit", "Fuellstand", "Bodenfeuchtigkeit")
+# Name -> Länge eines Intervalls in s, feinste Stufe zuerst
+STUFEN = {"1min": 60, "15min": 900, "1h": 3600}
+# Nennabstand der Rohwerte für stufe_waehlen() (die Geräte messen etwa jede Sekunde)
+ROH_SEKUNDEN = 1
+
+FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def tabelle(stufe):
+    return "sensorwerte_" + stufe
+
+
+def _spalten():
+    spalten = []
+    for messwert in MESSWERTE:
+        spalten += [messwert + "_min", messwert + "_max", messwert + "_summe", messwert + "_anzahl"]
+    return spalten
+
+
+SPALTEN = ("Geraet", "Beginn") + tuple(_spalten())
+
+
+def tabelle_anlegen(stufe, dialekt):
+    """CREATE TABLE IF NOT EXISTS für eine Stufe (dialekt "sqlite" oder "mariadb")."""
+    if dialekt == "sqlite":
+        typen = {"Geraet": "TEXT NOT NULL", "Beginn": "TEXT NOT NULL", "wert": "REAL",
+                 "anzahl": "INTEGER NOT NULL DEFAULT 0", "ende": ") WITHOUT ROWID"}
+    else:
+        typen = {"Geraet": "VARCHAR(32) NOT NULL", "Beginn": "DATETIME NOT NULL", "wert": "DOUBLE",
+                 "anzahl": "INT UNSIGNED NOT NULL DEFAULT 0", "ende": ") ENGINE=InnoDB"}
+    definitionen = ["Geraet " + typen["Geraet"], "Beginn " + typen["Beginn"]]
+    for spalte in SPALTEN[2:]:
+        if spalte.endswith("_anzahl"):
+            definitionen.append(spalte + " " + typen["anzahl"])
+        elif spalte.endswith("_summe"):
+            definitionen.append(spalte + " " + typen["wert"] + " NOT NULL DEFAULT 0")
+        else:
+            definitionen.append(spalte + " " + typen["wert"])
+    definitionen.append("PRIMARY KEY (Geraet, Beginn)")
+    return "CREATE TABLE IF NOT EXISTS %s (%s%s" % (tabelle(stufe), ", ".join(definitionen), typen["ende"])
+
+
+@functools.lru_cache(maxsize=None)
+def upsert(stufe, dialekt):
+    """INSERT, das eine vorhandene Zeile (Geraet, Beginn) mit den neuen Werten zusammenführt."""
+    platzhalter = ",".join("?" * len(SPALTEN))
+    kopf = "INSERT INTO %s (%s) VALUES (%s)" % (tabelle(stufe), ", ".join(SPALTEN), platzhalter)
+    neu = "excluded.%s" if dialekt == "sqlite" else "VALUES(%s)"
+    kleiner, groesser = ("min", "max") if dialekt == "sqlite" else ("LEAST", "GREATEST")
+    zuweisungen = []
+    for spalte in SPALTEN[2:]:
+        wert = neu % spalte
+        if spalte.endswith("_min") or spalte.endswith("_max"):
+            # min()/LEAST() mit NULL ergibt NULL: fehlt ein Wert, gilt der andere
+            funktion = kleiner if spalte.endswith("_min") else groesser
+            zuweisungen.append("%s = %s(COALESCE(%s, %s), COALESCE(%s, %s))"
+                               % (spalte, funktion, spalte, wert, wert, spalte))
+        else:
+            zuweisungen.append("%s = %s + %s" % (spalte, spalte, wert))
+    if dialekt == "sqlite":
+        return "%s ON CONFLICT (Geraet, Beginn) DO UPDATE SET %s" % (kopf, ", ".join(zuweisungen))
+    return "%s ON DUPLICATE KEY UPDATE %s" % (kopf, ", ".join(zuweisungen))
+
+
+def beginn(zeit, stufe):
+    """Beginn des Intervalls (YYYY-MM-DD HH:MM:SS), in dem zeit (Text oder datetime) liegt."""
+    zeit = str(zeit)
+    if stufe == "1min":
+        return zeit[:17] + "00"
+    if stufe == "15min":
+        return "%s%02d:00" % (zeit[:14], int(zeit[14:16]) // 15 * 15)
+    return zeit[:14] + "00:00"
+
+
+def _leer():
+    return [None, None, 0.0, 0] * len(MESSWERTE)
+
+
+def zusammenfassen(zeilen):
+    """Fasst Rohzeilen (Spalten wie datenbank.SPALTEN) je Gerät und Minute zusammen.
+
+    Gibt {(geraet, beginn): [min, max, summe, anzahl] * 5} zurück.
+    """
+    ergebnis = {}
+    for zeile in zeilen:
+        schluessel = (zeile[0], str(zeile[6])[:17] + "00")
+        werte = ergebnis.get(schluessel)
+        if werte is None:
+            werte = ergebnis[schluessel] = _leer()
+        for i in range(len(MESSWERTE)):
+            wert = zeile[1 + i]
+            if wert is None:
+                continue
+            o = 4 * i
+            if werte[o + 3]:
+                if wert < werte[o]:
+                    werte[o] = wert
+                elif wert > werte[o + 1]:
+                    werte[o + 1] = wert
+            else:
+                werte[o] = werte[o + 1] = wert
+            werte[o + 2] += wert
+            werte[o + 3] += 1
+    return ergebnis
+
+
+def vergroebern(minuten, stufe):
+    """Fasst Minutenwerte aus zusammenfassen() zu Intervallen der Stufe zusammen."""
+    ergebnis = {}
+    for (geraet, start), werte in minuten.items():
+        schluessel = (geraet, beginn(start, stufe))
+        ziel = ergebnis.get(schluessel)
+        if ziel is None:
+            ergebnis[schluessel] = list(werte)
+            continue
+        for o in range(0, len(ziel), 4):
+            if not werte[o + 3]:
+                continue
+            if not ziel[o + 3] or werte[o] < ziel[o]:
+                ziel[o] = werte[o]
+            if not ziel[o + 3] or werte[o + 1] > ziel[o + 1]:
+                ziel[o + 1] = werte[o + 1]
+            ziel[o + 2] += werte[o + 2]
+            ziel[o + 3] += werte[o + 3]
+    return ergebnis
+
+
+def anweisungen(zeilen, dialekt):
+    """Liste von (sql, zeilen) für executemany(), die alle Stufen mit den Rohzeilen fortschreibt."""
+    minuten = zusammenfassen(zeilen)
+    ergebnis = []
+    for stufe in STUFEN:
+        intervalle = minuten if stufe == "1min" else vergroebern(minuten, stufe)
+        # Sortiert, damit parallele Transaktionen die Zeilen in derselben Reihenfolge sperren (keine Deadlocks)
+        ergebnis.append((upsert(stufe, dialekt), [schluessel + tuple(intervalle[schluessel])
+                                                  for schluessel in sorted(intervalle)]))
+    return ergebnis
+
+
+def verlauf_sql(stufe):
+    """Abfrage Geraet, von, bis -> Beginn und je Messwert Minimum, Maximum, Mittelwert, Anzahl."""
+    spalten = ["Beginn"]
+    for messwert in MESSWERTE:
+        spalten += ["%s_min" % messwert, "%s_max" % messwert,
+                    "%s_summe / NULLIF(%s_anzahl, 0)" % (messwert, messwert), "%s_anzahl" % messwert]
+    return "SELECT %s FROM %s WHERE Geraet = ? AND Beginn >= ? AND Beginn < ? ORDER BY Beginn" % (
+        ", ".join(spalten), tabelle(stufe))
+
+
+def roh_als_verlauf(zeilen):
+    """Rohzeilen (Spalten wie datenbank.SPALTEN) in der Form von verlauf_sql()."""
+    ergebnis = []
+    for zeile in zeilen:
+        neu = [zeile[6]]
+        for wert in zeile[1:6]:
+            neu += [wert, wert, wert, 0 if wert is None else 1]
+        ergebnis.append(tuple(neu))
+    return ergebnis
+
+
+def stufe_waehlen(von, bis, max_punkte=1000):
+    """Feinste Stufe ("roh", "1min", "15min" oder "1h") mit höchstens max_punkte Intervallen von von bis bis."""
+    dauer = (datetime.datetime.strptime(str(bis)[:19], FORMAT)
+             - datetime.datetime.strptime(str(von)[:19], FORMAT)).total_seconds()
+    if dauer / ROH_SEKUNDEN <= max_punkte:
+        return "roh"
+    for stufe, sekunden in STUFEN.items():
+        if dauer / sekunden <= max_punkte:
+            return stufe
+    return "1h"
+
+
+def main():
+    import argparse
+    import time
+
+    import datenbank
+
+    parser = argparse.ArgumentParser(description="Rollups neu berechnen oder abfragen")
+    parser.add_argument("--datenbank", metavar="URL", default="sqlite:messwerte.db")
+    parser.add_argument("--neu-berechnen", action="store_true",
+                        help="alle Rollups aus den Rohwerten neu berechnen (Ingest-Dienst vorher anhalten)")
+    parser.add_argument("--geraet", help="Verlauf dieses Geräts ausgeben")
+    parser.add_argument("--von", help="Beginn (YYYY-MM-DD HH:MM:SS), Standard: vor 7 Tagen")
+    parser.add_argument("--bis", help="Ende, Standard: jetzt")
+    parser.add_argument("--punkte", type=int, default=1000, help="höchstens so viele Punkte")
+    args = parser.parse_args()
+
+    pool = datenbank.oeffnen(args.datenbank)
+    try:
+        if args.neu_berechnen:
+            start = time.perf_counter()
+            anzahl = pool.rollups_neu_berechnen()
+            print("%d Rohzeilen in %.1f s verdichtet" % (anzahl, time.perf_counter() - start))
+        if args.geraet:
+            bis = args.bis or datetime.datetime.now().strftime(FORMAT)
+            von = args.von or (datetime.datetime.strptime(bis, FORMAT) - datetime.timedelta(days=7)).strftime(FORMAT)
+            start = time.perf_counter()
+            stufe, zeilen = pool.diagramm(args.geraet, von, bis, args.punkte)
+            dauer = time.perf_counter() - start
+            for zeile in zeilen:
+                # Minimum/Mittelwert/Maximum je Messwert
+                print(zeile[0], " ".join("%s %s/%s/%s" % (m, _zahl(zeile[1 + 4 * i]), _zahl(zeile[3 + 4 * i]),
+                                                       _zahl(zeile[2 + 4 * i]))
+                                         for i, m in enumerate(MESSWERTE)))
+            print("%d Punkte aus Stufe %s in %.1f ms" % (len(zeilen), stufe, dauer * 1000))
+    finally:
+        pool.schliessen()
+
+
+def _zahl(wert):
+    return "-" if wert is None else "%.4g" % wert
+
+
+if __name__ == "__main__":
+    main()
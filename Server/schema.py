@@ -0,0 +1,439 @@
+"""Aufbau der Rohwert-Tabelle: Index (Geraet, Zeit), Monatspartitionen, Aufbewahrung und Migration.
+
+Die Tabelle sensorwerte_wohnung war eine einfache Tabelle mit ID als
+einzigem Schlüssel: sie wächst unbegrenzt, und jede Abfrage über einen
+Zeitraum liest die ganze Tabelle. Neu aufgebaut ist sie so:
+- MariaDB: Primärschlüssel (Geraet, Zeit), die Zeilen eines Geräts
+  liegen also nach Zeit sortiert beieinander; Partitionen je Monat
+  (PARTITION BY RANGE COLUMNS (Zeit), p<JJJJMM> und pzukunft für alles
+  danach). Eine Abfrage über einen Zeitraum liest nur dessen Partitionen.
+  Zeit ist DATETIME statt TIMESTAMP (TIMESTAMP lässt sich nur über
+  UNIX_TIMESTAMP() partitionieren und wird je nach Zeitzone der Sitzung
+  umgerechnet).
+- SQLite (lokal, Tests): eine Tabelle sensorwerte_wohnung_<JJJJMM> je
+  Monat mit eindeutigem Index (Geraet, Zeit) und eine Sicht sensorwerte_wohnung über
+  alle Monate (UNION ALL); datenbank.SQLite schreibt direkt in die
+  Monatstabellen.
+Node-RED und die Abfragen in datenbank.ABFRAGEN benutzen weiter den Namen
+sensorwerte_wohnung.
+
+Je Gerät und Sekunde gibt es höchstens eine Zeile. Ein Gerät sendet nach
+einem Neustart einen Teil seines Zwischenspeichers erneut (der Sendezeiger
+steht nur alle paar Blöcke im Flash, siehe telemetriepuffer.py); mit
+einfuegen_sql(..., dialekt) werden solche Zeilen übergangen (INSERT IGNORE
+bzw. INSERT OR IGNORE).
+
+pflegen() legt VORLAUF Monate im Voraus an und entfernt (oder archiviert)
+Monate, die älter als die Aufbewahrungszeit sind. Das Entfernen ist eine
+Änderung am Schema (DROP PARTITION bzw. DROP TABLE), es werden keine
+Zeilen einzeln gelöscht. Die Rollups (rollups.py) bleiben erhalten.
+
+migrieren() baut eine bestehende einfache Tabelle um, während Node-RED
+oder der Ingest-Dienst weiter schreiben: die Zeilen werden in Stapeln
+nach ID kopiert (je Stapel eine kurze Transaktion, dazwischen eine Pause),
+dann werden die Tabellen getauscht und die Zeilen nachgeholt, die
+inzwischen hinzugekommen sind. Die alte Tabelle bleibt als
+sensorwerte_wohnung_alt erhalten.
+
+Aufruf:
+    python Server/schema.py --datenbank sqlite:messwerte.db --status
+    python Server/schema.py --datenbank mariadb://... --migrieren
+    python Server/schema.py --datenbank mariadb://... --pflegen --aufbewahren 12 --archivieren
+"""
+
+import datetime
+import time
+
+TABELLE = "sensorwerte_wohnung"
+SPALTEN = ("Geraet", "Temperatur", "Luftfeuchtigkeit", "Helligkeit", "Fuellstand", "Bodenfeuchtigkeit", "Zeit")
+# So viele Monate nach dem aktuellen werden im Voraus angelegt
+VORLAUF = 3
+ALT = TABELLE + "_alt"
+ARCHIV = TABELLE + "_archiv_"
+
+_MARIADB_SPALTEN = (
+    "ID BIGINT UNSIGNED NOT NULL AUTO_INCREMENT",
+    "Geraet VARCHAR(32) NOT NULL DEFAULT 'bloombuddy'",
+    "Temperatur TINYINT",
+    "Luftfeuchtigkeit TINYINT UNSIGNED",
+    "Helligkeit SMALLINT UNSIGNED",
+    "Fuellstand SMALLINT UNSIGNED",
+    "Bodenfeuchtigkeit SMALLINT UNSIGNED",
+    "Zeit DATETIME NOT NULL",
+)
+
+
+def monat(zeit):
+    """JJJJMM des Zeitstempels (Text YYYY-MM-DD ... oder datetime)."""
+    zeit = str(zeit)
+    return zeit[:4] + zeit[5:7]
+
+
+def monat_plus(monat, anzahl):
+    i = int(monat[:4]) * 12 + int(monat[4:]) - 1 + anzahl
+    return "%04d%02d" % (i // 12, i % 12 + 1)
+
+
+def monatsbeginn(monat):
+    return "%s-%s-01 00:00:00" % (monat[:4], monat[4:])
+
+
+def monate(erster, letzter):
+    """Alle Monate von erster bis einschließlich letzter."""
+    ergebnis = []
+    while erster <= letzter:
+        ergebnis.append(erster)
+        erster = monat_plus(erster, 1)
+    return ergebnis
+
+
+def _aktuell(jetzt):
+    return monat(jetzt or datetime.datetime.now())
+
+
+def monatstabelle(monat):
+    return "%s_%s" % (TABELLE, monat)
+
+
+def einfuegen_sql(tabelle, spalten=SPALTEN, dialekt=None):
+    """INSERT für spalten; mit dialekt werden Zeilen übergangen, deren (Geraet, Zeit) es schon gibt."""
+    befehl = {None: "INSERT", "sqlite": "INSERT OR IGNORE", "mariadb": "INSERT IGNORE"}[dialekt]
+    return "%s INTO %s (%s) VALUES (%s)" % (befehl, tabelle, ", ".join(spalten), ",".join("?" * len(spalten)))
+
+
+def nach_monaten(zeilen, spalte=-1):
+    """{monat: [zeilen]} nach der Spalte Zeit (standardmäßig die letzte)."""
+    ergebnis = {}
+    for zeile in zeilen:
+        ergebnis.setdefault(monat(zeile[spalte]), []).append(zeile)
+    return ergebnis
+
+
+# SQLite: eine Tabelle je Monat und eine Sicht darüber
+
+def sqlite_monate(roh):
+    """Menge der Monatstabellen, None wenn TABELLE noch eine einfache Tabelle ist."""
+    typ = roh.execute("SELECT type FROM sqlite_master WHERE name = ?", (TABELLE,)).fetchone()
+    if typ is not None and typ[0] == "table":
+        return None
+    return _sqlite_tabellen(roh)
+
+
+def _sqlite_tabellen(roh):
+    namen = roh.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?",
+                        (TABELLE + "_[0-9][0-9][0-9][0-9][0-9][0-9]",)).fetchall()
+    return {name[-6:] for (name,) in namen}
+
+
+def _sicht_sql(vorhanden):
+    spalten = "ID, " + ", ".join(SPALTEN)
+    return "CREATE VIEW %s AS %s" % (TABELLE, " UNION ALL ".join(
+        "SELECT %s FROM %s" % (spalten, monatstabelle(m)) for m in sorted(vorhanden)))
+
+
+def sqlite_aendern(roh, anlegen=(), entfernen=(), archivieren=False, vorher=()):
+    """Legt Monatstabellen an, entfernt oder archiviert sie und baut die Sicht neu auf.
+
+    Alles in einer Transaktion (BEGIN IMMEDIATE, auch gegen andere Prozesse);
+    vorher sind weitere Anweisungen am Anfang dieser Transaktion. Gibt die
+    Menge der Monatstabellen danach zurück (None, solange TABELLE noch eine
+    einfache Tabelle ist; dann bleibt auch die Sicht weg).
+    """
+    roh.execute("BEGIN IMMEDIATE")
+    try:
+        for sql in vorher:
+            roh.execute(sql)
+        for m in anlegen:
+            roh.execute("CREATE TABLE IF NOT EXISTS %s (ID INTEGER PRIMARY KEY, "
+                        "Geraet TEXT NOT NULL DEFAULT 'bloombuddy', Temperatur REAL, Luftfeuchtigkeit REAL, "
+                        "Helligkeit REAL, Fuellstand REAL, Bodenfeuchtigkeit REAL, Zeit TEXT NOT NULL)"
+                        % monatstabelle(m))
+            roh.execute("CREATE UNIQUE INDEX IF NOT EXISTS %s_geraet_zeit ON %s (Geraet, Zeit)"
+                        % (monatstabelle(m), monatstabelle(m)))
+        for m in entfernen:
+            # Der Index hieße sonst weiter wie die Monatstabelle, die später wieder angelegt werden kann
+            roh.execute("DROP INDEX IF EXISTS %s_geraet_zeit" % monatstabelle(m))
+            if archivieren:
+                roh.execute("ALTER TABLE %s RENAME TO %s%s" % (monatstabelle(m), ARCHIV, m))
+            else:
+                roh.execute("DROP TABLE %s" % monatstabelle(m))
+        vorhanden = sqlite_monate(roh)
+        if vorhanden is not None:
+            roh.execute("DROP VIEW IF EXISTS " + TABELLE)
+            if vorhanden:
+                roh.execute(_sicht_sql(vorhanden))
+        roh.commit()
+    except BaseException:
+        roh.rollback()
+        raise
+    return vorhanden
+
+
+def sqlite_einrichten(roh, jetzt=None):
+    """Legt in einer leeren Datenbank die Monatstabellen und die Sicht an."""
+    if roh.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (TABELLE,)).fetchone() is None:
+        aktuell = _aktuell(jetzt)
+        sqlite_aendern(roh, monate(aktuell, monat_plus(aktuell, VORLAUF)))
+
+
+# MariaDB: Partitionen je Monat
+
+def _partitionen_sql(vorhanden):
+    teile = ["PARTITION p%s VALUES LESS THAN ('%s')" % (m, monatsbeginn(monat_plus(m, 1)))
+             for m in sorted(vorhanden)]
+    return ", ".join(teile + ["PARTITION pzukunft VALUES LESS THAN (MAXVALUE)"])
+
+
+def mariadb_tabelle_sql(tabelle, vorhanden, falls_fehlt=False):
+    return "CREATE TABLE %s%s (%s, PRIMARY KEY (Geraet, Zeit), KEY ID (ID)) ENGINE=InnoDB " \
+           "PARTITION BY RANGE COLUMNS (Zeit) (%s)" % ("IF NOT EXISTS " if falls_fehlt else "", tabelle,
+                                                       ", ".join(_MARIADB_SPALTEN), _partitionen_sql(vorhanden))
+
+
+def mariadb_einrichten(cursor, jetzt=None):
+    """Legt die partitionierte Tabelle an, wenn es noch keine gibt."""
+    aktuell = _aktuell(jetzt)
+    cursor.execute(mariadb_tabelle_sql(TABELLE, monate(aktuell, monat_plus(aktuell, VORLAUF)), falls_fehlt=True))
+
+
+def _mariadb_partitionen(cursor, tabelle=TABELLE):
+    """Monate der Partitionen (ohne pzukunft), None wenn tabelle nicht partitioniert ist."""
+    cursor.execute("SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                   "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? ORDER BY PARTITION_ORDINAL_POSITION",
+                   (tabelle,))
+    namen = [name for (name,) in cursor.fetchall()]
+    if not namen or namen[0] is None:
+        return None
+    return [name[1:] for name in namen if name != "pzukunft"]
+
+
+def _vorhanden(verbindung, dialekt):
+    if dialekt == "sqlite":
+        return sqlite_monate(verbindung.roh)
+    cursor = verbindung.roh.cursor()
+    try:
+        return _mariadb_partitionen(cursor)
+    finally:
+        cursor.close()
+
+
+def pflegen(pool, aufbewahren=None, archivieren=False, jetzt=None):
+    """Legt die nächsten VORLAUF Monate an und entfernt Monate vor den letzten aufbewahren Monaten.
+
+    Mit archivieren werden sie nicht gelöscht, sondern in eigene Tabellen
+    sensorwerte_wohnung_archiv_<JJJJMM> verschoben (MariaDB: EXCHANGE
+    PARTITION, SQLite: RENAME). Gibt (angelegt, entfernt) zurück.
+    """
+    dialekt = pool.backend.DIALEKT
+    aktuell = _aktuell(jetzt)
+    with pool.verbindung() as verbindung:
+        vorhanden = _vorhanden(verbindung, dialekt)
+        if vorhanden is None:
+            raise RuntimeError("%s ist noch nicht partitioniert, zuerst --migrieren" % TABELLE)
+        letzter = max(vorhanden) if vorhanden else monat_plus(aktuell, -1)
+        anlegen = monate(monat_plus(letzter, 1), monat_plus(aktuell, VORLAUF))
+        grenze = monat_plus(aktuell, -aufbewahren + 1) if aufbewahren else None
+        entfernen = [m for m in sorted(vorhanden) if grenze and m < grenze]
+        if dialekt == "sqlite":
+            sqlite_aendern(verbindung.roh, anlegen, entfernen, archivieren)
+        else:
+            _mariadb_pflegen(verbindung.roh, anlegen, entfernen, archivieren)
+    pool.backend.vergessen()
+    return anlegen, entfernen
+
+
+def _mariadb_pflegen(roh, anlegen, entfernen, archivieren):
+    # Änderungen am Schema schreibt MariaDB sofort fest, eine Transaktion gibt es dabei nicht
+    cursor = roh.cursor()
+    try:
+        if anlegen:
+            # pzukunft ist leer, solange pflegen() regelmäßig läuft; dann kopiert REORGANIZE keine Zeilen
+            cursor.execute("ALTER TABLE %s REORGANIZE PARTITION pzukunft INTO (%s)"
+                           % (TABELLE, _partitionen_sql(anlegen)))
+        for m in entfernen:
+            if archivieren:
+                archiv = ARCHIV + m
+                cursor.execute("CREATE TABLE %s LIKE %s" % (archiv, TABELLE))
+                cursor.execute("ALTER TABLE %s REMOVE PARTITIONING" % archiv)
+                cursor.execute("ALTER TABLE %s EXCHANGE PARTITION p%s WITH TABLE %s" % (TABELLE, m, archiv))
+            cursor.execute("ALTER TABLE %s DROP PARTITION p%s" % (TABELLE, m))
+    finally:
+        cursor.close()
+
+
+def status(pool):
+    """[(monat, zeilen)] der Rohwerte (MariaDB: Schätzung aus information_schema); None wenn nicht partitioniert."""
+    with pool.verbindung() as verbindung:
+        vorhanden = _vorhanden(verbindung, pool.backend.DIALEKT)
+        if vorhanden is None:
+            return None
+        cursor = verbindung.roh.cursor()
+        ergebnis = []
+        if pool.backend.DIALEKT == "sqlite":
+            for m in sorted(vorhanden):
+                cursor.execute("SELECT COUNT(*) FROM " + monatstabelle(m))
+                ergebnis.append((m, cursor.fetchone()[0]))
+        else:
+            cursor.execute("SELECT PARTITION_NAME, TABLE_ROWS FROM information_schema.PARTITIONS "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ? ORDER BY PARTITION_ORDINAL_POSITION",
+                           (TABELLE,))
+            ergebnis = [(name[1:] if name != "pzukunft" else name, zeilen) for name, zeilen in cursor.fetchall()]
+            verbindung.roh.commit()
+        cursor.close()
+    return ergebnis
+
+
+# Migration einer einfachen Tabelle
+
+def _stapel_lesen(pool, tabelle, nach_id, stapel):
+    """Bis zu stapel Zeilen (ID, Spalten...) mit ID > nach_id, nach ID sortiert."""
+    with pool.verbindung() as verbindung:
+        cursor = verbindung.roh.cursor()
+        cursor.execute("SELECT ID, %s FROM %s WHERE ID > ? AND Zeit IS NOT NULL ORDER BY ID LIMIT %d"
+                       % (", ".join(SPALTEN), tabelle, stapel), (nach_id,))
+        zeilen = cursor.fetchall()
+        cursor.close()
+        verbindung.roh.commit()
+    return zeilen
+
+
+def _kopieren(verbindung, dialekt, zeilen, mit_id=True):
+    """Schreibt (ID, Spalten...)-Zeilen in den neuen Aufbau (ohne Commit), doppelte (Geraet, Zeit) nur einmal."""
+    spalten = ("ID",) + SPALTEN if mit_id else SPALTEN
+    if not mit_id:
+        zeilen = [zeile[1:] for zeile in zeilen]
+    if dialekt == "sqlite":
+        gruppen = nach_monaten(zeilen)
+        # Auch Monate außerhalb des angelegten Bereichs (z. B. falsch gestellte Uhr eines Geräts)
+        fehlend = set(gruppen) - _sqlite_tabellen(verbindung.roh)
+        if fehlend:
+            sqlite_aendern(verbindung.roh, sorted(fehlend))
+    cursor = verbindung.roh.cursor()
+    if dialekt == "sqlite":
+        for m, liste in gruppen.items():
+            cursor.executemany(einfuegen_sql(monatstabelle(m), spalten, dialekt), liste)
+    else:
+        # Während der Migration heißt die neue Tabelle TABELLE_neu, danach TABELLE
+        ziel = TABELLE + "_neu" if mit_id else TABELLE
+        cursor.executemany(einfuegen_sql(ziel, spalten, dialekt), zeilen)
+    cursor.close()
+
+
+def migrieren(pool, stapel=10000, pause_s=0.1, jetzt=None, ausgabe=print):
+    """Baut die einfache Tabelle TABELLE in den neuen Aufbau um, gibt die Anzahl kopierter Zeilen zurück.
+
+    Jeder Stapel wird in einer eigenen kurzen Transaktion gelesen und
+    geschrieben, dazwischen liegt pause_s, damit laufende Schreiber nicht
+    warten müssen. Zeilen ohne Zeit werden nicht übernommen, von Zeilen mit
+    gleichem (Geraet, Zeit) nur die erste.
+    """
+    dialekt = pool.backend.DIALEKT
+    with pool.verbindung() as verbindung:
+        if _vorhanden(verbindung, dialekt) is not None:
+            raise RuntimeError("%s ist bereits partitioniert" % TABELLE)
+        cursor = verbindung.roh.cursor()
+        cursor.execute("SELECT MIN(Zeit), MAX(ID), SUM(Zeit IS NULL) FROM " + TABELLE)
+        erste, hoechste, ohne_zeit = cursor.fetchone()
+        verbindung.roh.commit()
+        aktuell = _aktuell(jetzt)
+        bereich = monate(monat(erste) if erste is not None else aktuell, monat_plus(aktuell, VORLAUF))
+        if dialekt == "sqlite":
+            sqlite_aendern(verbindung.roh, bereich)
+        else:
+            cursor.execute("SELECT COUNT(*) FROM information_schema.TABLES "
+                           "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = ?", (ALT,))
+            if cursor.fetchone()[0]:
+                raise RuntimeError("%s gibt es schon, bitte zuerst prüfen und löschen" % ALT)
+            cursor.execute("DROP TABLE IF EXISTS %s_neu" % TABELLE)
+            cursor.execute(mariadb_tabelle_sql(TABELLE + "_neu", bereich))
+        cursor.close()
+    ausgabe("%d Monate angelegt (%s bis %s), bis ID %s zu kopieren" % (len(bereich), bereich[0], bereich[-1],
+                                                                     hoechste))
+
+    # Stapelweise kopieren, bis auch die inzwischen neu geschriebenen Zeilen übernommen sind
+    letzte_id = 0
+    kopiert = 0
+    start = time.monotonic()
+    while True:
+        zeilen = _stapel_lesen(pool, TABELLE, letzte_id, stapel)
+        if not zeilen:
+            break
+        with pool.verbindung() as verbindung:
+            _kopieren(verbindung, dialekt, zeilen)
+            verbindung.roh.commit()
+        letzte_id = zeilen[-1][0]
+        kopiert += len(zeilen)
+        if kopiert // stapel % 10 == 0:
+            ausgabe("%d Zeilen kopiert (ID %d, %.0f Zeilen/s)" % (kopiert, letzte_id,
+                                                                kopiert / (time.monotonic() - start)))
+        time.sleep(pause_s)
+
+    # Tabellen tauschen und die Zeilen nachholen, die seit dem letzten Stapel geschrieben wurden
+    with pool.verbindung() as verbindung:
+        if dialekt == "sqlite":
+            # Umbenennen und Sicht anlegen in einer Transaktion
+            sqlite_aendern(verbindung.roh, vorher=("ALTER TABLE %s RENAME TO %s" % (TABELLE, ALT),))
+        else:
+            # RENAME TABLE tauscht beide Namen atomar
+            cursor = verbindung.roh.cursor()
+            cursor.execute("RENAME TABLE %s TO %s, %s_neu TO %s" % (TABELLE, ALT, TABELLE, TABELLE))
+            cursor.close()
+    # In ALT schreibt jetzt niemand mehr. Die Zeilen aus der Lücke bekommen neue IDs,
+    # ihre alten können im neuen Aufbau schon vergeben sein.
+    nachgeholt = 0
+    while True:
+        zeilen = _stapel_lesen(pool, ALT, letzte_id, stapel)
+        if not zeilen:
+            break
+        with pool.verbindung() as verbindung:
+            _kopieren(verbindung, dialekt, zeilen, mit_id=False)
+            verbindung.roh.commit()
+        letzte_id = zeilen[-1][0]
+        nachgeholt += len(zeilen)
+    kopiert += nachgeholt
+    pool.backend.vergessen()
+    ausgabe("%d Zeilen in %.1f s kopiert, davon %d nachgeholt; %d Zeilen ohne Zeit bleiben in %s"
+            % (kopiert, time.monotonic() - start, nachgeholt, ohne_zeit or 0, ALT))
+    return kopiert
+
+
+def main():
+    import argparse
+
+    import datenbank
+
+    parser = argparse.ArgumentParser(description="Rohwert-Tabelle migrieren, Partitionen pflegen")
+    parser.add_argument("--datenbank", metavar="URL", default="sqlite:messwerte.db")
+    parser.add_argument("--status", action="store_true", help="Monate und Zeilen ausgeben")
+    parser.add_argument("--migrieren", action="store_true", help="einfache Tabelle in Monatspartitionen umbauen")
+    parser.add_argument("--stapel", type=int, default=10000, help="Zeilen pro Stapel beim Migrieren")
+    parser.add_argument("--pause-ms", type=int, default=100, help="Pause zwischen zwei Stapeln")
+    parser.add_argument("--pflegen", action="store_true",
+                        help="kommende Monate anlegen und abgelaufene entfernen (z. B. täglich per cron)")
+    parser.add_argument("--aufbewahren", type=int, metavar="MONATE",
+                        help="Rohwerte dieser Anzahl Monate behalten (einschließlich des aktuellen)")
+    parser.add_argument("--archivieren", action="store_true",
+                        help="abgelaufene Monate in Archivtabellen verschieben statt löschen")
+    args = parser.parse_args()
+
+    pool = datenbank.oeffnen(args.datenbank, groesse=2)
+    try:
+        if args.migrieren:
+            migrieren(pool, args.stapel, args.pause_ms / 1000)
+        if args.pflegen:
+            angelegt, entfernt = pflegen(pool, args.aufbewahren, args.archivieren)
+            print("angelegt: %s" % (", ".join(angelegt) or "-"))
+            print("%s: %s" % ("archiviert" if args.archivieren else "entfernt", ", ".join(entfernt) or "-"))
+        if args.status or not (args.migrieren or args.pflegen):
+            monate_ = status(pool)
+            if monate_ is None:
+                print("%s ist eine einfache Tabelle (noch nicht migriert)" % TABELLE)
+            else:
+                for m, zeilen in monate_:
+                    print("%s %10s" % (m, zeilen))
+    finally:
+        pool.schliessen()
+
+
+if __name__ == "__main__":
+    main()
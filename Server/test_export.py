@@ -0,0 +1,59 @@
+"""Tests des spaltenweisen Exports (export.py) mit SQLite.
+
+Beispiele:
+    python Server/test_export.py
+    python -m pytest Server/test_export.py
+"""
+
+import datetime
+import os
+import tempfile
+
+import datenbank
+import export
+import rollups
+
+
+def test_exportieren_und_laden():
+    """Die Spalten aus den Dateien stimmen mit den Zeilen der Datenbank überein; ein zweiter Lauf
+    fragt nichts mehr ab."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "test.db"), mit_rollups=False)
+        try:
+            start = datetime.datetime(2026, 5, 1)
+            pool.einfuegen([("geraet%d" % (i % 3), 20.0 + i % 7, 50.0, 300, 120, 40,
+                             (start + datetime.timedelta(minutes=7 * i)).strftime(rollups.FORMAT))
+                            for i in range(12000)])
+            # Ein Gerät mit nur einem Messwert im Juni
+            pool.einfuegen([("geraet9", 21.0, 50.0, 300, 120, 40, "2026-06-15 12:00:00")])
+
+            ziel = os.path.join(verzeichnis, "archiv")
+            dateien, anzahl = export.exportieren(pool, ziel, bis_monat="202606", ausgabe=lambda text: None)
+            # 12000 Zeilen alle 7 Minuten reichen bis Ende Juni
+            assert dateien and anzahl == 12001
+            abfragen = []
+            abfragen_vorher = pool.abfragen
+            pool.abfragen = lambda name, *parameter: abfragen.append(name) or abfragen_vorher(name, *parameter)
+            assert export.exportieren(pool, ziel, bis_monat="202606") == (0, 0)
+            # Bereits exportierte Monate (auch leere) werden gar nicht erst abgefragt
+            assert "verlauf" not in abfragen
+            del pool.abfragen
+            for geraet in ("geraet1", "geraet9"):
+                zeilen = pool.abfragen("verlauf", geraet, "2026-05-01", "2026-07-01")
+                spalten = [s for m, s in export.monate_laden(ziel, geraet, "202605", "202606")]
+                assert [z for s in spalten for z in s["Zeit"]] == [export.sekunden(z[6]) for z in zeilen]
+                assert [w for s in spalten for w in s["Temperatur"]] == [z[1] for z in zeilen]
+        finally:
+            pool.schliessen()
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
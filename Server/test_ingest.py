@@ -0,0 +1,53 @@
+"""Tests des Ingest-Dienstes (ingest.py): Zeilen aus den Nachrichten.
+
+Beispiele:
+    python Server/test_ingest.py
+    python -m pytest Server/test_ingest.py
+"""
+
+import json
+
+import ingest
+
+TOPIC = "Zuhause/Wohnung/BloomBuddy/246f28123456/telemetry"
+
+
+def test_deltas_zum_zustand_ergaenzen():
+    """Deltas vor dem ersten Schlüsselbild werden verworfen, danach ergänzt der Zustand des Geräts
+    die fehlenden Felder (statt NULL in die Tabelle zu schreiben)."""
+    zustaende = {}
+    assert ingest.zeilen(TOPIC, '{"Helligkeit": 900, "Zeit": 1767268800}', 1767268805, zustaende) == []
+    voll = {"Fuellstand": 120, "Temperatur": 21.5, "Luftfeuchtigkeit": 50, "Helligkeit": 300,
+            "Bodenfeuchtigkeit": 40, "Voll": True, "Zeit": 1767268810}
+    assert ingest.zeilen(TOPIC, json.dumps(voll), 1767268811, zustaende)[0][1:6] == (21.5, 50, 300, 120, 40)
+    delta = ingest.zeilen(TOPIC, '{"Helligkeit": 900, "Zeit": 1767268820}', 1767268821, zustaende)
+    assert delta == [("246f28123456", 21.5, 50, 900, 120, 40, ingest.zeitstempel(1767268820))], delta
+    andere = TOPIC.replace("246f28123456", "246f28abcdef")
+    assert ingest.zeilen(andere, '{"Temperatur": 19}', 1767268821, zustaende) == []
+
+
+def test_zeit_ohne_gestellte_uhr():
+    """Ohne gestellte Uhr (Zeit unter GUELTIG_AB) gilt die Empfangszeit bzw. Empfangszeit minus Alter."""
+    nachtrag = TOPIC.replace("telemetry", "Nachtrag")
+    zeilen = ingest.zeilen(nachtrag, json.dumps([{"Temperatur": 20, "Zeit": 1767268000},
+                                                 {"Temperatur": 21, "Zeit": 5000, "Alter": 30}]),
+                           1767268900, {})
+    assert [z[6] for z in zeilen] == [ingest.zeitstempel(1767268000), ingest.zeitstempel(1767268870)]
+    try:
+        ingest.zeilen("Zuhause/Wohnung/BloomBuddy/246f28123456/unbekannt", b"", 0, {})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unbekannter Kanal ohne ValueError")
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Tests des Verbindungspools (datenbank.py) mit SQLite.
+
+Beispiele:
+    python Server/test_pool.py
+    python -m pytest Server/test_pool.py
+"""
+
+import os
+import tempfile
+import time
+
+import datenbank
+from datenbank import PoolErschoepft
+
+ZEILE = ("246f28123456", 21.5, 50.0, 300, 120, 40, "2026-01-01 12:00:00")
+
+
+def _zeilen(anzahl, ab=0):
+    """anzahl Zeilen wie ZEILE, im Abstand von einer Sekunde ab 12:00:00 + ab Sekunden."""
+    return [ZEILE[:6] + ("2026-01-01 %02d:%02d:%02d" % (12 + s // 3600, s // 60 % 60, s % 60),)
+            for s in range(ab, ab + anzahl)]
+
+
+def test_schreiben_neben_langsamer_abfrage():
+    """Eine Verbindung ist durch eine langsame Abfrage belegt, geschrieben wird über die zweite."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "test.db"), groesse=2)
+        try:
+            pool.einfuegen(_zeilen(100))
+            assert pool.anzahl() == 100
+            langsam = pool.ausleihen()
+            start = time.monotonic()
+            pool.einfuegen(_zeilen(100, 100))
+            assert time.monotonic() - start < 1
+            assert pool.abfragen("verlauf", ZEILE[0], "2026-01-01", "2026-01-02")[0] == ZEILE
+            assert pool.abfragen("letzte")[0] == _zeilen(1, 199)[0]
+            pool.timeout_s = 0.1
+            with pool.verbindung():
+                try:
+                    pool.anzahl()
+                except PoolErschoepft:
+                    pass
+                else:
+                    raise AssertionError("Pool mit 2 Verbindungen hat eine dritte ausgegeben")
+            pool.zurueckgeben(langsam)
+        finally:
+            pool.schliessen()
+
+
+def test_neuaufbau():
+    """Abgebrochene Verbindungen: die Prüfung vor dem Ausleihen bzw. die Wiederholung ersetzen sie."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "test.db"), groesse=2)
+        try:
+            pool.pruefen_s = 0
+            pool.einfuegen(_zeilen(100))
+            with pool.verbindung(), pool.verbindung():
+                pass
+            for verbindung in list(pool._frei):
+                verbindung.roh.close()
+            assert pool.anzahl() == 100
+            assert pool.pruefungen >= 1 and pool.neu_verbunden >= 1
+            pool.pruefen_s = 3600
+            for verbindung in list(pool._frei):
+                verbindung.roh.close()
+            vorher = pool.neu_verbunden
+            pool.einfuegen(_zeilen(1, 100))
+            assert pool.anzahl() == 101 and pool.neu_verbunden == vorher + 1
+        finally:
+            pool.schliessen()
+
+
+def test_doppelte_zeilen():
+    """Erneut gesendete Zeilen (gleiches Gerät und gleiche Zeit) werden nur einmal gespeichert,
+    auch innerhalb eines Stapels; andere Geräte mit derselben Zeit sind davon nicht betroffen."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "test.db"), groesse=2)
+        try:
+            assert pool.einfuegen(_zeilen(100)) == 100
+            andere = [("246f28abcdef",) + zeile[1:] for zeile in _zeilen(10)]
+            assert pool.einfuegen(_zeilen(50, 80) + _zeilen(5, 120) + andere) == 30 + 10
+            assert pool.einfuegen(_zeilen(100)) == 0
+            assert pool.anzahl() == 140
+            # Der eindeutige Schlüssel hält auch Zeilen ab, die an der Prüfung vorbei geschrieben werden
+            with pool.verbindung() as verbindung:
+                pool.backend.schreiben(verbindung, pool.backend.einfuegen(verbindung, _zeilen(3)))
+            assert pool.anzahl() == 140
+        finally:
+            pool.schliessen()
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Tests der Rollups (rollups.py, Pool.diagramm()) mit SQLite.
+
+Beispiele:
+    python Server/test_rollups.py
+    python -m pytest Server/test_rollups.py
+"""
+
+import datetime
+import os
+import random
+import tempfile
+
+import datenbank
+import rollups
+
+
+def _zufallszeilen(anzahl):
+    """anzahl Zeilen von drei Geräten zu zufälligen Zeiten, je Gerät und Zeit höchstens eine."""
+    zufall = random.Random(1)
+    start = datetime.datetime(2026, 3, 29, 0, 0, 0)
+    zeilen = {}
+    while len(zeilen) < anzahl:
+        zeit = (start + datetime.timedelta(seconds=zufall.randrange(3 * 86400))).strftime(rollups.FORMAT)
+        werte = [round(zufall.uniform(0, 100), 2) if zufall.random() > 0.1 else None for _ in range(5)]
+        geraet = "geraet%d" % zufall.randrange(3)
+        zeilen.setdefault((geraet, zeit), tuple([geraet] + werte + [zeit]))
+    return list(zeilen.values())
+
+
+def _erwartet(zeilen, stufe):
+    ergebnis = {}
+    for zeile in zeilen:
+        ergebnis.setdefault((zeile[0], rollups.beginn(zeile[6], stufe)), []).append(zeile)
+    return ergebnis
+
+
+def _pruefen_gegen_rohwerte(pool, zeilen):
+    for stufe in rollups.STUFEN:
+        for (geraet, beginn), liste in _erwartet(zeilen, stufe).items():
+            zeile = pool.abfragen("verlauf_" + stufe, geraet, beginn, beginn + "~")[0]
+            for i in range(5):
+                werte = [z[1 + i] for z in liste if z[1 + i] is not None]
+                assert zeile[4 + 4 * i] == len(werte), (stufe, geraet, beginn)
+                if werte:
+                    assert (zeile[1 + 4 * i], zeile[2 + 4 * i]) == (min(werte), max(werte))
+                    assert abs(zeile[3 + 4 * i] - sum(werte) / len(werte)) < 1e-9
+
+
+def test_rollups_fortschreiben():
+    """In zufälliger Reihenfolge geschriebene Stapel (auch Nachträge) ergeben dieselben Werte
+    wie eine Berechnung über alle Rohwerte auf einmal und wie rollups_neu_berechnen()."""
+    zeilen = _zufallszeilen(5000)
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "rollups.db"))
+        try:
+            for i in range(0, len(zeilen), 137):
+                pool.einfuegen(zeilen[i:i + 137])
+            _pruefen_gegen_rohwerte(pool, zeilen)
+            assert pool.rollups_neu_berechnen() == len(zeilen)
+            _pruefen_gegen_rohwerte(pool, zeilen)
+        finally:
+            pool.schliessen()
+
+
+def test_doppelte_zeilen_nicht_zaehlen():
+    """Erneut gesendete Stapel (z. B. nach einem Neustart des Geräts) ändern die Rollups nicht."""
+    zeilen = _zufallszeilen(2000)
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "rollups.db"))
+        try:
+            for i in range(0, len(zeilen), 100):
+                assert pool.einfuegen(zeilen[i:i + 100]) == 100
+                # Der vorige und dieser Stapel noch einmal
+                assert pool.einfuegen(zeilen[max(0, i - 100):i + 100]) == 0
+            _pruefen_gegen_rohwerte(pool, zeilen)
+        finally:
+            pool.schliessen()
+
+
+def test_diagramm_stufe():
+    """diagramm() wählt die feinste Stufe mit höchstens max_punkte Punkten."""
+    zeilen = _zufallszeilen(5000)
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pool = datenbank.oeffnen("sqlite:" + os.path.join(verzeichnis, "rollups.db"))
+        try:
+            pool.einfuegen(zeilen)
+            assert pool.diagramm("geraet0", "2026-03-29 00:00:00", "2026-03-29 00:10:00")[0] == "roh"
+            assert pool.diagramm("geraet0", "2026-03-29 00:00:00", "2026-03-29 12:00:00")[0] == "1min"
+            stufe, verlauf = pool.diagramm("geraet0", "2026-03-29 00:00:00", "2026-04-01 00:00:00")
+            assert stufe == "15min"
+            assert len(verlauf) == len([1 for g, b in _erwartet(zeilen, stufe) if g == "geraet0"])
+        finally:
+            pool.schliessen()
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Tests der Rohwert-Tabelle (schema.py): Migration, Index und Aufbewahrung mit SQLite.
+
+Beispiele:
+    python Server/test_schema.py
+    python -m pytest Server/test_schema.py
+"""
+
+import datetime
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import datenbank
+import rollups
+import schema
+
+
+def _alte_tabelle(pfad, anzahl, doppelt=0):
+    """Legt die einfache Tabelle von früher mit anzahl Zeilen (alle 7 Minuten ab Januar) an.
+
+    Die ersten doppelt Zeilen stehen am Ende ein zweites Mal darin (ohne Schlüssel war das möglich).
+    """
+    roh = sqlite3.connect(pfad)
+    roh.execute("CREATE TABLE %s (ID INTEGER PRIMARY KEY, Geraet TEXT NOT NULL DEFAULT 'bloombuddy', "
+                "Temperatur REAL, Luftfeuchtigkeit REAL, Helligkeit REAL, Fuellstand REAL, "
+                "Bodenfeuchtigkeit REAL, Zeit TEXT)" % schema.TABELLE)
+    start = datetime.datetime(2026, 1, 1)
+    zeilen = [("geraet%d" % (i % 3), 20.0, 50.0, 300, 120, 40,
+               (start + datetime.timedelta(minutes=7 * i)).strftime(rollups.FORMAT)) for i in range(anzahl)]
+    roh.executemany(schema.einfuegen_sql(schema.TABELLE), zeilen + zeilen[:doppelt])
+    roh.commit()
+    roh.close()
+
+
+def test_migrieren_waehrend_geschrieben_wird():
+    """Eine alte einfache Tabelle wird migriert, während ein zweiter Thread weiter schreibt."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pfad = os.path.join(verzeichnis, "alt.db")
+        _alte_tabelle(pfad, 30000, doppelt=100)
+        pool = datenbank.oeffnen("sqlite:" + pfad, mit_rollups=False)
+        anhalten = threading.Event()
+        geschrieben = []
+
+        def weiter_schreiben():
+            while not anhalten.is_set():
+                zeit = "2026-06-15 12:%02d:%02d" % (len(geschrieben) // 60, len(geschrieben) % 60)
+                try:
+                    pool.einfuegen([("geraet9", 21.0, 50.0, 300, 120, 40, zeit)])
+                    geschrieben.append(1)
+                except pool.FEHLER:
+                    # Einmal beim Tauschen der Tabellen (INSERT in die Sicht), dann sind die Monate neu gelesen
+                    pass
+                time.sleep(0.001)
+
+        schreiber = threading.Thread(target=weiter_schreiben)
+        schreiber.start()
+        try:
+            assert schema.migrieren(pool, stapel=1000, pause_s=0.002, jetzt="2026-06-15",
+                                    ausgabe=lambda text: None) >= 30100
+            time.sleep(0.05)
+        finally:
+            anhalten.set()
+            schreiber.join()
+        try:
+            assert pool.anzahl() == 30000 + len(geschrieben)
+            assert [m for m, _ in schema.status(pool)] == schema.monate("202601", "202609")
+            with pool.verbindung() as verbindung:
+                plan = verbindung.roh.execute("EXPLAIN QUERY PLAN " + datenbank.ABFRAGEN["verlauf"],
+                                              ("geraet0", "2026-02-01", "2026-02-02")).fetchall()
+            assert all("geraet_zeit" in zeile[-1] for zeile in plan if "SCAN" in zeile[-1] or "SEARCH" in zeile[-1])
+        finally:
+            pool.schliessen()
+
+
+def test_pflegen_archivieren():
+    """Die ältesten Monate werden archiviert, ein Nachzügler legt seinen Monat neu an."""
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pfad = os.path.join(verzeichnis, "alt.db")
+        _alte_tabelle(pfad, 30000)
+        pool = datenbank.oeffnen("sqlite:" + pfad, mit_rollups=False)
+        try:
+            schema.migrieren(pool, pause_s=0, jetzt="2026-06-15", ausgabe=lambda text: None)
+            assert schema.pflegen(pool, aufbewahren=3, jetzt="2026-06-15") == ([], ["202601", "202602",
+                                                                                   "202603"])
+            angelegt, entfernt = schema.pflegen(pool, aufbewahren=3, archivieren=True, jetzt="2026-07-01")
+            assert angelegt == ["202610"] and entfernt == ["202604"]
+            assert pool.abfragen("verlauf", "geraet0", "2026-01-01", "2026-05-01") == []
+            with pool.verbindung() as verbindung:
+                assert verbindung.roh.execute("SELECT COUNT(*) FROM %s202604" % schema.ARCHIV).fetchone()[0] > 0
+                assert verbindung.roh.execute("SELECT name FROM sqlite_master WHERE name = ?",
+                                              (schema.ARCHIV + "202601",)).fetchone() is None
+            pool.einfuegen([("geraet0", 20.0, 50.0, 300, 120, 40, "2026-03-02 10:00:00")])
+            assert len(pool.abfragen("verlauf", "geraet0", "2026-03-01", "2026-04-01")) == 1
+        finally:
+            pool.schliessen()
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""Registergenaue Modelle der I2C-Sensoren von BloomBuddy.
+
+Die Modelle hängen als Geräte an einem FakeI2C-Bus (Bibliotheken/i2cbus.py)
+und verhalten sich auf Byte-Ebene wie die echten Bausteine, einschließlich
+der Wandlungszeiten laut Datenblatt. Die Messwerte kommen aus der Welt.
+"""
+
+from i2cbus import FakeGeraet, FakeI2C
+
+from welt import welt
+
+
+class AHT21Modell(FakeGeraet):
+    """AHT21: Befehle 0xBE (Init), 0xAC (Messung), 0xBA (Reset).
+
+    Statusbyte laut Datenblatt: Bit 7 = Busy, Bit 3 = kalibriert.
+    Eine Messung dauert ca. 75-80 ms.
+    """
+
+    MESSDAUER = 0.075
+
+    def __init__(self, adresse=0x38):
+        super().__init__(adresse)
+        self.kalibriert = False
+        self.fertig_um = None
+        self.daten = bytearray(6)
+        self._neue_daten = False
+
+    def schreiben(self, daten):
+        if not daten:
+            return
+        befehl = daten[0]
+        w = welt()
+        if befehl == 0xBE:
+            self.kalibriert = True
+        elif befehl == 0xBA:
+            self.kalibriert = False
+            self.fertig_um = None
+        elif befehl == 0xAC:
+            self.fertig_um = w.uhr.monotonic() + self.MESSDAUER + w.zufall.uniform(0, 0.005)
+            self._neue_daten = True
+
+    def _status(self):
+        status = 0x08 if self.kalibriert else 0x00
+        if self.fertig_um is not None and welt().uhr.monotonic() < self.fertig_um:
+            status |= 0x80
+        return status
+
+    def lesen(self, nbytes):
+        status = self._status()
+        if not status & 0x80 and self.fertig_um is not None and self._neue_daten:
+            self._messwerte_berechnen()
+        self.daten[0] = status
+        antwort = bytearray(nbytes)
+        for i in range(min(nbytes, 6)):
+            antwort[i] = self.daten[i]
+        if nbytes > 6:
+            antwort[6] = self._crc(self.daten)
+        return antwort
+
+    def _messwerte_berechnen(self):
+        w = welt()
+        w.aktualisieren()
+        feuchte = max(0.0, min(100.0, w.rauschen(w.luftfeuchte, 0.3)))
+        temperatur = w.rauschen(w.temperatur, 0.05)
+        roh_feuchte = min(0xFFFFF, int(feuchte / 100 * 0x100000))
+        roh_temp = min(0xFFFFF, int((temperatur + 50) / 200 * 0x100000))
+        d = self.daten
+        d[1] = roh_feuchte >> 12 & 0xFF
+        d[2] = roh_feuchte >> 4 & 0xFF
+        d[3] = (roh_feuchte & 0x0F) << 4 | roh_temp >> 16 & 0x0F
+        d[4] = roh_temp >> 8 & 0xFF
+        d[5] = roh_temp & 0xFF
+        self._neue_daten = False
+
+    @staticmethod
+    def _crc(daten):
+        crc = 0xFF
+        for byte in daten:
+            crc ^= byte
+            for _ in range(8):
+                crc = (crc << 1 ^ 0x31) & 0xFF if crc & 0x80 else crc << 1 & 0xFF
+        return crc
+
+
+class BH1750Modell(FakeGeraet):
+    """BH1750: Ein-/Ausschalten, Reset, Dauer- und Einzelmessungen.
+
+    Wandlungszeit typisch 120 ms (High-Res) bzw. 16 ms (Low-Res). Im
+    Dauerbetrieb wird das Datenregister nach jeder Wandlung überschrieben,
+    Einzelmessungen schalten danach ab.
+    """
+
+    DAUER = {0x10: 0.120, 0x11: 0.120, 0x13: 0.016, 0x20: 0.120, 0x21: 0.120, 0x23: 0.016}
+
+    def __init__(self, adresse=0x23):
+        super().__init__(adresse)
+        self.an = False
+        self.modus = None
+        self.start = 0.0
+        self.wandlungen = 0
+        self.wert = 0
+
+    def schreiben(self, daten):
+        if not daten:
+            return
+        self._aktualisieren()
+        befehl = daten[0]
+        if befehl == 0x00:
+            self.an = False
+            self.modus = None
+        elif befehl == 0x01:
+            self.an = True
+        elif befehl == 0x07:
+            if self.an:
+                self.wert = 0
+        elif befehl in self.DAUER:
+            self.an = True
+            self.modus = befehl
+            self.start = welt().uhr.monotonic()
+            self.wandlungen = 0
+
+    def _aktualisieren(self):
+        if self.modus is None:
+            return
+        dauer = self.DAUER[self.modus]
+        fertig = int((welt().uhr.monotonic() - self.start) / dauer)
+        if fertig <= self.wandlungen:
+            return
+        if self.modus & 0x20:
+            # Einzelmessung: genau eine Wandlung, danach Power Down
+            fertig = 1
+        self.wandlungen = fertig
+        self._wandeln()
+        if self.modus & 0x20:
+            self.modus = None
+            self.an = False
+
+    def _wandeln(self):
+        w = welt()
+        lux = max(0.0, w.rauschen(w.helligkeit_lux, w.helligkeit_lux * 0.01))
+        zaehler = lux * 1.2
+        if self.modus in (0x11, 0x21):
+            zaehler *= 2
+        elif self.modus in (0x13, 0x23):
+            zaehler = round(zaehler / 4) * 4
+        self.wert = min(0xFFFF, int(zaehler))
+
+    def lesen(self, nbytes):
+        self._aktualisieren()
+        antwort = bytearray(nbytes)
+        if nbytes > 0:
+            antwort[0] = self.wert >> 8
+        if nbytes > 1:
+            antwort[1] = self.wert & 0xFF
+        return antwort
+
+
+class VL53L0XModell(FakeGeraet):
+    """VL53L0X mit Registerseiten (0xFF), Einzel-, Dauer- und Zeitmessung.
+
+    Nachgebildet sind die Register, die der Treiber benutzt: SYSRANGE_START
+    (0x00), Interrupt-Status (0x13), Messergebnis (0x1E/0x1F), Interrupt-
+    Löschen (0x0B), Messperiode (0x04), SPAD-Info (0x83/0x92) und die
+    Stop-Variable (Seite 1, 0x91). Eine Messung dauert 33 ms.
+    """
+
+    MESSDAUER = 0.033
+
+    def __init__(self, adresse=0x29):
+        super().__init__(adresse)
+        self.seiten = {}
+        self.seite = 0
+        self.modus = None
+        self.periode = self.MESSDAUER
+        self.naechste = None
+        self.start_bit_bis = 0.0
+        self.status = 0
+        self.messungen = 0
+        self._bank(1)[0x91] = 0x3C
+        self._bank(0)[0xC0] = 0xEE
+
+    def _bank(self, seite):
+        bank = self.seiten.get(seite)
+        if bank is None:
+            bank = self.seiten[seite] = bytearray(256)
+        return bank
+
+    def schreiben(self, daten):
+        if not daten:
+            return
+        self.zeiger = daten[0]
+        for i in range(1, len(daten)):
+            self._byte_schreiben((self.zeiger + i - 1) & 0xFF, daten[i])
+
+    def _byte_schreiben(self, register, wert):
+        if register == 0xFF:
+            self.seite = wert
+            return
+        self._aktualisieren()
+        jetzt = welt().uhr.monotonic()
+        if self.seite == 0 and register == 0x00:
+            if wert & 0x01:
+                if self.modus in ("dauer", "zeit"):
+                    # Stop im Dauerbetrieb
+                    self.modus = None
+                    return
+                self.modus = "einzel"
+                self.start_bit_bis = jetzt + 0.001
+                # VHV- (0x41) und Phasenkalibrierung (0x01 während init()) sind kürzer
+                dauer = 0.005 if wert & 0x40 or wert == 0x01 and self._kalibrierung() else self.MESSDAUER
+                self.naechste = jetzt + dauer
+            elif wert & 0x02:
+                self.modus = "dauer"
+                self.periode = self.MESSDAUER
+                self.naechste = jetzt + self.periode
+            elif wert & 0x04:
+                bank = self._bank(0)
+                periode_ms = bank[0x04] << 8 | bank[0x05]
+                osc = bank[0xF8] << 8 | bank[0xF9]
+                if osc:
+                    periode_ms //= osc
+                self.modus = "zeit"
+                self.periode = max(self.MESSDAUER, periode_ms / 1000)
+                self.naechste = jetzt + self.periode
+            return
+        if self.seite == 0 and register == 0x0B:
+            if wert & 0x01:
+                self.status = 0
+            return
+        self._bank(self.seite)[register] = wert
+
+    def _kalibrierung(self):
+        # SYSTEM_SEQUENCE_CONFIG 0x01 oder 0x02 = Kalibrierschritt beim init()
+        return self._bank(0)[0x01] in (0x01, 0x02)
+
+    def _aktualisieren(self):
+        if self.modus is None or self.naechste is None:
+            return
+        jetzt = welt().uhr.monotonic()
+        if jetzt < self.naechste:
+            return
+        self._messen()
+        if self.modus == "einzel":
+            self.modus = None
+            self.naechste = None
+        else:
+            verpasst = int((jetzt - self.naechste) / self.periode)
+            self.naechste += (verpasst + 1) * self.periode
+
+    def _messen(self):
+        w = welt()
+        w.aktualisieren()
+        abstand = max(0, min(8190, int(w.rauschen(w.abstand_mm, 1.5))))
+        bank = self._bank(0)
+        bank[0x14] = 0x0B << 3  # Range Status: gültige Messung
+        bank[0x1E] = abstand >> 8
+        bank[0x1F] = abstand & 0xFF
+        self.status = 0x04
+        self.messungen += 1
+
+    def lesen(self, nbytes):
+        antwort = bytearray(nbytes)
+        for i in range(nbytes):
+            antwort[i] = self._byte_lesen((self.zeiger + i) & 0xFF)
+        return antwort
+
+    def _byte_lesen(self, register):
+        if register == 0xFF:
+            return self.seite
+        self._aktualisieren()
+        if register == 0x83:
+            # SPAD-Info ist sofort bereit
+            return self._bank(self.seite)[0x83] | 0x01
+        if self.seite == 7 and register == 0x92:
+            return 0x85  # 5 SPADs, Apertur
+        if self.seite == 0:
+            if register == 0x00:
+                return 0x01 if welt().uhr.monotonic() < self.start_bit_bis else 0x00
+            if register == 0x13:
+                return self.status
+        return self._bank(self.seite)[register]
+
+
+def erstelle_bus(w=None):
+    """FakeI2C-Bus mit AHT21, BH1750 und VL53L0X (einmal pro Welt)."""
+    w = w or welt()
+    if w.i2c_geraete is None:
+        w.i2c_geraete = FakeI2C(AHT21Modell(), BH1750Modell(), VL53L0XModell())
+    return w.i2c_geraete
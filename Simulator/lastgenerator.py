@@ -0,0 +1,235 @@
+"""Lastgenerator: viele simulierte BloomBuddys gleichzeitig an einem Broker.
+
+Jedes Gerät ist eine eigene MQTT-Verbindung (asyncio, ein Thread für alle)
+mit einer Geräte-ID wie im Flottenbetrieb (Bibliotheken/flotte.py) aus
+einer erfundenen MAC-Adresse. Es verhält sich wie das Hauptprogramm:
+- meldet beim Start seinen Zustand (retained) und abonniert cmd/pump
+- sendet alle --intervall Sekunden Messwerte an <geraet>/telemetry
+- führt Schaltbefehle mit neuer ID aus, meldet den neuen Zustand und
+  quittiert jeden Befehl an <geraet>/ack
+
+Ein Beobachter abonniert Zuhause/Wohnung/BloomBuddy/+/telemetry wie
+Node-RED, zählt verlorene Nachrichten und misst die Zustelllatenz. Dazu
+schickt er jede Sekunde einen Schaltbefehl mit fortlaufender ID an ein
+zufälliges Gerät und misst die Zeit bis zur Quittung. (Der Lastgenerator
+spricht nur QoS 0; QoS 1 und PUBACK prüft der Simulator mit dem
+unveränderten Hauptprogramm.)
+
+Die Geräte starten gleichmäßig verteilt über --rampe Sekunden, damit nicht
+alle Verbindungen in derselben Millisekunde aufgebaut werden.
+
+Beispiele:
+    python Simulator/lastgenerator.py --geraete 100 --dauer 30
+    python Simulator/lastgenerator.py --geraete 1000 --intervall 10 --rampe 20 --broker 127.0.0.1:1883
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import struct
+import sys
+import time
+
+SIMULATOR = os.path.dirname(os.path.abspath(__file__))
+PROJEKT = os.path.dirname(SIMULATOR)
+sys.path.insert(0, os.path.join(PROJEKT, "Bibliotheken"))
+sys.path.insert(0, os.path.join(PROJEKT, "Server"))
+
+import flotte                      # noqa: E402
+from mqtt_broker import Broker     # noqa: E402
+from mqtt_verbindung import Verbindung  # noqa: E402
+
+
+class Geraet:
+    """Ein simulierter BloomBuddy mit Geräte-ID aus einer erfundenen MAC-Adresse."""
+
+    def __init__(self, nummer, beobachter, zufall):
+        # 0x02 im ersten Byte: lokal verwaltete MAC, kollidiert nicht mit echten Geräten
+        self.id = flotte.geraete_id(b"\x02\x00" + struct.pack(">I", nummer))
+        self.beobachter = beobachter
+        self.zufall = zufall
+        self.pumpe = False
+        self.letzte_id = 0
+        self.verbindung = Verbindung(flotte.client_id(self.id), self._empfangen)
+        self.verbindungsdauer = None
+
+    def _topic(self, kanal):
+        return flotte.topic(self.id, kanal).decode()
+
+    def _zustand_senden(self):
+        zustand = {"Pumpe": "ON" if self.pumpe else "OFF", "Modus": "manuell" if self.pumpe else "automatik"}
+        self.verbindung.publish(self._topic("state"), json.dumps(zustand).encode(), retain=True)
+
+    def _empfangen(self, topic, nachricht):
+        try:
+            befehl = json.loads(nachricht)
+        except ValueError:
+            return
+        if not isinstance(befehl, dict):
+            return
+        befehl_id = befehl.get("ID", 0)
+        if befehl_id > self.letzte_id:
+            self.letzte_id = befehl_id
+            self.pumpe = befehl.get("Schalter1") == "ON"
+            self._zustand_senden()
+            ergebnis = "ausgefuehrt"
+        else:
+            ergebnis = "doppelt" if befehl_id == self.letzte_id else "veraltet"
+        quittung = {"ID": befehl_id, "Ergebnis": ergebnis}
+        self.verbindung.publish(self._topic("ack"), json.dumps(quittung).encode())
+
+    async def laufen(self, host, port, verzoegerung, intervall, ende):
+        await asyncio.sleep(verzoegerung)
+        start = time.perf_counter()
+        try:
+            await self.verbindung.verbinden(host, port)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError):
+            self.beobachter.fehlgeschlagen += 1
+            return
+        self.verbindungsdauer = time.perf_counter() - start
+        self.verbindung.subscribe(self._topic("cmd/pump"))
+        self._zustand_senden()
+        self.beobachter.geraete.append(self)
+        topic = self._topic("telemetry")
+        # Zufällige Phase, damit die Geräte nicht im Gleichtakt senden
+        await asyncio.sleep(self.zufall.uniform(0, intervall))
+        while self.verbindung.offen and time.perf_counter() < ende:
+            werte = {"Fuellstand": self.zufall.randint(100, 200), "Temperatur": round(self.zufall.uniform(18, 25), 2),
+                     "Luftfeuchtigkeit": round(self.zufall.uniform(40, 60), 2),
+                     "Helligkeit": self.zufall.randint(0, 1000), "Bodenfeuchtigkeit": self.zufall.randint(20, 80),
+                     "Voll": True}
+            self.beobachter.gesendet(self.id)
+            self.verbindung.publish(topic, json.dumps(werte).encode())
+            await asyncio.sleep(intervall)
+
+
+class Beobachter:
+    """Empfängt alle Messwerte wie Node-RED und misst Verlust und Latenz."""
+
+    def __init__(self, zufall):
+        self.zufall = zufall
+        self.verbindung = Verbindung(b"BloomBuddy-Lastgenerator", self._empfangen)
+        self.geraete = []
+        self.fehlgeschlagen = 0
+        self._unterwegs = collections.defaultdict(collections.deque)
+        self.anzahl_gesendet = 0
+        self.anzahl_empfangen = 0
+        self.latenzen = []
+        self._befehl_id = 0
+        self._befehle = {}
+        self.befehlslatenzen = []
+
+    def gesendet(self, geraet):
+        self.anzahl_gesendet += 1
+        self._unterwegs[geraet].append(time.perf_counter())
+
+    def _empfangen(self, topic, nachricht):
+        jetzt = time.perf_counter()
+        geraet = flotte.geraet_aus_topic(topic)
+        if topic.endswith("/telemetry"):
+            unterwegs = self._unterwegs[geraet]
+            if unterwegs:
+                # Pro Verbindung bleibt die Reihenfolge erhalten
+                self.latenzen.append(jetzt - unterwegs.popleft())
+                self.anzahl_empfangen += 1
+        elif topic.endswith("/ack"):
+            try:
+                gesendet = self._befehle.pop(json.loads(nachricht)["ID"], None)
+            except (ValueError, KeyError, TypeError):
+                return
+            if gesendet is not None:
+                self.befehlslatenzen.append(jetzt - gesendet)
+
+    async def befehle_senden(self, ende):
+        while time.perf_counter() < ende:
+            await asyncio.sleep(1)
+            if not self.geraete:
+                continue
+            geraet = self.zufall.choice(self.geraete)
+            self._befehl_id += 1
+            befehl = {"Schalter1": "OFF" if geraet.pumpe else "ON", "ID": self._befehl_id}
+            self._befehle[self._befehl_id] = time.perf_counter()
+            self.verbindung.publish(flotte.topic(geraet.id, "cmd/pump").decode(), json.dumps(befehl).encode())
+
+
+def _quantil(werte, q):
+    if not werte:
+        return float("nan")
+    werte = sorted(werte)
+    return werte[min(len(werte) - 1, int(q * len(werte)))]
+
+
+async def lastlauf(host, port, anzahl, intervall, rampe, dauer, seed=1):
+    """Startet anzahl Geräte und den Beobachter, gibt den Beobachter mit den Ergebnissen zurück."""
+    zufall = random.Random(seed)
+    beobachter = Beobachter(zufall)
+    await beobachter.verbindung.verbinden(host, port)
+    beobachter.verbindung.subscribe(flotte.BASIS + "/+/telemetry")
+    beobachter.verbindung.subscribe(flotte.BASIS + "/+/ack")
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    ende = start + rampe + dauer
+    geraete = [Geraet(i + 1, beobachter, random.Random(seed * 100003 + i)) for i in range(anzahl)]
+    aufgaben = [asyncio.ensure_future(g.laufen(host, port, rampe * i / max(1, anzahl), intervall, ende))
+                for i, g in enumerate(geraete)]
+    aufgaben.append(asyncio.ensure_future(beobachter.befehle_senden(ende)))
+    await asyncio.gather(*aufgaben)
+    # Nachzügler abwarten
+    await asyncio.sleep(0.5)
+    beobachter.laufzeit = time.perf_counter() - start
+    for g in geraete:
+        await g.verbindung.trennen()
+    await beobachter.verbindung.trennen()
+    return beobachter
+
+
+def bericht(beobachter):
+    verbunden = [g.verbindungsdauer for g in beobachter.geraete]
+    verloren = beobachter.anzahl_gesendet - beobachter.anzahl_empfangen
+    print("Geräte verbunden:   %d (%d fehlgeschlagen), Verbindungsaufbau Median %.1f ms, max %.1f ms" % (
+        len(verbunden), beobachter.fehlgeschlagen, _quantil(verbunden, 0.5) * 1000, max(verbunden or [0]) * 1000))
+    print("Messwerte:          %d gesendet, %d empfangen, %d verloren (%.2f %%)" % (
+        beobachter.anzahl_gesendet, beobachter.anzahl_empfangen, verloren,
+        100.0 * verloren / max(1, beobachter.anzahl_gesendet)))
+    print("Durchsatz:          %.0f Nachrichten/s über %.1f s" % (
+        beobachter.anzahl_empfangen / beobachter.laufzeit, beobachter.laufzeit))
+    print("Latenz Messwerte:   Median %.1f ms, 95 %% %.1f ms, max %.1f ms" % (
+        _quantil(beobachter.latenzen, 0.5) * 1000, _quantil(beobachter.latenzen, 0.95) * 1000,
+        max(beobachter.latenzen or [0]) * 1000))
+    print("Latenz Befehle:     %d beantwortet, Median %.1f ms, max %.1f ms" % (
+        len(beobachter.befehlslatenzen), _quantil(beobachter.befehlslatenzen, 0.5) * 1000,
+        max(beobachter.befehlslatenzen or [0]) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Viele simulierte BloomBuddys an einem Broker")
+    parser.add_argument("--geraete", type=int, default=100, help="Anzahl simulierter Geräte")
+    parser.add_argument("--intervall", type=float, default=1.0, help="Sekunden zwischen zwei Messungen pro Gerät")
+    parser.add_argument("--rampe", type=float, default=5.0, help="Sekunden, über die der Start verteilt wird")
+    parser.add_argument("--dauer", type=float, default=10.0, help="Sekunden Volllast nach der Rampe")
+    parser.add_argument("--broker", metavar="HOST:PORT", help="externen Broker statt des eingebauten verwenden")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    broker = None
+    if args.broker:
+        host, _, port = args.broker.partition(":")
+        port = int(port or 1883)
+    else:
+        broker = Broker()
+        host, port = broker.starten()
+    print("%d Geräte, alle %.1f s eine Messung, Rampe %.0f s, Dauer %.0f s, Broker %s:%d" % (
+        args.geraete, args.intervall, args.rampe, args.dauer, host, port))
+    try:
+        beobachter = asyncio.run(lastlauf(host, port, args.geraete, args.intervall, args.rampe, args.dauer, args.seed))
+    finally:
+        if broker is not None:
+            broker.stoppen()
+    bericht(beobachter)
+
+
+if __name__ == "__main__":
+    main()
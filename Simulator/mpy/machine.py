@@ -0,0 +1,161 @@
+"""Simuliertes machine-Modul (ESP32) für CPython.
+
+Pins und ADC sind mit der Welt verbunden (Relais an Pin 8, Bodenfeuchte an
+Pin 15), I2C und SoftI2C liefern den FakeI2C-Bus mit den Sensormodellen.
+"""
+
+from welt import welt
+
+
+class Pin:
+    IN = 1
+    OUT = 3
+    OPEN_DRAIN = 7
+    PULL_UP = 2
+    PULL_DOWN = 1
+    IRQ_RISING = 1
+    IRQ_FALLING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.mode = mode
+        self._wert = 0
+        if value is not None:
+            self._wert = 1 if value else 0
+        welt().pins[id] = self
+
+    def init(self, mode=-1, pull=-1, value=None):
+        self.mode = mode
+        if value is not None:
+            self.value(value)
+
+    def value(self, wert=None):
+        if wert is None:
+            return self._wert
+        # Welt bis jetzt mit dem alten Pinzustand fortschreiben
+        welt().aktualisieren()
+        wert = 1 if wert else 0
+        if wert != self._wert and self.id == welt().relais_pin:
+            welt().relais_geschaltet(wert)
+        self._wert = wert
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def __call__(self, wert=None):
+        return self.value(wert)
+
+
+class ADC:
+    ATTN_0DB = 0
+    ATTN_2_5DB = 1
+    ATTN_6DB = 2
+    ATTN_11DB = 3
+    WIDTH_9BIT = 0
+    WIDTH_10BIT = 1
+    WIDTH_11BIT = 2
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin, atten=None):
+        self.pin = pin
+        self._breite = 12
+
+    def atten(self, atten):
+        pass
+
+    def width(self, width):
+        self._breite = 9 + width
+
+    def read(self):
+        wert = self._lesen()
+        return wert >> (12 - self._breite)
+
+    def read_u16(self):
+        return self._lesen() << 4
+
+    def _lesen(self):
+        pin_id = self.pin.id if isinstance(self.pin, Pin) else self.pin
+        if pin_id == welt().boden_pin:
+            return welt().boden_adc()
+        return 0
+
+
+class I2C:
+    """Hardware-I2C: liefert den simulierten Bus mit den Sensormodellen."""
+
+    def __new__(cls, id=0, *, scl=None, sda=None, freq=400000, timeout=50000):
+        # Erst hier importieren: geraete braucht i2cbus, und i2cbus importiert machine
+        import geraete
+        return geraete.erstelle_bus()
+
+
+class SoftI2C:
+    def __new__(cls, scl=None, sda=None, *, freq=400000, timeout=50000):
+        import geraete
+        return geraete.erstelle_bus()
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self.id = id
+        self.faellig = None
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, *, mode=PERIODIC, period=-1, freq=-1, callback=None):
+        if freq > 0:
+            period = 1000 / freq
+        self.mode = mode
+        self.periode = max(1, period) / 1000
+        self.callback = callback
+        uhr = welt().uhr
+        self.faellig = uhr.monotonic() + self.periode
+        uhr.timer_anmelden(self)
+
+    def deinit(self):
+        welt().uhr.timer_abmelden(self)
+
+    def ausloesen(self, jetzt):
+        if self.mode == self.PERIODIC:
+            self.faellig += self.periode
+            if self.faellig < jetzt:
+                self.faellig = jetzt + self.periode
+        else:
+            self.deinit()
+        if self.callback is not None:
+            self.callback(self)
+
+
+def unique_id():
+    return welt().mac
+
+
+def freq(hz=None):
+    return 240000000
+
+
+def reset():
+    from uhr import SimulationBeendet
+    raise SimulationBeendet("machine.reset()")
+
+
+def soft_reset():
+    reset()
+
+
+def idle():
+    welt().uhr.schlafen(0.001)
+
+
+def disable_irq():
+    return 0
+
+
+def enable_irq(state=0):
+    pass
@@ -0,0 +1,25 @@
+"""Simuliertes micropython-Modul."""
+
+
+def const(wert):
+    return wert
+
+
+def native(funktion):
+    return funktion
+
+
+viper = native
+
+
+def schedule(funktion, argument):
+    funktion(argument)
+    return True
+
+
+def alloc_emergency_exception_buf(groesse):
+    pass
+
+
+def mem_info(*args):
+    pass
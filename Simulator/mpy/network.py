@@ -0,0 +1,50 @@
+"""Simuliertes network-Modul (nur WLAN-Station)."""
+
+from welt import welt
+
+STA_IF = 0
+AP_IF = 1
+
+STAT_IDLE = 1000
+STAT_CONNECTING = 1001
+STAT_GOT_IP = 1010
+STAT_NO_AP_FOUND = 201
+
+
+class WLAN:
+    def __init__(self, interface=STA_IF):
+        self.interface = interface
+        self._aktiv = False
+        self._verbunden = False
+
+    def active(self, aktiv=None):
+        if aktiv is None:
+            return self._aktiv
+        self._aktiv = bool(aktiv)
+        if not self._aktiv:
+            self._verbunden = False
+
+    def connect(self, ssid=None, key=None, **kwargs):
+        self.ssid = ssid
+        self._verbunden = self._aktiv
+
+    def disconnect(self):
+        self._verbunden = False
+
+    def isconnected(self):
+        return self._verbunden and welt().wlan_verfuegbar
+
+    def status(self, *args):
+        if args:
+            return -60
+        if self.isconnected():
+            return STAT_GOT_IP
+        return STAT_NO_AP_FOUND if self._verbunden else STAT_IDLE
+
+    def ifconfig(self, *args):
+        return ("192.168.33.50", "255.255.255.0", "192.168.33.1", "192.168.33.1")
+
+    def config(self, *args, **kwargs):
+        if args and args[0] == "mac":
+            return welt().mac
+        return None
@@ -0,0 +1,307 @@
+"""Simuliertes umqtt.simple: echter MQTT-3.1.1-Client über TCP.
+
+Schnittstelle und Verhalten entsprechen umqtt.simple (connect, publish,
+subscribe, check_msg, wait_msg, ping). Die Serveradresse aus dem Programm
+wird ignoriert, verbunden wird immer mit dem Broker der Welt: einem lokalen
+Mosquitto oder dem In-Process-Broker aus Simulator/mqtt_broker.py.
+Ist das simulierte WLAN weg, schlagen alle Zugriffe mit OSError fehl.
+"""
+
+import socket
+import struct
+import time
+
+from welt import welt
+
+_EHOSTUNREACH = 113
+
+
+class MQTTException(Exception):
+    pass
+
+
+class _Socket:
+    """Socket mit der Stream-Schnittstelle von MicroPython (read/write).
+
+    Im nicht blockierenden Modus liefert read() None, wenn keine Daten da sind.
+    Gesendete PUBLISH-Pakete werden hier für die Welt gezählt, damit auch
+    Pakete mitzählen, die ein Programm selbst zusammensetzt (z. B. QoS 1
+    ohne auf PUBACK zu warten, siehe mqtt_sitzung.py). antwort_erwartet ist die
+    echte Zeit der letzten QoS-1-Nachricht (für uselect im virtuellen Betrieb).
+    """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._blockierend = True
+        self._ausgang = bytearray()
+        self.antwort_erwartet = None
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def setblocking(self, blockierend):
+        self._blockierend = blockierend
+        self._sock.setblocking(blockierend)
+
+    def settimeout(self, timeout):
+        self._sock.settimeout(timeout)
+
+    def read(self, n):
+        _netz_pruefen()
+        daten = b""
+        if not self._blockierend:
+            try:
+                daten = self._sock.recv(n)
+            except BlockingIOError:
+                return None
+            if not daten:
+                return b""
+            self._sock.setblocking(True)
+        while len(daten) < n:
+            teil = self._sock.recv(n - len(daten))
+            if not teil:
+                break
+            daten += teil
+        if not self._blockierend:
+            self._sock.setblocking(False)
+        return daten
+
+    def write(self, daten, n=None):
+        _netz_pruefen()
+        if n is not None:
+            daten = daten[:n]
+        self._sock.sendall(daten)
+        self._mitzaehlen(daten)
+        return len(daten)
+
+    def _mitzaehlen(self, daten):
+        """Sammelt die gesendeten Bytes bis zum Ende jedes Pakets und zählt PUBLISH-Pakete."""
+        self._ausgang += daten
+        while len(self._ausgang) >= 2:
+            laenge = 0
+            i = 1
+            while True:
+                if i >= len(self._ausgang):
+                    return
+                byte = self._ausgang[i]
+                laenge |= (byte & 0x7F) << (7 * (i - 1))
+                i += 1
+                if not byte & 0x80:
+                    break
+            gesamt = i + laenge
+            if len(self._ausgang) < gesamt:
+                return
+            paket = bytes(self._ausgang[:gesamt])
+            del self._ausgang[:gesamt]
+            if paket[0] & 0xF0 == 0x30:
+                topic_laenge = paket[i] << 8 | paket[i + 1]
+                nutzdaten = laenge - 2 - topic_laenge - (2 if paket[0] & 0x06 else 0)
+                if paket[0] & 0x06:
+                    self.antwort_erwartet = time.monotonic()
+                welt().nachricht_gesendet(nutzdaten, gesamt)
+
+    def close(self):
+        self._sock.close()
+
+
+def _netz_pruefen():
+    if not welt().wlan_verfuegbar:
+        raise OSError(_EHOSTUNREACH)
+
+
+class MQTTClient:
+    def __init__(self, client_id, server, port=0, user=None, password=None, keepalive=0,
+                 ssl=False, ssl_params={}):
+        if port == 0:
+            port = 8883 if ssl else 1883
+        self.client_id = client_id
+        self.sock = None
+        self.server = server
+        self.port = port
+        self.pid = 0
+        self.cb = None
+        self.user = user
+        self.pswd = password
+        self.keepalive = keepalive
+        self.lw_topic = None
+        self.lw_msg = None
+        self.lw_qos = 0
+        self.lw_retain = False
+
+    def _send_str(self, s):
+        self.sock.write(struct.pack("!H", len(s)))
+        self.sock.write(s)
+
+    def _recv_len(self):
+        n = 0
+        sh = 0
+        while 1:
+            b = self.sock.read(1)[0]
+            n |= (b & 0x7F) << sh
+            if not b & 0x80:
+                return n
+            sh += 7
+
+    def set_callback(self, f):
+        self.cb = f
+
+    def set_last_will(self, topic, msg, retain=False, qos=0):
+        assert 0 <= qos <= 2
+        assert topic
+        self.lw_topic = topic
+        self.lw_msg = msg
+        self.lw_qos = qos
+        self.lw_retain = retain
+
+    def connect(self, clean_session=True):
+        _netz_pruefen()
+        self.sock = _Socket(socket.create_connection(welt().broker, timeout=5))
+        self.sock.settimeout(None)
+        premsg = bytearray(b"\x10\0\0\0\0\0")
+        msg = bytearray(b"\x04MQTT\x04\x02\0\0")
+
+        sz = 10 + 2 + len(self.client_id)
+        msg[6] = clean_session << 1
+        if self.user:
+            sz += 2 + len(self.user) + 2 + len(self.pswd)
+            msg[6] |= 0xC0
+        if self.keepalive:
+            assert self.keepalive < 65536
+            msg[7] |= self.keepalive >> 8
+            msg[8] |= self.keepalive & 0x00FF
+        if self.lw_topic:
+            sz += 2 + len(self.lw_topic) + 2 + len(self.lw_msg)
+            msg[6] |= 0x4 | (self.lw_qos & 0x1) << 3 | (self.lw_qos & 0x2) << 3
+            msg[6] |= self.lw_retain << 5
+
+        i = 1
+        while sz > 0x7F:
+            premsg[i] = (sz & 0x7F) | 0x80
+            sz >>= 7
+            i += 1
+        premsg[i] = sz
+
+        self.sock.write(premsg, i + 2)
+        self.sock.write(msg)
+        self._send_str(self.client_id)
+        if self.lw_topic:
+            self._send_str(self.lw_topic)
+            self._send_str(self.lw_msg)
+        if self.user:
+            self._send_str(self.user)
+            self._send_str(self.pswd)
+        resp = self.sock.read(4)
+        assert resp[0] == 0x20 and resp[1] == 0x02
+        if resp[3] != 0:
+            raise MQTTException(resp[3])
+        return resp[2] & 1
+
+    def disconnect(self):
+        try:
+            self.sock.write(b"\xe0\0")
+        finally:
+            self.sock.close()
+
+    def ping(self):
+        self.sock.write(b"\xc0\0")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if isinstance(msg, str):
+            msg = msg.encode()
+        pkt = bytearray(b"\x30\0\0\0")
+        pkt[0] |= qos << 1 | retain
+        sz = 2 + len(topic) + len(msg)
+        if qos > 0:
+            sz += 2
+        assert sz < 2097152
+        i = 1
+        while sz > 0x7F:
+            pkt[i] = (sz & 0x7F) | 0x80
+            sz >>= 7
+            i += 1
+        pkt[i] = sz
+        self.sock.write(pkt, i + 1)
+        self._send_str(topic)
+        if qos > 0:
+            self.pid += 1
+            pid = self.pid
+            struct.pack_into("!H", pkt, 0, pid)
+            self.sock.write(pkt, 2)
+        self.sock.write(msg)
+        if qos == 1:
+            while 1:
+                op = self.wait_msg()
+                if op == 0x40:
+                    sz = self.sock.read(1)
+                    assert sz == b"\x02"
+                    rcv_pid = self.sock.read(2)
+                    rcv_pid = rcv_pid[0] << 8 | rcv_pid[1]
+                    if pid == rcv_pid:
+                        return
+        elif qos == 2:
+            assert 0
+
+    def subscribe(self, topic, qos=0):
+        assert self.cb is not None, "Subscribe callback is not set"
+        if isinstance(topic, str):
+            topic = topic.encode()
+        pkt = bytearray(b"\x82\0\0\0")
+        self.pid += 1
+        struct.pack_into("!BH", pkt, 1, 2 + 2 + len(topic) + 1, self.pid)
+        self.sock.write(pkt)
+        self._send_str(topic)
+        self.sock.write(qos.to_bytes(1, "little"))
+        while 1:
+            op = self.wait_msg()
+            if op == 0x90:
+                resp = self.sock.read(4)
+                assert resp[1] == pkt[2] and resp[2] == pkt[3]
+                if resp[3] == 0x80:
+                    raise MQTTException(resp[3])
+                return
+
+    # Wait for a single incoming MQTT message and process it.
+    # Subscribed messages are delivered to a callback previously
+    # set by .set_callback() method. Other (internal) MQTT
+    # messages processed internally.
+    def wait_msg(self):
+        res = self.sock.read(1)
+        self.sock.setblocking(True)
+        if res is None:
+            return None
+        if res == b"":
+            raise OSError(-1)
+        if res == b"\xd0":  # PINGRESP
+            sz = self.sock.read(1)[0]
+            assert sz == 0
+            return None
+        op = res[0]
+        if op & 0xF0 != 0x30:
+            return op
+        sz = self._recv_len()
+        topic_len = self.sock.read(2)
+        topic_len = (topic_len[0] << 8) | topic_len[1]
+        topic = self.sock.read(topic_len)
+        sz -= topic_len + 2
+        if op & 6:
+            pid = self.sock.read(2)
+            pid = pid[0] << 8 | pid[1]
+            sz -= 2
+        msg = self.sock.read(sz)
+        self.cb(topic, msg)
+        if op & 6 == 2:
+            pkt = bytearray(b"\x40\x02\0\0")
+            struct.pack_into("!H", pkt, 2, pid)
+            self.sock.write(pkt)
+        elif op & 6 == 4:
+            assert 0
+        return op
+
+    # Checks whether a pending message from server is available.
+    # If not, returns immediately with None. Otherwise, does
+    # the same processing as wait_msg.
+    def check_msg(self):
+        self.sock.setblocking(False)
+        return self.wait_msg()
@@ -0,0 +1,90 @@
+"""Simuliertes uselect-Modul: poll() wartet auf echte Sockets, aber mit der Simulationsuhr.
+
+Die Wartezeit läuft über die Simulationsuhr (im virtuellen Betrieb springt
+sie bis zum nächsten Timer bzw. zum Ende der Wartezeit), Timer-Callbacks
+werden währenddessen ausgeführt. Ob ein Socket lesbar ist, entscheidet das
+echte select.poll().
+
+Hat ein angemeldeter Socket gerade eine Anfrage gesendet (antwort_erwartet:
+eine Nachricht mit QoS 1, siehe umqtt/simple.py, oder eine NTP-Anfrage,
+siehe usocket.py), springt die virtuelle Uhr erst, wenn die Antwort da ist
+oder ANTWORT_S echt vergangen sind. Broker und Zeitserver im selben Prozess
+brauchen für die Antwort Echtzeit, im virtuellen Betrieb lägen sonst
+zwischen Anfrage und Antwort beliebig viele simulierte Sekunden.
+
+poll() gibt wie unter MicroPython die angemeldeten Objekte zurück, nicht
+deren Dateideskriptoren.
+"""
+
+import select as _select
+import time as _time
+
+from welt import welt
+
+POLLIN = _select.POLLIN
+POLLOUT = _select.POLLOUT
+POLLERR = _select.POLLERR
+POLLHUP = _select.POLLHUP
+
+ANTWORT_S = 0.05
+
+
+class _Poll:
+    def __init__(self):
+        self._poll = _select.poll()
+        self._objekte = []
+
+    def register(self, obj, maske=POLLIN | POLLOUT):
+        self._poll.register(obj, maske)
+        if obj not in self._objekte:
+            self._objekte.append(obj)
+
+    def unregister(self, obj):
+        self._poll.unregister(obj)
+        if obj in self._objekte:
+            self._objekte.remove(obj)
+
+    def _antwort_abwarten(self):
+        """Wartet echt auf die Antwort auf eine gerade gesendete Anfrage."""
+        gesendet = max([getattr(obj, "antwort_erwartet", None) or 0.0 for obj in self._objekte] or [0.0])
+        rest = gesendet + ANTWORT_S - _time.monotonic()
+        if rest <= 0:
+            return []
+        return self._objekte_zuordnen(self._poll.poll(max(1, round(rest * 1000))))
+
+    def _objekte_zuordnen(self, ereignisse):
+        objekte = {obj.fileno(): obj for obj in self._objekte}
+        return [(objekte.get(fd, fd), ereignis) for fd, ereignis in ereignisse]
+
+    def modify(self, obj, maske):
+        self._poll.modify(obj, maske)
+
+    def poll(self, timeout=-1):
+        uhr = welt().uhr
+        ende = None if timeout < 0 else uhr.monotonic() + timeout / 1000
+        while True:
+            uhr.timer_ausfuehren()
+            ereignisse = self._poll.poll(0)
+            if ereignisse or timeout == 0:
+                return self._objekte_zuordnen(ereignisse)
+            jetzt = uhr.monotonic()
+            if ende is not None and jetzt >= ende:
+                uhr.ende_pruefen()
+                return []
+            schritt = None if ende is None else ende - jetzt
+            naechster = uhr.naechster_timer()
+            if naechster is not None:
+                bis_timer = max(0.0, naechster - jetzt)
+                schritt = bis_timer if schritt is None else min(schritt, bis_timer)
+            if uhr.virtuell and schritt is not None:
+                ereignisse = self._antwort_abwarten()
+                if ereignisse:
+                    return ereignisse
+                uhr.vorruecken(schritt)
+            else:
+                self._poll.poll(-1 if schritt is None else max(1, round(schritt * 1000)))
+            uhr.ende_pruefen()
+
+
+def poll():
+    return _Poll()
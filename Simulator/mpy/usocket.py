@@ -0,0 +1,37 @@
+"""Simuliertes usocket-Modul: echte CPython-Sockets, NTP geht an den Zeitserver der Welt.
+
+Wie bei umqtt.simple wird die Serveradresse aus dem Programm für NTP
+(Port 123) ignoriert: getaddrinfo() liefert den Zeitserver der Welt
+(Simulator/ntp_server.py oder --ntp). Hat die Welt keinen Zeitserver
+oder ist das simulierte WLAN weg, schlägt die Namensauflösung mit
+OSError fehl, wie ohne Netz auf dem ESP32.
+
+sendto() merkt sich die echte Sendezeit (antwort_erwartet), damit uselect
+im virtuellen Betrieb kurz auf die Antwort des Zeitservers wartet.
+"""
+
+from socket import *  # noqa: F401,F403
+import socket as _socket
+import time as _time
+
+from welt import welt
+
+_EHOSTUNREACH = 113
+
+
+def getaddrinfo(host, port, *args):
+    if not welt().wlan_verfuegbar:
+        raise OSError(_EHOSTUNREACH)
+    if port == 123:
+        if welt().ntp is None:
+            raise OSError(_EHOSTUNREACH)
+        host, port = welt().ntp
+    return _socket.getaddrinfo(host, port, *args)
+
+
+class socket(_socket.socket):
+    antwort_erwartet = None
+
+    def sendto(self, *args):
+        self.antwort_erwartet = _time.monotonic()
+        return super().sendto(*args)
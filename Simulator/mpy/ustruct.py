@@ -0,0 +1,3 @@
+"""Simuliertes ustruct-Modul."""
+
+from struct import *  # noqa: F401,F403
@@ -0,0 +1,61 @@
+"""Simuliertes utime-Modul, alle Zeiten kommen von der Simulationsuhr."""
+
+import time as _time
+
+from welt import welt
+
+# Originale sichern, starte_simulation leitet time.* auf dieses Modul um
+_localtime = _time.localtime
+_gmtime = _time.gmtime
+
+
+def ticks_ms():
+    return welt().uhr.ticks_ms()
+
+
+def ticks_us():
+    return welt().uhr.ticks_us()
+
+
+def ticks_cpu():
+    return welt().uhr.ticks_us()
+
+
+def ticks_diff(ticks1, ticks2):
+    return ticks1 - ticks2
+
+
+def ticks_add(ticks, delta):
+    return ticks + delta
+
+
+def sleep(sekunden):
+    welt().uhr.schlafen(sekunden)
+
+
+def sleep_ms(ms):
+    welt().uhr.schlafen(ms / 1000)
+
+
+def sleep_us(us):
+    welt().uhr.schlafen(us / 1000000)
+
+
+def time():
+    # Wie auf dem ESP32 ganze Sekunden
+    return int(welt().uhr.zeit())
+
+
+def time_ns():
+    return int(welt().uhr.zeit() * 1000000000)
+
+
+def localtime(sekunden=None):
+    return _localtime(time() if sekunden is None else sekunden)
+
+
+def gmtime(sekunden=None):
+    return _gmtime(time() if sekunden is None else sekunden)
+
+
+mktime = _time.mktime
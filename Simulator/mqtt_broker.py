@@ -0,0 +1,318 @@
+"""Kleiner MQTT-3.1.1-Broker als Ersatz für Mosquitto in der Simulation.
+
+Unterstützt CONNECT, SUBSCRIBE/UNSUBSCRIBE mit + und #, PUBLISH mit QoS 0
+und 1 (PUBACK), Retained Messages, PINGREQ und die Keepalive-Überwachung.
+Eine zweite Verbindung mit derselben Client-ID trennt die erste, wie bei
+Mosquitto. Jeder Client läuft in einem eigenen Thread.
+
+Aufruf als eigenständiger Broker:
+    python Simulator/mqtt_broker.py --port 1883
+"""
+
+import argparse
+import socket
+import struct
+import threading
+
+
+def topic_passt(filter, topic):
+    """Prüft, ob topic zum Abo-Filter passt (Platzhalter + und #)."""
+    f_teile = filter.split("/")
+    t_teile = topic.split("/")
+    for i, teil in enumerate(f_teile):
+        if teil == "#":
+            return True
+        if i >= len(t_teile):
+            return False
+        if teil != "+" and teil != t_teile[i]:
+            return False
+    return len(f_teile) == len(t_teile)
+
+
+def _laenge_kodieren(n):
+    daten = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            daten.append(byte | 0x80)
+        else:
+            daten.append(byte)
+            return bytes(daten)
+
+
+def _str(daten, pos):
+    laenge = struct.unpack_from("!H", daten, pos)[0]
+    return bytes(daten[pos + 2:pos + 2 + laenge]), pos + 2 + laenge
+
+
+class _Sitzung(threading.Thread):
+    def __init__(self, broker, sock):
+        super().__init__(daemon=True)
+        self.broker = broker
+        self.sock = sock
+        self.client_id = None
+        self.abos = {}
+        self.keepalive = 0
+        self.pid = 0
+        self._sendesperre = threading.Lock()
+        self.offen = True
+
+    def senden(self, daten):
+        with self._sendesperre:
+            try:
+                self.sock.sendall(daten)
+            except OSError:
+                self.schliessen()
+
+    def _lesen(self, n):
+        daten = b""
+        while len(daten) < n:
+            teil = self.sock.recv(n - len(daten))
+            if not teil:
+                raise ConnectionError("Verbindung geschlossen")
+            daten += teil
+        return daten
+
+    def _paket_lesen(self):
+        kopf = self._lesen(1)[0]
+        laenge = 0
+        faktor = 1
+        while True:
+            byte = self._lesen(1)[0]
+            laenge += (byte & 0x7F) * faktor
+            if not byte & 0x80:
+                break
+            faktor <<= 7
+        return kopf, self._lesen(laenge) if laenge else b""
+
+    def run(self):
+        try:
+            while self.offen:
+                kopf, daten = self._paket_lesen()
+                if not self._verarbeiten(kopf, daten):
+                    break
+        except (OSError, ConnectionError, struct.error, IndexError):
+            pass
+        finally:
+            self.schliessen(will=True)
+
+    def _verarbeiten(self, kopf, daten):
+        art = kopf & 0xF0
+        if art == 0x10:
+            return self._connect(daten)
+        if self.client_id is None:
+            return False
+        if art == 0x30:
+            self._publish(kopf, daten)
+        elif art == 0x40:
+            pass  # PUBACK des Clients, keine Wiederholung nötig
+        elif art == 0x80:
+            self._subscribe(daten)
+        elif art == 0xA0:
+            self._unsubscribe(daten)
+        elif art == 0xC0:
+            self.senden(b"\xd0\x00")
+        elif art == 0xE0:
+            self.will = None
+            return False
+        return True
+
+    def _connect(self, daten):
+        pos = 0
+        _, pos = _str(daten, pos)  # Protokollname
+        pos += 1                   # Protokollversion
+        flags = daten[pos]
+        self.keepalive = struct.unpack_from("!H", daten, pos + 1)[0]
+        pos += 3
+        client_id, pos = _str(daten, pos)
+        self.will = None
+        if flags & 0x04:
+            will_topic, pos = _str(daten, pos)
+            will_msg, pos = _str(daten, pos)
+            self.will = (will_topic.decode(), will_msg, (flags >> 3) & 0x03, bool(flags & 0x20))
+        self.client_id = client_id.decode() or "anonym-%d" % id(self)
+        if self.keepalive:
+            self.sock.settimeout(self.keepalive * 1.5)
+        self.broker._anmelden(self)
+        self.senden(b"\x20\x02\x00\x00")
+        return True
+
+    def _publish(self, kopf, daten):
+        qos = (kopf >> 1) & 0x03
+        retain = bool(kopf & 0x01)
+        topic, pos = _str(daten, 0)
+        if qos:
+            pid = struct.unpack_from("!H", daten, pos)[0]
+            pos += 2
+        nachricht = bytes(daten[pos:])
+        if qos == 1:
+            self.senden(b"\x40\x02" + struct.pack("!H", pid))
+        elif qos == 2:
+            # QoS 2 wird nicht unterstützt, wie QoS 1 quittieren (PUBREC/PUBCOMP entfallen)
+            self.senden(b"\x50\x02" + struct.pack("!H", pid))
+        self.broker.verteilen(topic.decode(), nachricht, min(qos, 1), retain)
+
+    def _subscribe(self, daten):
+        pid = struct.unpack_from("!H", daten, 0)[0]
+        pos = 2
+        antworten = bytearray()
+        neue = []
+        while pos < len(daten):
+            filter, pos = _str(daten, pos)
+            qos = min(daten[pos], 1)
+            pos += 1
+            self.abos[filter.decode()] = qos
+            neue.append(filter.decode())
+            antworten.append(qos)
+        self.senden(b"\x90" + _laenge_kodieren(2 + len(antworten)) + struct.pack("!H", pid) + bytes(antworten))
+        for filter in neue:
+            for topic, (nachricht, qos) in self.broker.retained_fuer(filter):
+                self.zustellen(topic, nachricht, min(qos, self.abos[filter]), retain=True)
+
+    def _unsubscribe(self, daten):
+        pid = struct.unpack_from("!H", daten, 0)[0]
+        pos = 2
+        while pos < len(daten):
+            filter, pos = _str(daten, pos)
+            self.abos.pop(filter.decode(), None)
+        self.senden(b"\xb0\x02" + struct.pack("!H", pid))
+
+    def passende_qos(self, topic):
+        qos = None
+        for filter, abo_qos in self.abos.items():
+            if topic_passt(filter, topic):
+                qos = abo_qos if qos is None else max(qos, abo_qos)
+        return qos
+
+    def zustellen(self, topic, nachricht, qos, retain=False):
+        topic = topic.encode()
+        kopf = 0x30 | qos << 1 | int(retain)
+        rumpf = struct.pack("!H", len(topic)) + topic
+        if qos:
+            self.pid = self.pid % 65535 + 1
+            rumpf += struct.pack("!H", self.pid)
+        rumpf += nachricht
+        self.senden(bytes([kopf]) + _laenge_kodieren(len(rumpf)) + rumpf)
+        self.broker.zaehlen_aus(len(nachricht))
+
+    def schliessen(self, will=False):
+        if not self.offen:
+            return
+        self.offen = False
+        try:
+            # shutdown() weckt auch den Thread, der gerade in recv() wartet
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        self.broker._abmelden(self)
+        if will and getattr(self, "will", None):
+            topic, nachricht, qos, retain = self.will
+            self.broker.verteilen(topic, nachricht, min(qos, 1), retain)
+
+
+class Broker:
+    """MQTT-Broker im eigenen Prozess, z. B. für Simulation und Benchmarks."""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self._sitzungen = {}
+        self._retained = {}
+        self._sperre = threading.Lock()
+        self._server = None
+        self.nachrichten_ein = 0
+        self.nachrichten_aus = 0
+        self.bytes_ein = 0
+        self.bytes_aus = 0
+
+    def starten(self):
+        """Startet den Broker im Hintergrund, gibt (host, port) zurück."""
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, self.port))
+        self._server.listen(128)
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._annehmen, daemon=True).start()
+        return self.host, self.port
+
+    def stoppen(self):
+        server, self._server = self._server, None
+        if server is not None:
+            try:
+                server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            server.close()
+        with self._sperre:
+            sitzungen = list(self._sitzungen.values())
+        for sitzung in sitzungen:
+            sitzung.schliessen()
+
+    def _annehmen(self):
+        while self._server is not None:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                return
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            _Sitzung(self, sock).start()
+
+    def _anmelden(self, sitzung):
+        with self._sperre:
+            alt = self._sitzungen.get(sitzung.client_id)
+            self._sitzungen[sitzung.client_id] = sitzung
+        if alt is not None and alt is not sitzung:
+            alt.schliessen()
+
+    def _abmelden(self, sitzung):
+        with self._sperre:
+            if self._sitzungen.get(sitzung.client_id) is sitzung:
+                del self._sitzungen[sitzung.client_id]
+
+    def verbundene_clients(self):
+        with self._sperre:
+            return list(self._sitzungen)
+
+    def verteilen(self, topic, nachricht, qos=0, retain=False):
+        with self._sperre:
+            self.nachrichten_ein += 1
+            self.bytes_ein += len(nachricht)
+            if retain:
+                if nachricht:
+                    self._retained[topic] = (nachricht, qos)
+                else:
+                    self._retained.pop(topic, None)
+            sitzungen = list(self._sitzungen.values())
+        for sitzung in sitzungen:
+            abo_qos = sitzung.passende_qos(topic)
+            if abo_qos is not None:
+                sitzung.zustellen(topic, nachricht, min(qos, abo_qos))
+
+    def retained_fuer(self, filter):
+        with self._sperre:
+            return [(t, w) for t, w in self._retained.items() if topic_passt(filter, t)]
+
+    def zaehlen_aus(self, nbytes):
+        with self._sperre:
+            self.nachrichten_aus += 1
+            self.bytes_aus += nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MQTT-Broker für die BloomBuddy-Simulation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    broker = Broker(args.host, args.port)
+    host, port = broker.starten()
+    print("MQTT-Broker läuft auf %s:%d (Strg+C zum Beenden)" % (host, port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        broker.stoppen()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""SNTP-Server (RFC 4330) als Zeitquelle für die Simulation.
+
+Antwortet mit der Uhrzeit der Simulationsuhr (auch im virtuellen Betrieb),
+damit die Zeitstempel des Geräts zur simulierten Welt passen. Ersetzt im
+lokalen Netz einen echten NTP-Server; mit --ntp HOST:PORT verwendet die
+Simulation stattdessen einen laufenden Server (z. B. chrony).
+
+Aufruf als eigenständiger Server (echte Uhr, Port 123 braucht Rootrechte):
+    python Simulator/ntp_server.py --port 1123
+"""
+
+import argparse
+import socket
+import struct
+import threading
+import time
+
+_NTP_VERSATZ = 2208988800
+
+
+def _zeitstempel(t):
+    return struct.pack("!II", int(t) + _NTP_VERSATZ, int((t % 1) * (1 << 32)) & 0xFFFFFFFF)
+
+
+class NTPServer:
+    """NTP-Server im eigenen Thread, uhrzeit() liefert die Unixzeit in s (float)."""
+
+    def __init__(self, host="127.0.0.1", port=0, uhrzeit=time.time):
+        self.host = host
+        self.port = port
+        self.uhrzeit = uhrzeit
+        self._sock = None
+        self.anfragen = 0
+
+    def starten(self):
+        """Startet den Server im Hintergrund, gibt (host, port) zurück."""
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.bind((self.host, self.port))
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._antworten, daemon=True).start()
+        return self.host, self.port
+
+    def stoppen(self):
+        sock, self._sock = self._sock, None
+        if sock is not None:
+            sock.close()
+
+    def _antworten(self):
+        while self._sock is not None:
+            try:
+                anfrage, absender = self._sock.recvfrom(512)
+            except OSError:
+                return
+            empfang = self.uhrzeit()
+            if len(anfrage) < 48 or anfrage[0] & 0x07 != 3:
+                continue
+            antwort = bytearray(48)
+            antwort[0] = (anfrage[0] & 0x38) | 0x04  # Version wie angefragt, Modus 4 (Server)
+            antwort[1] = 1                           # Stratum 1 (Referenzuhr)
+            antwort[12:16] = b"SIM\0"
+            antwort[16:24] = _zeitstempel(empfang)   # Referenzzeit
+            antwort[24:32] = anfrage[40:48]          # Originate = Sendezeit des Clients
+            antwort[32:40] = _zeitstempel(empfang)
+            antwort[40:48] = _zeitstempel(self.uhrzeit())
+            self.anfragen += 1
+            try:
+                self._sock.sendto(antwort, absender)
+            except OSError:
+                return
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SNTP-Server für die BloomBuddy-Simulation")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1123)
+    args = parser.parse_args()
+    server = NTPServer(args.host, args.port)
+    host, port = server.starten()
+    print("NTP-Server läuft auf %s:%d (Strg+C zum Beenden)" % (host, port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stoppen()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Startet ein BloomBuddy-Programm unverändert unter CPython.
+
+Die MicroPython-Module (machine, utime, network, umqtt.simple, micropython)
+kommen aus Simulator/mpy, die Treiber aus Bibliotheken/. Die Sensoren sind
+registergenaue Modelle (geraete.py), die Umgebung ist die Welt (welt.py).
+MQTT läuft über echtes TCP: standardmäßig gegen einen Broker im selben
+Prozess, mit --broker gegen einen laufenden Mosquitto.
+Die Uhrzeit holt sich das Programm per NTP von einem Zeitserver im selben
+Prozess, der mit der Simulationsuhr läuft (--ntp für einen echten Server).
+
+Beispiele:
+    python Simulator/starte_simulation.py
+    python Simulator/starte_simulation.py --zyklen 5 --virtuelle-zeit --flash /tmp/flash
+    python Simulator/starte_simulation.py Programme/1_Hauptprogramm_BloomBuddy_Final.py --broker 127.0.0.1:1883
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+SIMULATOR = os.path.dirname(os.path.abspath(__file__))
+PROJEKT = os.path.dirname(SIMULATOR)
+STANDARDPROGRAMM = os.path.join(PROJEKT, "Programme", "1_Hauptprogramm_BloomBuddy_Final.py")
+
+for pfad in (os.path.join(PROJEKT, "Bibliotheken"), os.path.join(SIMULATOR, "mpy"), SIMULATOR):
+    if pfad not in sys.path:
+        sys.path.insert(0, pfad)
+
+import uhr as uhr_modul       # noqa: E402
+import utime                  # noqa: E402
+from i2cbus import I2CBus     # noqa: E402
+from mqtt_broker import Broker  # noqa: E402
+from ntp_server import NTPServer  # noqa: E402
+from uhr import SimulationBeendet  # noqa: E402
+from welt import neue_welt    # noqa: E402
+
+
+def time_umleiten():
+    """Ergänzt das CPython-time-Modul um die MicroPython-Funktionen.
+
+    Die Programme benutzen "import time" mit time.sleep_ms(), time.ticks_ms()
+    usw.; diese sowie time.sleep() und time.time() laufen danach über die
+    Simulationsuhr. time.monotonic() und time.perf_counter() bleiben echt.
+    """
+    for name in ("ticks_ms", "ticks_us", "ticks_cpu", "ticks_diff", "ticks_add",
+                 "sleep", "sleep_ms", "sleep_us", "time", "localtime", "gmtime"):
+        setattr(time, name, getattr(utime, name))
+
+
+def programm_ausfuehren(programm, welt):
+    """Führt ein MicroPython-Programm in der Welt aus.
+
+    Gibt den Grund für das Ende und den Namensraum des Programms zurück.
+    Eigener Namensraum statt runpy, damit z. B. der I2C-Bus des Programms
+    auch nach einem Abbruch für die Statistik erreichbar bleibt.
+    """
+    programm = os.path.abspath(programm)
+    # Dateien des Programms (z. B. der Telemetriepuffer) landen im Flash-Verzeichnis
+    if welt.flash is None:
+        welt.flash = tempfile.mkdtemp(prefix="bloombuddy_flash_")
+    os.chdir(welt.flash)
+    time_umleiten()
+    uhr_modul.asyncio_einbinden(welt.uhr)
+    namensraum = {"__name__": "__main__", "__file__": programm}
+    with open(programm, encoding="utf-8") as datei:
+        code = compile(datei.read(), programm, "exec")
+    try:
+        exec(code, namensraum)
+    except SimulationBeendet as e:
+        # Ein Abbruch mitten in asyncio.run() hinterlässt offene Tasks, das ist hier gewollt
+        logging.getLogger("asyncio").setLevel(logging.CRITICAL)
+        return str(e), namensraum
+    except KeyboardInterrupt:
+        return "abgebrochen", namensraum
+    return "Programm beendet", namensraum
+
+
+def _adresse(text):
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="BloomBuddy-Simulation unter CPython")
+    parser.add_argument("programm", nargs="?", default=STANDARDPROGRAMM,
+                        help="MicroPython-Programm (Standard: Hauptprogramm)")
+    parser.add_argument("--zyklen", type=int, default=None,
+                        help="nach so vielen gesendeten MQTT-Nachrichten beenden")
+    parser.add_argument("--dauer", type=float, default=None,
+                        help="simulierte Laufzeit in Sekunden")
+    parser.add_argument("--virtuelle-zeit", action="store_true",
+                        help="Wartezeiten überspringen (Zeit läuft nur simuliert)")
+    parser.add_argument("--broker", type=_adresse, default=None,
+                        help="externer MQTT-Broker HOST:PORT statt des eingebauten")
+    parser.add_argument("--ntp", type=_adresse, default=None,
+                        help="externer NTP-Server HOST:PORT statt des eingebauten (läuft mit der Simulationsuhr)")
+    parser.add_argument("--seed", type=int, default=None, help="Zufallsstartwert für das Messrauschen")
+    parser.add_argument("--flash", default=None,
+                        help="Verzeichnis als Dateisystem des ESP32 (Standard: neues temporäres)")
+    args = parser.parse_args(argv)
+
+    welt = neue_welt(virtuell=args.virtuelle_zeit, seed=args.seed)
+    welt.max_nachrichten = args.zyklen
+    welt.uhr.ende = args.dauer
+    welt.flash = args.flash
+
+    broker = None
+    if args.broker is None:
+        broker = Broker()
+        welt.broker = broker.starten()
+    else:
+        welt.broker = args.broker
+    ntp = None
+    if args.ntp is None:
+        ntp = NTPServer(uhrzeit=welt.uhr.zeit)
+        welt.ntp = ntp.starten()
+    else:
+        welt.ntp = args.ntp
+
+    start = time.perf_counter()
+    try:
+        grund, namensraum = programm_ausfuehren(args.programm, welt)
+    finally:
+        echtzeit = time.perf_counter() - start
+        if broker is not None:
+            broker.stoppen()
+        if ntp is not None:
+            ntp.stoppen()
+
+    print()
+    print("=== Simulation: %s ===" % grund)
+    print("Simulierte Zeit:  %.1f s (Rechenzeit %.1f s)" % (welt.uhr.monotonic(), echtzeit))
+    print("MQTT-Nachrichten: %d (%d Bytes Nutzdaten)" % (welt.nachrichten, welt.gesendete_bytes))
+    print("Pumpenlaufzeit:   %.1f s, Bodenfeuchte %.1f %%" % (welt.pumpe_laufzeit, welt.bodenfeuchte))
+    geraete = welt.i2c_geraete.geraete if welt.i2c_geraete is not None else {}
+    for bus in namensraum.values():
+        if not isinstance(bus, I2CBus):
+            continue
+        for adresse, (transaktionen, nbytes, dauer_us) in sorted(bus.statistik().items()):
+            name = type(geraete[adresse]).__name__ if adresse in geraete else "?"
+            print("I2C 0x%02x %-14s %6d Transaktionen, %7d Bytes" % (adresse, name, transaktionen, nbytes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+"""Tests der Bibliotheken auf dem PC (CPython mit den Ersatzmodulen aus mpy/).
+
+Die Prüfungen stehen bewusst nicht in den Bibliotheken selbst, sonst würden
+sie mit auf den Flash des ESP32 kopiert.
+
+Beispiele:
+    python Simulator/test_bibliotheken.py
+    python -m pytest Simulator/test_bibliotheken.py
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+SIMULATOR = os.path.dirname(os.path.abspath(__file__))
+if SIMULATOR not in sys.path:
+    sys.path.insert(0, SIMULATOR)
+
+import starte_simulation     # noqa: E402,F401  (richtet sys.path für mpy/ und Bibliotheken/ ein)
+import aenderungsfilter      # noqa: E402
+import geraete               # noqa: E402
+import i2cbus                # noqa: E402
+import telemetrie_format     # noqa: E402
+import uhr as uhr_modul      # noqa: E402
+from i2cbus import I2CBus, FakeGeraet, FakeI2C  # noqa: E402
+from machine import Timer    # noqa: E402
+from mqtt_broker import Broker  # noqa: E402
+from ntp_server import NTPServer  # noqa: E402
+from befehlsempfang import Befehlsempfang  # noqa: E402
+from welt import neue_welt   # noqa: E402
+
+import VL53L0X               # noqa: E402
+from aht import AHT21        # noqa: E402
+from bh1750 import BH1750    # noqa: E402
+from messzyklus import Messzyklus  # noqa: E402
+from mqtt_sitzung import MQTTSitzung  # noqa: E402
+from telemetriepuffer import Telemetriepuffer  # noqa: E402
+from telemetriestapel import Telemetriestapel, STAPEL_KOPF, STAPEL_EINTRAG  # noqa: E402
+from uhrzeit import Uhrzeit, GUELTIG_AB  # noqa: E402
+
+
+def test_fake_i2c():
+    """FakeGeraet: Registerzeiger, Auto-Inkrement und Fehler wie machine.I2C."""
+    geraet = FakeGeraet(0x40)
+    bus = I2CBus(FakeI2C(geraet))
+    assert bus.scan() == [0x40]
+    bus.writeto(0x40, bytes([0x10, 1, 2, 3]))
+    assert bytes(geraet.register[0x10:0x13]) == b"\x01\x02\x03"
+    assert bus.readfrom_mem(0x40, 0x11, 2) == b"\x02\x03"
+    puffer = bytearray(3)
+    bus.readfrom_mem_into(0x40, 0x10, puffer)
+    assert puffer == b"\x01\x02\x03"
+    bus.writeto_mem(0x40, 0xFF, b"\x07\x08")
+    assert geraet.register[0xFF] == 7 and geraet.register[0x00] == 8, "Zeiger läuft über"
+    try:
+        bus.readfrom(0x41, 1)
+    except OSError as fehler:
+        assert fehler.args[0] == i2cbus._ENODEV
+    else:
+        raise AssertionError("fehlendes Gerät nicht gemeldet")
+    # writeto 4 Byte, readfrom_mem 2+1, readfrom_mem_into 3+1, writeto_mem 2+1
+    assert bus.statistik(0x40)[:2] == (4, 14), bus.statistik(0x40)
+
+
+def test_bus_sperre():
+    """Ohne _thread kann die Sperre nicht warten: with meldet einen belegten Bus."""
+    bus = I2CBus(FakeI2C())
+    bus._sperre = i2cbus._Sperre()
+    with bus:
+        assert bus.gesperrt()
+        assert not bus.sperren(warten=False)
+        try:
+            with bus:
+                pass
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("belegter Bus nicht gemeldet")
+    assert not bus.gesperrt()
+
+
+def test_vl53l0x_timer_setzt_aus():
+    """Der Timer-Callback des VL53L0X überspringt seinen Takt bei gesperrtem Bus."""
+    welt = neue_welt(virtuell=True, seed=1)
+    bus = I2CBus(geraete.erstelle_bus(welt))
+    tof = VL53L0X.VL53L0X(bus, cache=True)
+    tof.start_continuous(size=4)
+    welt.uhr.schlafen(0.05)
+    assert bus.sperren(warten=False)
+    tof._poll_callback(None)
+    assert tof.skipped == 1 and tof.total == 0
+    bus.freigeben()
+    tof._poll_callback(None)
+    assert tof.skipped == 1 and tof.total == 1 and not bus.gesperrt()
+    tof.stop_continuous()
+    assert tof.wait_count(1, timeout_ms=100)
+    assert not tof.wait_count(2, timeout_ms=100), "ohne Timer kommen keine neuen Messwerte"
+
+
+def _vl53l0x(cache, einzeln=False):
+    """VL53L0X am Sensormodell; einzeln schreibt jedes Register wie vor den Burst-Zugriffen."""
+    welt = neue_welt(virtuell=True, seed=1)
+    bus = I2CBus(geraete.erstelle_bus(welt))
+    no_burst = VL53L0X._NO_BURST
+    if einzeln:
+        VL53L0X._NO_BURST = range(256)
+    try:
+        tof = VL53L0X.VL53L0X(bus, cache=cache)
+    finally:
+        VL53L0X._NO_BURST = no_burst
+    return tof, bus, bus.backend.geraete[0x29]
+
+
+def test_vl53l0x_burst():
+    """Burst-Schreibzugriffe in init() ergeben dieselben Register mit weniger Transaktionen."""
+    tof, bus, modell = _vl53l0x(cache=False)
+    einzeln, bus_einzeln, modell_einzeln = _vl53l0x(cache=False, einzeln=True)
+    assert modell.seiten == modell_einzeln.seiten
+    assert (bus_einzeln.statistik(0x29)[0], bus.statistik(0x29)[0]) == (150, 129)
+    # Einzelmessung: 7 für die Stop-Variable, Start, 2 x Startbit, 33 x Status
+    # (1 ms Abstand, 33 ms Messung), Ergebnis und Interrupt löschen
+    bus.statistik_zuruecksetzen()
+    assert tof.read()
+    assert bus.statistik(0x29)[0] == 45, bus.statistik(0x29)
+
+
+def test_vl53l0x_cache():
+    """Der Schattencache spart Zugriffe in init(), die Stop-Variable wird trotzdem vor jedem Start geschrieben."""
+    tof, bus, modell = _vl53l0x(cache=True)
+    assert bus.statistik(0x29)[0] == 126
+    bus.statistik_zuruecksetzen()
+    assert tof.read()
+    assert bus.statistik(0x29)[0] == 45, bus.statistik(0x29)
+    # Der Sensor kann 0x91 selbst ändern, der Schatten darf das Schreiben nicht verhindern
+    modell.seiten[1][0x91] = 0
+    bus.statistik_zuruecksetzen()
+    tof.start()
+    assert modell.seiten[1][0x91] == tof._stop_variable
+    assert bus.statistik(0x29)[0] == 8
+    tof.stop()
+
+    # Scheitert die Seitenwahl, ist die Seite unbekannt statt falsch gemerkt
+    schreiben = bus.backend.writeto_mem
+
+    def seitenwahl_scheitert(addr, memaddr, buf, addrsize=8):
+        if memaddr == 0xFF:
+            bus.backend.writeto_mem = schreiben
+            raise OSError(5)
+        schreiben(addr, memaddr, buf, addrsize)
+
+    bus.backend.writeto_mem = seitenwahl_scheitert
+    try:
+        tof.start()
+    except OSError:
+        pass
+    else:
+        raise AssertionError("Busfehler nicht weitergegeben")
+    assert tof._page is None and modell.seite == 0
+    modell.seiten[0][0x91] = 0
+    tof.start()
+    assert modell.seiten[1][0x91] == tof._stop_variable and modell.seiten[0][0x91] == 0
+    assert modell.seite == 0 and tof._page == 0
+    tof.stop()
+
+
+def test_messzyklus_ohne_messbefehl():
+    """Kommt der Messbefehl des AHT21 nicht an, wird nichts abgeholt (sonst käme die vorige Wandlung)."""
+    welt = neue_welt(virtuell=True, seed=1)
+    uhr_modul.asyncio_einbinden(welt.uhr)
+    try:
+        bus = I2CBus(geraete.erstelle_bus(welt))
+        aht = AHT21(bus)
+        tof = VL53L0X.VL53L0X(bus, cache=True)
+        tof.start_continuous(period=180, size=16, timer=Timer(0))
+        messzyklus = Messzyklus(tof, aht, BH1750(bus), anzahl=4)
+        aht.trigger = lambda: False
+        bus.statistik_zuruecksetzen()
+        messzyklus.messen()
+        tof.stop_continuous()
+    finally:
+        asyncio.set_event_loop_policy(None)
+    assert messzyklus.ausgelassen == 4 and messzyklus.temperatur.mittelwert() is None
+    assert bus.statistik(0x38)[0] == 0, "ohne Messbefehl kein Abholen"
+    assert messzyklus.helligkeit.anzahl == 4
+
+
+class _Sock:
+    def __init__(self, uhr):
+        self.empfangen = uhr.ticks_ms()
+
+
+class _Client:
+    """Ersatz für MQTTClient: ein Ping wird sofort beantwortet (wenn antworten)."""
+
+    def __init__(self, uhr, antworten):
+        self.uhr = uhr
+        self.antworten = antworten
+        self.sock = _Sock(uhr)
+        self.pings = 0
+
+    def connect(self):
+        raise OSError("Broker nicht erreichbar")
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        pass
+
+    def check_msg(self):
+        return None
+
+    def ping(self):
+        self.pings += 1
+        if self.antworten:
+            self.sock.empfangen = self.uhr.ticks_ms()
+
+
+def _sitzung_betreiben(antworten, sekunden):
+    """Sitzung mit keepalive=30, die alle 2 s sendet (wie das Hauptprogramm)."""
+    welt = neue_welt(virtuell=True, seed=1)
+    sitzung = MQTTSitzung("test", "127.0.0.1", keepalive=30)
+    client = sitzung.client = _Client(welt.uhr, antworten)
+    sitzung.verbunden = True
+    for _ in range(sekunden // 2):
+        welt.uhr.schlafen(2)
+        sitzung.publish(b"t", b"1")
+        sitzung.check_msg()
+    return sitzung, client
+
+
+def test_mqtt_keepalive():
+    """Wer ständig sendet, pingt trotzdem, und nur ein unbeantworteter Ping trennt."""
+    sitzung, client = _sitzung_betreiben(antworten=True, sekunden=300)
+    assert sitzung.abbrueche == 0 and sitzung.verbunden
+    assert client.pings >= 300 // 16, client.pings
+    sitzung, client = _sitzung_betreiben(antworten=False, sekunden=40)
+    assert sitzung.abbrueche == 1 and client.pings == 1, (sitzung.abbrueche, client.pings)
+
+
+def test_mqtt_abonnieren_mit_qos1_unterwegs():
+    """subscribe() bei offenem PUBACK: umqtt.simple würde das PUBACK beim Warten auf das SUBACK falsch lesen."""
+    welt = neue_welt(virtuell=True, seed=1)
+    broker = Broker()
+    welt.broker = broker.starten()
+    try:
+        empfangen = []
+        sitzung = MQTTSitzung(b"test", "127.0.0.1")
+        sitzung.set_callback(lambda topic, msg: empfangen.append((topic, msg)))
+        assert sitzung.verbinden()
+        assert sitzung.publish(b"a", b"1", qos=1)
+        sitzung.subscribe(b"b")
+        frist = time.monotonic() + 2
+        while sitzung.unterwegs() and time.monotonic() < frist:
+            sitzung.check_msg()
+            uhr_modul._echt_schlafen(0.001)
+        assert sitzung.publish(b"b", b"2")
+        while not empfangen and time.monotonic() < frist:
+            sitzung.check_msg()
+            uhr_modul._echt_schlafen(0.001)
+        assert empfangen == [(b"b", b"2")], empfangen
+        assert sitzung.bestaetigt == 1 and sitzung.abbrueche == 0 and sitzung.verbunden
+        sitzung.trennen()
+    finally:
+        broker.stoppen()
+
+
+class _Sender:
+    def __init__(self):
+        self.nachrichten = []
+
+    def publish(self, topic, msg):
+        self.nachrichten.append(msg)
+        return True
+
+
+def test_telemetriepuffer_zeiger():
+    """Beim Nachsenden wird der Zeiger nur alle zeiger_bloecke Blöcke geschrieben."""
+    welt = neue_welt(virtuell=True, seed=1)
+    with tempfile.TemporaryDirectory() as verzeichnis:
+        pfad = os.path.join(verzeichnis, "telemetrie.bin")
+        puffer = Telemetriepuffer(pfad, kapazitaet=256, zeiger_bloecke=4)
+        for i in range(200):
+            puffer.anhaengen(1700000000 + i, 150, 21.5, 50, 800, 45)
+        geschrieben = []
+        zeiger_schreiben = puffer._zeiger_schreiben
+        puffer._zeiger_schreiben = lambda: geschrieben.append(puffer.ausstehend) or zeiger_schreiben()
+        sender = _Sender()
+        for _ in range(5):
+            welt.uhr.schlafen(1)
+            assert puffer.nachsenden(sender, b"t", 1700000300, max_datensaetze=10) == 10
+        assert geschrieben == [160], geschrieben
+        # Neustart: die nach dem Zeiger gesendeten Blöcke kommen noch einmal
+        assert Telemetriepuffer(pfad, kapazitaet=256).ausstehend == 160
+        while puffer.ausstehend:
+            welt.uhr.schlafen(1)
+            puffer.nachsenden(sender, b"t", 1700000300, max_datensaetze=32)
+        assert geschrieben == [160, 54, 0], geschrieben
+        assert Telemetriepuffer(pfad, kapazitaet=256).ausstehend == 0
+
+
+def test_telemetrie_format():
+    """JSON-Form -> binär -> dict muss dieselben Werte ergeben."""
+    beispiele = [
+        {"Fuellstand": 149, "Temperatur": 22, "Luftfeuchtigkeit": 50, "Helligkeit": 796, "Bodenfeuchtigkeit": 45},
+        {"Fuellstand": 0, "Temperatur": -12.34, "Luftfeuchtigkeit": 99.99, "Helligkeit": 54612, "Bodenfeuchtigkeit": 0},
+        {"Fuellstand": 8190, "Temperatur": 85, "Luftfeuchtigkeit": 0, "Helligkeit": 0, "Bodenfeuchtigkeit": 100},
+        {"Fuellstand": None, "Temperatur": None, "Luftfeuchtigkeit": None, "Helligkeit": None, "Bodenfeuchtigkeit": None},
+    ]
+    for beispiel in beispiele:
+        binaer = telemetrie_format.aus_dict(json.loads(json.dumps(beispiel)), 1700000000)
+        zurueck = telemetrie_format.dekodieren(bytes(binaer))
+        assert len(binaer) == telemetrie_format.GROESSE
+        assert zurueck.pop("Zeit") == 1700000000
+        assert zurueck == beispiel, (zurueck, beispiel)
+    for kaputt in (b"", b"\x02" + bytes(13), b"\x01" + bytes(12)):
+        try:
+            telemetrie_format.dekodieren(kaputt)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("ungültige Nachricht nicht erkannt: %r" % kaputt)
+
+
+def test_aenderungsfilter():
+    """Deltas müssen beim Empfänger wieder die vollständigen Werte ergeben."""
+    filter_ = aenderungsfilter.Aenderungsfilter(schluesselbild_ms=0x7FFFFFFF)
+    zustand = aenderungsfilter.Zustand()
+    werte = {"Fuellstand": 150, "Temperatur": 22.0, "Luftfeuchtigkeit": 50, "Helligkeit": 800, "Bodenfeuchtigkeit": 45}
+    zufall = random.Random(1)
+    gesendet = 0
+    for runde in range(1000):
+        werte["Temperatur"] = round(werte["Temperatur"] + zufall.uniform(-0.1, 0.1), 2)
+        werte["Fuellstand"] = 150 + zufall.randint(-3, 3)
+        werte["Helligkeit"] = round(800 + zufall.uniform(-40, 40))
+        if runde % 100 == 50:
+            werte["Bodenfeuchtigkeit"] -= 2
+        nachricht = filter_.pruefen(werte)
+        if nachricht is None:
+            continue
+        gesendet += 1
+        empfangen = zustand.uebernehmen(nachricht)
+        assert empfangen is not None
+        for feld in aenderungsfilter.FELDER:
+            band = max(aenderungsfilter.TOTBAENDER[feld][0], aenderungsfilter.TOTBAENDER[feld][1] * abs(empfangen[feld]))
+            assert abs(empfangen[feld] - werte[feld]) <= band, (feld, empfangen, werte)
+    assert aenderungsfilter.Zustand().uebernehmen({"Temperatur": 21}) is None
+    assert filter_.schluesselbilder == 1
+    assert gesendet < filter_.runden / 2, (gesendet, filter_.runden)
+
+
+class _Stapelclient:
+    def __init__(self, verbunden):
+        self.verbunden = verbunden
+        self.gesendet = []
+
+    def publish(self, topic, msg):
+        if self.verbunden:
+            self.gesendet.append(bytes(msg))
+        return self.verbunden
+
+
+class _Stapelpuffer:
+    def __init__(self):
+        self.datensaetze = []
+
+    def anhaengen(self, *datensatz):
+        self.datensaetze.append(datensatz)
+
+
+def test_telemetriestapel():
+    """Stapel kodieren und dekodieren, Paketgröße und Rückfall in den Puffer."""
+    topic = b"Zuhause/Wohnung/BloomBuddy/Stapel"
+    stapel = Telemetriestapel(topic, max_anzahl=1000, max_paket=256)
+    assert 7 + len(topic) + STAPEL_KOPF + stapel.max_anzahl * STAPEL_EINTRAG <= 256
+    client = _Stapelclient(True)
+    for i in range(stapel.max_anzahl):
+        voll = stapel.hinzufuegen(1700000000 + i, 150 + i, 21.5, 50.25, 800 + i, None)
+    assert voll
+    assert stapel.senden(client, 1700000100) == stapel.max_anzahl
+    eintraege = telemetrie_format.stapel_dekodieren(client.gesendet[0])
+    assert len(eintraege) == stapel.max_anzahl
+    assert eintraege[-1] == {"Zeit": 1700000000 + stapel.max_anzahl - 1, "Alter": 101 - stapel.max_anzahl,
+                             "Fuellstand": 150 + stapel.max_anzahl - 1, "Temperatur": 21.5,
+                             "Luftfeuchtigkeit": 50.25, "Helligkeit": 800 + stapel.max_anzahl - 1,
+                             "Bodenfeuchtigkeit": None}, eintraege[-1]
+    puffer = _Stapelpuffer()
+    stapel.hinzufuegen(1700000200, 140, -3.5, 60, 0, 40)
+    assert stapel.senden(_Stapelclient(False), 1700000201, puffer) == 0
+    assert puffer.datensaetze == [(1700000200, 140, -3.5, 60, 0, 40)], puffer.datensaetze
+    assert stapel.anzahl == 0
+
+
+class _OhneVerbindung:
+    """MQTT-Sitzung ohne Verbindung für Befehlsempfang."""
+
+    def socket(self):
+        return None
+
+    def check_msg(self):
+        pass
+
+
+def test_uhrzeit():
+    """Brokerzeit, dann NTP gegen den Zeitserver der Simulation, dessen Uhr 3 Stunden vorgeht."""
+    vorlauf = 3 * 3600
+    welt = neue_welt(virtuell=True, seed=1)
+    server = NTPServer(uhrzeit=lambda: welt.uhr.zeit() + vorlauf)
+    welt.ntp = server.starten()
+    try:
+        uhr = Uhrzeit(ntp_server="pool.ntp.org", timeout_ms=200)
+        assert not uhr.synchron and uhr.zeit() < GUELTIG_AB
+        assert uhr.broker_zeit(b"%d" % int((welt.uhr.zeit() + 60) * 1000))
+        assert uhr.quelle == "broker" and abs(uhr.zeit() - welt.uhr.zeit() - 60) <= 1
+        assert not uhr.pflegen(), "ohne vorbereiten() kein NTP"
+        assert uhr.vorbereiten() and uhr.ntp_abfragen()
+        assert uhr.quelle == "ntp"
+        assert abs(uhr.zeit() - (welt.uhr.zeit() + vorlauf)) <= 1, uhr.zeit() - welt.uhr.zeit()
+        assert not uhr.broker_zeit(b"1700000000000"), "NTP hat Vorrang vor der Brokerzeit"
+        assert not uhr.pflegen(), "nächste Abfrage erst nach intervall_ms"
+
+        # In der Hauptschleife: pflegen() sendet nur, die Antwort liest Befehlsempfang beim Warten
+        befehle = Befehlsempfang(_OhneVerbindung())
+        befehle.beobachten(uhr.socket(), uhr.empfangen)
+        welt.uhr.schlafen(3600)
+        start = welt.uhr.monotonic()
+        assert not uhr.pflegen() and uhr.abfragen == 2
+        assert welt.uhr.monotonic() == start, "pflegen() darf nicht warten"
+        befehle.warten_ms(1000)
+        assert uhr.quelle == "ntp" and uhr.fehler == 0 and uhr._gesendet is None
+        assert abs(uhr.zeit() - (welt.uhr.zeit() + vorlauf)) <= 1
+
+        uhr.ntp_server, uhr.port = "127.0.0.1", 9  # discard: keine Antwort
+        assert uhr.vorbereiten() and not uhr.ntp_abfragen() and uhr.synchron
+        assert uhr.abfragen == 3 and uhr.fehler == 1
+    finally:
+        server.stoppen()
+
+
+def main():
+    tests = [test for name, test in globals().items() if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("%s: ok" % test.__name__)
+    print("%d Tests bestanden" % len(tests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Simulationsuhr mit Echtzeit- und virtuellem Betrieb.
+
+Im Echtzeitbetrieb laufen alle Wartezeiten wirklich ab. Im virtuellen Betrieb
+springt die Uhr bei jedem sleep() sofort vorwärts, ein Programmzyklus dauert
+dann nur so lange wie die reine Rechenzeit; die Sensormodelle rechnen trotzdem
+mit den realen Wandlungszeiten.
+
+Die Uhr führt auch die Callbacks von machine.Timer aus. Wie auf dem ESP32
+(Soft-Callbacks) laufen sie im Hauptablauf, und zwar während sleep() und
+während die asyncio-Ereignisschleife wartet.
+"""
+
+import asyncio
+import selectors
+import time as _time
+
+# Vor dem Umleiten von time.sleep() und time.time() auf die Simulationsuhr sichern
+_echt_schlafen = _time.sleep
+_echte_zeit = _time.time
+
+
+class SimulationBeendet(BaseException):
+    """Beendet das simulierte Programm (BaseException, damit "except Exception" sie nicht abfängt)."""
+
+
+class Uhr:
+    def __init__(self, virtuell=False):
+        self.virtuell = virtuell
+        self._start = _time.monotonic()
+        self._startzeit = _echte_zeit()
+        self._versatz = 0.0
+        self._timer = []
+        self.ende = None
+        self._in_callback = False
+
+    def monotonic(self):
+        """Sekunden seit Simulationsstart (float)."""
+        if self.virtuell:
+            return self._versatz
+        return _time.monotonic() - self._start
+
+    def zeit(self):
+        """Uhrzeit in s seit 1970, läuft mit der Simulationsuhr (auch virtuell)."""
+        return self._startzeit + self.monotonic()
+
+    def ticks_ms(self):
+        return self.ticks_us() // 1000
+
+    def ticks_us(self):
+        # Auf ganze us runden, sonst wird aus 0.18 s virtueller Summe 179 ms
+        return round(self.monotonic() * 1000000)
+
+    def vorruecken(self, sekunden):
+        if self.virtuell and sekunden > 0:
+            self._versatz += sekunden
+
+    def schlafen(self, sekunden):
+        """Wartet sekunden lang und führt dabei fällige Timer-Callbacks aus."""
+        ziel = self.monotonic() + max(0.0, sekunden)
+        while True:
+            self.timer_ausfuehren()
+            jetzt = self.monotonic()
+            if jetzt >= ziel:
+                break
+            schritt = ziel - jetzt
+            naechster = self.naechster_timer()
+            if naechster is not None:
+                schritt = min(schritt, max(0.0, naechster - jetzt))
+            if self.virtuell:
+                self._versatz += schritt
+            else:
+                _echt_schlafen(schritt)
+        self.ende_pruefen()
+
+    def ende_pruefen(self):
+        if self.ende is not None and self.monotonic() >= self.ende:
+            raise SimulationBeendet("Simulationsdauer erreicht")
+
+    # --- machine.Timer ---
+
+    def timer_anmelden(self, timer):
+        if timer not in self._timer:
+            self._timer.append(timer)
+
+    def timer_abmelden(self, timer):
+        if timer in self._timer:
+            self._timer.remove(timer)
+
+    def naechster_timer(self):
+        if not self._timer:
+            return None
+        return min(t.faellig for t in self._timer)
+
+    def timer_ausfuehren(self):
+        if self._in_callback:
+            return
+        self._in_callback = True
+        try:
+            jetzt = self.monotonic()
+            for timer in list(self._timer):
+                if timer.faellig <= jetzt:
+                    timer.ausloesen(jetzt)
+        finally:
+            self._in_callback = False
+
+
+class _SimSelector(selectors.DefaultSelector):
+    """Selector, der beim Warten die Simulationsuhr und die Timer bedient."""
+
+    def __init__(self, uhr):
+        super().__init__()
+        self.uhr = uhr
+
+    def select(self, timeout=None):
+        uhr = self.uhr
+        uhr.timer_ausfuehren()
+        naechster = uhr.naechster_timer()
+        if naechster is not None:
+            bis_timer = max(0.0, naechster - uhr.monotonic())
+            timeout = bis_timer if timeout is None else min(timeout, bis_timer)
+        if uhr.virtuell:
+            ereignisse = super().select(0)
+            if ereignisse or timeout == 0:
+                return ereignisse
+            if timeout is None:
+                return super().select(None)
+            uhr.vorruecken(timeout)
+            uhr.timer_ausfuehren()
+            uhr.ende_pruefen()
+            return ereignisse
+        ereignisse = super().select(timeout)
+        uhr.timer_ausfuehren()
+        uhr.ende_pruefen()
+        return ereignisse
+
+
+class _SimEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, uhr):
+        super().__init__(selector=_SimSelector(uhr))
+        self._uhr = uhr
+
+    def time(self):
+        return self._uhr.monotonic()
+
+
+class _SimPolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, uhr):
+        super().__init__()
+        self._uhr = uhr
+
+    def new_event_loop(self):
+        return _SimEventLoop(self._uhr)
+
+
+def asyncio_einbinden(uhr):
+    """Lässt asyncio.run() & Co. mit der Simulationsuhr laufen."""
+    asyncio.set_event_loop_policy(_SimPolicy(uhr))
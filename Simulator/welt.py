@@ -0,0 +1,107 @@
+"""Simulierte Umgebung von BloomBuddy: Pflanze, Tank, Klima und Pumpe.
+
+Die Welt wird bei jedem Zugriff anhand der vergangenen Zeit fortgeschrieben:
+Der Boden trocknet langsam aus, bei laufender Pumpe (Relais-Pin HIGH) steigt
+die Bodenfeuchte und der Wasserspiegel im Tank sinkt (der ToF-Abstand wird
+größer). Alle Sensormodelle und Fake-Module greifen über welt() darauf zu.
+"""
+
+import random
+
+from uhr import Uhr, SimulationBeendet
+
+
+class Welt:
+    def __init__(self, virtuell=False, seed=None):
+        self.uhr = Uhr(virtuell)
+        self.zufall = random.Random(seed)
+
+        # Zustand der Umgebung
+        self.abstand_mm = 150.0        # ToF-Abstand zur Wasseroberfläche
+        self.bodenfeuchte = 45.0       # %
+        self.temperatur = 22.0         # °C
+        self.luftfeuchte = 50.0        # %
+        self.helligkeit_lux = 800.0
+
+        # Physik pro Sekunde
+        self.austrocknung = 0.01       # % Bodenfeuchte
+        self.bewaesserung = 1.5        # % Bodenfeuchte bei laufender Pumpe
+        self.pumpe_mm = 0.4            # mm Tankabstand bei laufender Pumpe
+
+        # Verdrahtung wie im Schaltplan
+        self.relais_pin = 8
+        self.boden_pin = 15
+        self.trocken_adc = 3070
+        self.nass_adc = 1700
+        self.pins = {}
+        self.pumpe_laufzeit = 0.0      # s, Summe aller Pumpenläufe
+        self.schaltvorgaenge = []      # (Zeitpunkt in s, neuer Wert) bei jedem Umschalten des Relais
+
+        # Netzwerk
+        self.wlan_verfuegbar = True
+        self.broker = ("127.0.0.1", 1883)
+        self.ntp = None                # (host, port) des Zeitservers, None = kein NTP erreichbar
+        self.mac = bytes((0x24, 0x6F, 0x28, 0x12, 0x34, 0x56))
+        self.max_nachrichten = None
+        self.nachrichten = 0
+        self.gesendete_bytes = 0
+        self.paket_bytes = 0           # inkl. MQTT-Header und Topic
+
+        self.i2c_geraete = None
+        self.flash = None              # Verzeichnis als Dateisystem des ESP32
+        self._zuletzt = self.uhr.monotonic()
+
+    def pumpe_laeuft(self):
+        pin = self.pins.get(self.relais_pin)
+        return pin is not None and pin.value() == 1
+
+    def aktualisieren(self):
+        jetzt = self.uhr.monotonic()
+        dt = jetzt - self._zuletzt
+        if dt <= 0:
+            return
+        self._zuletzt = jetzt
+        if self.pumpe_laeuft():
+            self.pumpe_laufzeit += dt
+            self.bodenfeuchte += self.bewaesserung * dt
+            self.abstand_mm += self.pumpe_mm * dt
+        self.bodenfeuchte -= self.austrocknung * dt
+        self.bodenfeuchte = max(0.0, min(100.0, self.bodenfeuchte))
+
+    def relais_geschaltet(self, wert):
+        self.schaltvorgaenge.append((self.uhr.monotonic(), wert))
+
+    def rauschen(self, wert, sigma):
+        return wert + self.zufall.gauss(0, sigma)
+
+    def boden_adc(self):
+        """ADC-Wert (12 Bit) des kapazitiven Bodenfeuchtesensors."""
+        self.aktualisieren()
+        anteil_trocken = 1 - self.bodenfeuchte / 100
+        wert = self.nass_adc + (self.trocken_adc - self.nass_adc) * anteil_trocken
+        return max(0, min(4095, int(self.rauschen(wert, 8))))
+
+    def nachricht_gesendet(self, nbytes, paket_bytes=None):
+        """Zählt veröffentlichte MQTT-Nachrichten, beendet ggf. die Simulation."""
+        self.nachrichten += 1
+        self.gesendete_bytes += nbytes
+        self.paket_bytes += nbytes if paket_bytes is None else paket_bytes
+        if self.max_nachrichten is not None and self.nachrichten >= self.max_nachrichten:
+            raise SimulationBeendet("%d Nachrichten gesendet" % self.nachrichten)
+
+
+_welt = None
+
+
+def welt():
+    """Die aktuelle Welt (wird bei Bedarf mit Standardwerten angelegt)."""
+    global _welt
+    if _welt is None:
+        _welt = Welt()
+    return _welt
+
+
+def neue_welt(**optionen):
+    global _welt
+    _welt = Welt(**optionen)
+    return _welt